@@ -1,31 +1,136 @@
 # app.py
 import os
+import atexit
 import logging
-from flask import Flask, render_template
+from datetime import datetime
+import click
+from flask import Flask, jsonify, render_template
 from flask_cors import CORS
-from flask_apscheduler import APScheduler
-from flask_migrate import Migrate
 from flask_session import Session
 from dotenv import load_dotenv
 
 from models.database import db
 from routes import routes_bp
-from services.server_state_monitor_service import ServerStateMonitorService
 from models.server import Server
 from auth.routes import auth_bp, login_required
 from config.config import config
+from services.bmc_command_queue import command_queue
+from services.log_queue import configure_logging
+from services.readiness import get_readiness
+from static_assets import init_static_assets
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO')),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging; records are written by a background listener thread
+configure_logging(os.getenv('LOG_LEVEL', 'INFO'))
 logger = logging.getLogger(__name__)
 
-def create_app(config_name=None):
+class LazyMigrateGroup(click.Group):
+    """`flask db` that only imports Flask-Migrate (and Alembic) when it is run"""
+
+    def __init__(self, app, **kwargs):
+        super().__init__('db', help='Perform database migrations.', **kwargs)
+        self.app = app
+
+    def _migrate_group(self):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as migrate_group
+        if 'migrate' not in self.app.extensions:
+            Migrate(self.app, db)
+        return migrate_group
+
+    def list_commands(self, ctx):
+        return self._migrate_group().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._migrate_group().get_command(ctx, name)
+
+def init_scheduler(app):
+    """Register the background jobs and start them"""
+    from flask_apscheduler import APScheduler
+    from services.server_state_monitor_service import ServerStateMonitorService
+    from services.prewarm_service import PrewarmService
+    from services.monitor_shard_service import MonitorShardService
+    from services.rollup_service import RollupService
+    
+    scheduler = APScheduler()
+    
+    @scheduler.task('interval', id='monitor_servers', 
+                   seconds=app.config['SERVER_MONITOR_INTERVAL'])
+    def monitor_servers():
+        with app.app_context():
+            ServerStateMonitorService.check_and_update_server_states()
+    
+    @scheduler.task('interval', id='check_idle_servers',
+                   seconds=5)  # Check every 5 seconds
+    def check_idle_servers():
+        with app.app_context():
+            ServerStateMonitorService.check_idle_and_shutdown()
+    
+    @scheduler.task('interval', id='poll_power_transitions',
+                   seconds=app.config['POWER_TRANSITION_POLL_INTERVAL'])
+    def poll_power_transitions():
+        with app.app_context():
+            ServerStateMonitorService.poll_transitions()
+    
+    if app.config['MONITOR_SHARDING_ENABLED']:
+        @scheduler.task('interval', id='monitor_heartbeat',
+                       seconds=app.config['MONITOR_HEARTBEAT_INTERVAL'],
+                       next_run_time=datetime.now())
+        def monitor_heartbeat():
+            with app.app_context():
+                MonitorShardService.heartbeat()
+        
+        @atexit.register
+        def leave_monitor_ring():
+            with app.app_context():
+                MonitorShardService.deregister()
+    
+    @scheduler.task('interval', id='flush_live_usage',
+                   seconds=app.config['USAGE_FLUSH_INTERVAL'])
+    def flush_live_usage():
+        with app.app_context():
+            ServerStateMonitorService.flush_live_usage()
+    
+    @atexit.register
+    def flush_live_usage_on_exit():
+        with app.app_context():
+            ServerStateMonitorService.flush_live_usage()
+    
+    if app.config['POWER_READING_ENABLED']:
+        @scheduler.task('interval', id='flush_power_samples',
+                       seconds=app.config['POWER_SAMPLE_FLUSH_INTERVAL'])
+        def flush_power_samples():
+            with app.app_context():
+                ServerStateMonitorService.flush_power_samples()
+        
+        @atexit.register
+        def flush_power_samples_on_exit():
+            with app.app_context():
+                ServerStateMonitorService.flush_power_samples()
+    
+    @scheduler.task('interval', id='rollup_usage',
+                   seconds=app.config['ROLLUP_INTERVAL'])
+    def rollup_usage():
+        with app.app_context():
+            RollupService.run()
+    
+    if app.config['PREWARM_ENABLED']:
+        @scheduler.task('interval', id='prewarm_servers',
+                       seconds=app.config['PREWARM_INTERVAL'])
+        def prewarm_servers():
+            with app.app_context():
+                PrewarmService.prewarm_scheduled_servers()
+    
+    scheduler.init_app(app)
+    scheduler.start()
+    
+    # Warm the fleet snapshot now rather than on the first request
+    get_readiness(app).start(app)
+    return scheduler
+
+def create_app(config_name=None, start_scheduler=None):
     if config_name is None:
         config_name = os.getenv('FLASK_ENV', 'development')
     
@@ -38,29 +143,20 @@ def create_app(config_name=None):
     # Initialize Flask-Session
     Session(app)
     
-    # Initialize database
+    # Initialize database; migrations are loaded on demand by `flask db`
     db.init_app(app)
-    migrate = Migrate(app, db)
+    app.cli.add_command(LazyMigrateGroup(app))
+    
+    # IPMI commands are serialized per BMC for the whole process
+    command_queue.configure(app)
+    
+    # Fingerprinted static assets and response compression
+    init_static_assets(app)
     
     # Register blueprints
     app.register_blueprint(routes_bp, url_prefix='/api')
     app.register_blueprint(auth_bp, url_prefix='/auth')
     
-    # Initialize scheduler
-    scheduler = APScheduler()
-    
-    @scheduler.task('interval', id='monitor_servers', 
-                   seconds=app.config['SERVER_MONITOR_INTERVAL'])
-    def monitor_servers():
-        with app.app_context():
-            ServerStateMonitorService.check_and_update_server_states()
-    
-    @scheduler.task('interval', id='check_idle_servers',
-                   seconds=5)  # Check every 5 seconds
-    def check_idle_servers():
-        with app.app_context():
-            ServerStateMonitorService.check_idle_and_shutdown()
-    
     # Main route for the web interface
     @app.route('/')
     def index():
@@ -71,13 +167,31 @@ def create_app(config_name=None):
     def dashboard():
         return render_template('dashboard.html')
     
-    scheduler.init_app(app)
-    scheduler.start()
+    # Liveness: the process is up and serving requests
+    @app.route('/healthz')
+    def healthz():
+        return jsonify({'status': 'ok'})
+    
+    # Readiness: the first fleet snapshot has been loaded
+    @app.route('/readyz')
+    def readyz():
+        readiness = get_readiness(app)
+        readiness.start(app)
+        return jsonify(readiness.status()), 200 if readiness.ready else 503
+    
+    @app.before_request
+    def prime_fleet_snapshot():
+        get_readiness(app).start(app)
+    
+    if start_scheduler is None:
+        start_scheduler = app.config['SCHEDULER_AUTOSTART']
+    if start_scheduler:
+        init_scheduler(app)
     
     return app
 
 if __name__ == '__main__':
-    app = create_app()
+    app = create_app(start_scheduler=False)
     
     with app.app_context():
         db.create_all()
@@ -85,4 +199,5 @@ if __name__ == '__main__':
         if server_count == 0:
             logger.info("No servers found in database. Please add servers through the API.")
     
+    init_scheduler(app)
     app.run(debug=True, host='0.0.0.0', port=5001, use_reloader=False)  # Disabled reloader
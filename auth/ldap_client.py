@@ -1,4 +1,3 @@
-import ldap3
 import ssl
 import logging
 
@@ -30,6 +29,8 @@ def ldap_authenticate(username, password):
         
         logger.info(f"Attempting LDAP authentication for user: {username}")
         
+        import ldap3  # imported on first login to keep app startup light
+
         # Configure TLS
         tls_config = ldap3.Tls(validate=ssl.CERT_NONE)
         server = ldap3.Server(
@@ -91,6 +92,8 @@ def find_user_dn(username):
     ]
     
     try:
+        import ldap3
+
         tls_config = ldap3.Tls(validate=ssl.CERT_NONE)
         server = ldap3.Server(LDAP_SERVER, use_ssl=True, tls=tls_config)
         
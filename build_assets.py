@@ -0,0 +1,126 @@
+"""
+Build fingerprinted, minified and precompressed copies of the static assets.
+
+Writes static/dist/<name>.<hash>.<ext> plus .gz (and .br when the Brotli
+package is installed) for every CSS and JS file under static/, and a
+manifest.json mapping the source paths to the fingerprinted ones. The app
+serves the fingerprinted files with immutable caching (see static_assets.py).
+
+Usage:
+    python build_assets.py
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+ASSET_EXTENSIONS = ('.css', '.js')
+
+
+def minify_css(source):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r'([{;])([\w-]+):\s+', r'\1\2:', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    """Conservatively shrink a script: indentation, blank lines and whole-line comments
+
+    Template literals are passed through untouched so markup built in them
+    keeps its content.
+    """
+    lines = []
+    in_template = False
+    for line in source.splitlines():
+        if not in_template:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('//'):
+                continue
+            line = stripped
+        lines.append(line)
+        # Count unescaped backticks to know whether the next line is inside a template literal
+        if len(re.findall(r'(?<!\\)`', line)) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def iter_sources(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if d != DIST_DIRNAME)
+        for name in sorted(files):
+            if name.endswith(ASSET_EXTENSIONS) and '.min.' not in name:
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, static_dir).replace(os.sep, '/'), path
+
+
+def build(static_dir=STATIC_DIR, minify=True):
+    """Build every asset into static/dist and write the manifest
+
+    Returns:
+        dict: {source path: fingerprinted path}, both relative to the static folder
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    manifest = {}
+    for relpath, path in iter_sources(static_dir):
+        with open(path, encoding='utf-8') as f:
+            content = f.read()
+        stem, ext = os.path.splitext(relpath)
+        if minify:
+            content = MINIFIERS[ext](content)
+        data = content.encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        output = f"{DIST_DIRNAME}/{stem}.{digest}{ext}"
+        target = os.path.join(static_dir, output)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        with open(target + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(target + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+
+        manifest[relpath] = output
+        print(f"{relpath} -> {output} ({len(data)} bytes)")
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fingerprint and precompress static assets')
+    parser.add_argument('--static-dir', default=STATIC_DIR, help='Static folder to build')
+    parser.add_argument('--no-minify', action='store_true', help='Copy assets without minifying')
+    args = parser.parse_args()
+    manifest = build(args.static_dir, minify=not args.no_minify)
+    if brotli is None:
+        print("Brotli is not installed, only gzip variants were written")
+    print(f"Built {len(manifest)} asset(s)")
+
+
+if __name__ == "__main__":
+    main()
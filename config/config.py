@@ -1,6 +1,47 @@
 import os
 from datetime import timedelta
 
+
+def database_url(url):
+    """DATABASE_URL with PostgreSQL URLs bound to the psycopg (3) driver"""
+    if url and url.startswith(('postgres://', 'postgresql://')):
+        return 'postgresql+psycopg://' + url.split('://', 1)[1]
+    return url
+
+
+def engine_options(url):
+    """SQLAlchemy engine options for a database URL
+
+    PostgreSQL gets a sized connection pool and server-side timeouts.
+    One process serves the web requests (one thread each) and runs the
+    background jobs (APScheduler's 10 threads), so DB_POOL_SIZE +
+    DB_MAX_OVERFLOW bounds its connections; keep that times the number
+    of processes under the server's max_connections. SQLite keeps the
+    defaults.
+    """
+    if not url or not url.startswith('postgresql'):
+        return {}
+    timeouts = {
+        # Abort runaway statements and lock waits instead of piling up connections
+        'statement_timeout': int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000)),
+        'lock_timeout': int(os.environ.get('DB_LOCK_TIMEOUT_MS', 10000)),
+        # Release the locks of a worker that died mid-transaction; long enough for a monitor
+        # transaction that waits on an IPMI probe or a rollup's in-process aggregation
+        'idle_in_transaction_session_timeout': int(os.environ.get('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', 300000)),
+    }
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),  # seconds to wait for a free connection
+        'pool_pre_ping': True,  # survive database restarts and dropped idle connections
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # seconds
+        'connect_args': {
+            'application_name': 'cgi-server-management',
+            'options': ' '.join(f'-c {name}={value}' for name, value in timeouts.items()),
+        },
+    }
+
+
 class BaseConfig:
     """Base configuration."""
     # Flask
@@ -15,12 +56,96 @@ class BaseConfig:
     
     # Scheduler
     SCHEDULER_API_ENABLED = True
+    # Background jobs only run in the process that serves the fleet (app.py / the container),
+    # so CLI commands, tests and extra workers don't start monitors of their own
+    SCHEDULER_AUTOSTART = os.environ.get('START_SCHEDULER', 'false').lower() == 'true'
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # Share of per-server monitor detail records logged at DEBUG; sweeps always log one summary
+    MONITOR_LOG_SAMPLE_RATE = float(os.environ.get('MONITOR_LOG_SAMPLE_RATE', '0.01'))
+    
+    # Response compression (static assets are precompressed by build_assets.py)
+    COMPRESS_MIN_SIZE = 500  # bytes; smaller JSON responses are sent as is
+    COMPRESS_LEVEL = 5  # gzip level for JSON responses
+    COMPRESS_BR_QUALITY = 4  # brotli quality for JSON responses
     
     # Server monitoring
     SERVER_MONITOR_INTERVAL = 5  # seconds
+    SERVER_MONITOR_CONCURRENCY = int(os.environ.get('SERVER_MONITOR_CONCURRENCY', 8))
+    IPMI_COMMAND_TIMEOUT = int(os.environ.get('IPMI_COMMAND_TIMEOUT', 30))  # seconds per ipmitool call
+    USAGE_FLUSH_INTERVAL = int(os.environ.get('USAGE_FLUSH_INTERVAL', 60))  # seconds; the API reads live usage
+    # 'sample': idle from each server's latest sample, timed by the app; 'window': idle from the
+    # peak usage over each server's idle_threshold_mins, aggregated by InfluxDB
+    IDLE_EVALUATION_MODE = os.environ.get('IDLE_EVALUATION_MODE', 'sample').lower()
+    
+    # Power draw (DCMI) collected by the monitor's status probe
+    POWER_READING_ENABLED = os.environ.get('POWER_READING_ENABLED', 'true').lower() == 'true'
+    POWER_READING_INLET_TEMP = os.environ.get('POWER_READING_INLET_TEMP', 'false').lower() == 'true'  # adds an SDR scan
+    POWER_SAMPLE_BUFFER_SIZE = 512  # samples kept per server between flushes
+    POWER_SAMPLE_FLUSH_INTERVAL = int(os.environ.get('POWER_SAMPLE_FLUSH_INTERVAL', 60))  # seconds
+    POWER_SAMPLE_MAX_GAP = 300  # seconds; longer gaps between samples are not counted as measured
+    
+    # Usage and savings rollups
+    ROLLUP_INTERVAL = int(os.environ.get('ROLLUP_INTERVAL', 300))  # seconds
+    ROLLUP_HOURLY_RETENTION_DAYS = 90  # daily and monthly rollups are kept forever
+    ENERGY_ACTIVE_WATTS = float(os.environ.get('ENERGY_ACTIVE_WATTS', 400))  # estimate for busy servers without DCMI
+    ENERGY_IDLE_WATTS = float(os.environ.get('ENERGY_IDLE_WATTS', 150))  # estimate for idle servers, and per saved hour
+    
+    # InfluxDB (telegraf metrics)
+    INFLUXDB_URL = os.environ.get('INFLUXDB_URL', 'https://influxdb.cgi.lab.nycu.edu.tw/query')
+    INFLUXDB_DB = os.environ.get('INFLUXDB_DB', 'telegraf')
+    INFLUXDB_POOL_SIZE = None  # defaults to SERVER_MONITOR_CONCURRENCY
+    INFLUXDB_TIMEOUT = float(os.environ.get('INFLUXDB_TIMEOUT', 10))  # total budget per query, seconds
+    INFLUXDB_CONNECT_TIMEOUT = 3.0  # seconds
+    INFLUXDB_RETRIES = int(os.environ.get('INFLUXDB_RETRIES', 2))
+    INFLUXDB_RETRY_BACKOFF = 0.2  # seconds, doubled per retry with jitter
+    INFLUXDB_VERIFY_SSL = os.environ.get('INFLUXDB_VERIFY_SSL', 'true').lower() == 'true'
+    
+    # Telemetry query cache
+    TELEGRAF_INTERVAL = int(os.environ.get('TELEGRAF_INTERVAL', 10))  # telegraf collection interval, seconds
+    TELEMETRY_CACHE_TTL = None  # defaults to TELEGRAF_INTERVAL
+    TELEMETRY_CACHE_SIZE = 4096  # max cached query results
+    
+    # BMC discovery
+    DISCOVERY_RATE = 500  # RMCP pings per second
+    DISCOVERY_TIMEOUT = 1.0  # seconds to wait for answers after each pass
+    DISCOVERY_RETRIES = 1  # extra passes for addresses that did not answer
+    DISCOVERY_AUTH_CONCURRENCY = 32  # parallel authenticated checks
+    DISCOVERY_MAX_HOSTS = 4096  # largest sweep accepted in one request (a /20)
+    
+    # Pushed telegraf metrics (/api/ingest)
+    INGEST_TOKEN = os.environ.get('INGEST_TOKEN')  # require "Authorization: Token <value>" when set
+    USAGE_PUSH_MAX_AGE = None  # seconds a pushed sample stays authoritative, defaults to 2 * TELEGRAF_INTERVAL
+    
+    # Power transitions
+    POWER_TRANSITION_TIMEOUT = 60  # seconds a power on/off may take before its POWERING_* state is given up
+    POWER_TRANSITION_POLL_INTERVAL = 2  # seconds between probes of servers in transition
+    
+    # Idle shutdown
+    SHUTDOWN_GRACE_SECS = int(os.environ.get('SHUTDOWN_GRACE_SECS', 120))  # ACPI shutdown time before hard off
+    SHUTDOWN_POLL_INTERVAL = 5  # seconds between power status polls while shutting down
+    SHUTDOWN_MAX_WORKERS = 32  # servers shut down in parallel
+    
+    # Sharded monitoring across several monitor instances
+    MONITOR_SHARDING_ENABLED = os.environ.get('MONITOR_SHARDING_ENABLED', 'false').lower() == 'true'
+    MONITOR_INSTANCE_ID = os.environ.get('MONITOR_INSTANCE_ID')  # defaults to hostname-pid
+    MONITOR_SITE = os.environ.get('MONITOR_SITE')  # takes servers pinned to this site besides unpinned ones
+    MONITOR_HEARTBEAT_INTERVAL = 10  # seconds
+    MONITOR_HEARTBEAT_TTL = 30  # instances silent for longer lose their servers
+    MONITOR_VNODES = 128  # virtual nodes per instance on the hash ring
+    
+    # Schedules
+    SCHEDULE_HORIZON_DAYS = 14  # recurring rules are expanded this far ahead
+    SCHEDULE_CACHE_TTL = 60  # seconds an expanded per-server horizon is reused
+    
+    # Schedule-driven pre-warm
+    PREWARM_ENABLED = os.environ.get('PREWARM_ENABLED', 'true').lower() == 'true'
+    PREWARM_INTERVAL = 30  # seconds between pre-warm checks
+    PREWARM_HORIZON_MINS = 120  # how far ahead booked windows are planned
+    PREWARM_DEFAULT_BOOT_SECS = 300  # boot time assumed until one has been measured
+    PREWARM_MARGIN_SECS = int(os.environ.get('PREWARM_MARGIN_SECS', 60))  # slack added to every boot
+    PREWARM_MAX_CONCURRENT_BOOTS = int(os.environ.get('PREWARM_MAX_CONCURRENT_BOOTS', 4))  # per monitor instance when sharded
 
 class DevelopmentConfig(BaseConfig):
     """Development configuration."""
@@ -40,8 +165,9 @@ class TestingConfig(BaseConfig):
 class ProductionConfig(BaseConfig):
     """Production configuration."""
     DEBUG = False
-    # Use environment variables for production settings
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    # Use environment variables for production settings; PostgreSQL is the supported database
+    SQLALCHEMY_DATABASE_URI = database_url(os.environ.get('DATABASE_URL'))
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SERVER_MONITOR_INTERVAL = int(os.environ.get('SERVER_MONITOR_INTERVAL', 5))
 
@@ -0,0 +1,38 @@
+# controllers/report_controller.py
+from datetime import datetime, timedelta, UTC
+from flask import request, jsonify
+from services.rollup_service import RollupService
+
+class ReportController:
+
+    @staticmethod
+    def _parse_time(value, default):
+        """Parse an ISO timestamp into naive UTC, as rollup buckets are stored"""
+        if not value:
+            return default
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(UTC).replace(tzinfo=None)
+        return parsed
+
+    @staticmethod
+    def get_savings():
+        """
+        Usage, energy and idle-shutdown savings summed from the rollups
+        """
+        period = request.args.get('period')
+        if period not in (None, 'hour', 'day', 'month'):
+            return jsonify({"message": "period must be 'hour', 'day' or 'month'"}), 400
+
+        # Default to the last 30 whole days (including today), which daily rollups cover exactly
+        tomorrow = datetime.now(UTC).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        try:
+            end = ReportController._parse_time(request.args.get('end'), tomorrow)
+            start = ReportController._parse_time(request.args.get('start'), end - timedelta(days=30))
+            server_ids = [int(value) for value in request.args.getlist('server_id')]
+        except ValueError as e:
+            return jsonify({"message": f"Invalid query parameter: {str(e)}"}), 400
+        if end <= start:
+            return jsonify({"message": "end must be after start"}), 400
+
+        return jsonify(RollupService.savings_report(start, end, period=period, server_ids=server_ids or None))
@@ -2,11 +2,22 @@
 from flask import request, jsonify
 from models.server import Server
 from models.schedule import Schedule
+from models.schedule_rule import ScheduleRule
 from models.database import db
-from datetime import datetime
+from datetime import datetime, UTC
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from services.schedule_service import compile_rule, get_schedule_index
 
 class ScheduleController:
 
+    @staticmethod
+    def _parse_utc(value):
+        """Parse an ISO timestamp into the naive UTC form schedules are stored in"""
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(UTC).replace(tzinfo=None)
+        return parsed
+
     @staticmethod
     def get_schedules(server_id):
         server = Server.query.get(server_id)
@@ -31,9 +42,16 @@ class ScheduleController:
         if not server:
             return jsonify({"message": "Server not found"}), 404
 
-        data = request.json
-        start_time = datetime.fromisoformat(data['start_time'])
-        end_time = datetime.fromisoformat(data['end_time'])
+        data = request.get_json(silent=True) or {}
+        try:
+            start_time = ScheduleController._parse_utc(data['start_time'])
+            end_time = ScheduleController._parse_utc(data['end_time'])
+        except KeyError as e:
+            return jsonify({"message": f"Missing required field: {e.args[0]}"}), 400
+        except (TypeError, ValueError) as e:
+            return jsonify({"message": f"Invalid time: {str(e)}"}), 400
+        if end_time <= start_time:
+            return jsonify({"message": "end_time must be after start_time"}), 400
         description = data.get('description', '')
 
         schedule = Schedule(
@@ -44,6 +62,7 @@ class ScheduleController:
         )
         db.session.add(schedule)
         db.session.commit()
+        get_schedule_index().invalidate(server.id)
         return jsonify({"success": True, "data": {
             "id": schedule.id,
             "start_time": schedule.start_time.isoformat(),
@@ -59,4 +78,107 @@ class ScheduleController:
         
         db.session.delete(schedule)
         db.session.commit()
-        return jsonify({"success": True})
\ No newline at end of file
+        get_schedule_index().invalidate(int(server_id))
+        return jsonify({"success": True})
+
+    @staticmethod
+    def _rule_to_dict(rule):
+        return {
+            "id": rule.id,
+            "server_id": rule.server_id,
+            "rrule": rule.rrule,
+            "dtstart": rule.dtstart.isoformat(),
+            "timezone": rule.timezone,
+            "duration_mins": rule.duration_mins,
+            "description": rule.description,
+            "enabled": rule.enabled
+        }
+
+    @staticmethod
+    def _apply_rule_fields(rule, data):
+        """Copy rule fields from a request body and validate the result
+
+        Returns:
+            str: An error message, or None if the rule is valid
+        """
+        if 'rrule' in data:
+            rule.rrule = str(data['rrule']).strip()
+        if 'timezone' in data:
+            rule.timezone = data['timezone'] or 'UTC'
+        if 'description' in data:
+            rule.description = data['description']
+        if 'enabled' in data:
+            rule.enabled = bool(data['enabled'])
+        if 'duration_mins' in data:
+            duration = data['duration_mins']
+            if not isinstance(duration, int) or isinstance(duration, bool) or duration < 1:
+                return "duration_mins must be a positive integer"
+            rule.duration_mins = duration
+
+        for field in ('rrule', 'dtstart', 'duration_mins'):
+            if field not in data and getattr(rule, field) is None:
+                return f"Missing required field: {field}"
+        rule.timezone = rule.timezone or 'UTC'
+
+        try:
+            if 'dtstart' in data:
+                dtstart = datetime.fromisoformat(data['dtstart'])
+                if dtstart.tzinfo is not None:
+                    # Store the wall-clock time in the rule's own timezone
+                    dtstart = dtstart.astimezone(ZoneInfo(rule.timezone)).replace(tzinfo=None)
+                rule.dtstart = dtstart
+            compile_rule(rule.rrule, rule.dtstart, rule.timezone)
+        except ZoneInfoNotFoundError:
+            return f"Unknown timezone '{rule.timezone}'"
+        except (TypeError, ValueError) as e:
+            return str(e)
+        return None
+
+    @staticmethod
+    def get_rules(server_id):
+        server = Server.query.get(server_id)
+        if not server:
+            return jsonify({"message": "Server not found"}), 404
+        return jsonify([ScheduleController._rule_to_dict(rule) for rule in server.schedule_rules])
+
+    @staticmethod
+    def create_rule(server_id):
+        server = Server.query.get(server_id)
+        if not server:
+            return jsonify({"message": "Server not found"}), 404
+
+        rule = ScheduleRule(server_id=server.id, enabled=True)
+        error = ScheduleController._apply_rule_fields(rule, request.get_json(silent=True) or {})
+        if error:
+            return jsonify({"message": error}), 400
+
+        db.session.add(rule)
+        db.session.commit()
+        get_schedule_index().invalidate(server.id)
+        return jsonify({"success": True, "data": ScheduleController._rule_to_dict(rule)}), 201
+
+    @staticmethod
+    def update_rule(server_id, rule_id):
+        rule = ScheduleRule.query.get(rule_id)
+        if not rule or rule.server_id != int(server_id):
+            return jsonify({"message": "Schedule rule not found"}), 404
+
+        error = ScheduleController._apply_rule_fields(rule, request.get_json(silent=True) or {})
+        if error:
+            db.session.rollback()
+            return jsonify({"message": error}), 400
+
+        db.session.commit()
+        get_schedule_index().invalidate(rule.server_id)
+        return jsonify({"success": True, "data": ScheduleController._rule_to_dict(rule)})
+
+    @staticmethod
+    def delete_rule(server_id, rule_id):
+        rule = ScheduleRule.query.get(rule_id)
+        if not rule or rule.server_id != int(server_id):
+            return jsonify({"message": "Schedule rule not found"}), 404
+
+        db.session.delete(rule)
+        db.session.commit()
+        get_schedule_index().invalidate(int(server_id))
+        return jsonify({"success": True})
@@ -1,38 +1,61 @@
 # controllers/server_controller.py
-from flask import request
+from flask import current_app, request
 from models.server import Server
 from models.database import db
 from services.power_control_service import PowerControlService
 from services.server_state_monitor_service import ServerStateMonitorService
-from datetime import datetime, UTC
+from services.server_serializer import ServerSerializer, SERVER_FIELDS
+from sqlalchemy.orm import load_only
 
 class ServerController:
 
     @staticmethod
-    def get_all():
-        servers = Server.query.all()
-        return [
-            {
-                "id": s.id,
-                "name": s.name,
-                "ipmi_host": s.ipmi_host,
-                "power_state": s.power_state,
-                "last_update_time": s.last_update_time,
-                "is_idle": s.is_idle,
-                "idle_start_time": s.idle_start_time,
-                "idle_duration_mins": (
-                    ServerController._calculate_idle_duration(s.idle_start_time)
-                    if s.is_idle
-                    else 0
-                ),
-                "idle_threshold_mins": s.idle_threshold_mins,
-                "current_usage": {
-                    "cpu_usage": s.cpu_usage,
-                    "gpu_usage": s.gpu_usage
-                }
-            }
-            for s in servers
-        ]
+    def _json_response(body):
+        """Wrap pre-encoded JSON bytes in a response"""
+        return current_app.response_class(body, mimetype='application/json')
+
+    @staticmethod
+    def get_all(args=None):
+        """
+        List servers. Filters, keyset pagination and the field projection are
+        applied in SQL so the work scales with the result, not the fleet.
+        """
+        args = args or {}
+        fields = args.get('fields')
+        if fields:
+            unknown = [f for f in fields if f not in SERVER_FIELDS]
+            if unknown:
+                return {"message": f"Unknown fields: {', '.join(unknown)}"}, 400
+
+        query = Server.query
+        if args.get('power_state'):
+            query = query.filter(Server.power_state.in_([p.upper() for p in args['power_state']]))
+        if args.get('is_idle') is not None:
+            query = query.filter(Server.is_idle == args['is_idle'])
+        if args.get('auto_shutdown_enabled') is not None:
+            query = query.filter(Server.auto_shutdown_enabled == args['auto_shutdown_enabled'])
+        if args.get('name_prefix'):
+            query = query.filter(Server.name.startswith(args['name_prefix'], autoescape=True))
+        if args.get('after') is not None:
+            query = query.filter(Server.id > args['after'])
+        if fields:
+            columns = ServerSerializer.compile(fields).columns
+            query = query.options(load_only(*[getattr(Server, c) for c in columns]))
+
+        query = query.order_by(Server.id)
+        limit = args.get('limit')
+        if limit:
+            servers = query.limit(limit + 1).all()
+            has_more = len(servers) > limit
+            servers = servers[:limit]
+        else:
+            servers = query.all()
+            has_more = False
+
+        response = ServerController._json_response(ServerSerializer.encode_list(servers, fields))
+        if has_more:
+            response.headers['X-Next-Cursor'] = str(servers[-1].id)
+        return response
 
     @staticmethod
     def _get_server_by_name(server_name):
@@ -44,72 +67,21 @@ class ServerController:
             return None, ({"message": f"Server '{server_name}' not found"}, 404)
         return server, None
 
-    @staticmethod
-    def _calculate_idle_duration(idle_start_time):
-        """
-        Calculate idle duration in minutes, handling timezone-aware and naive datetimes
-        """
-        if not idle_start_time:
-            return 0
-            
-        # Convert idle_start_time to UTC if it's naive
-        if idle_start_time.tzinfo is None:
-            idle_start_time = idle_start_time.replace(tzinfo=UTC)
-            
-        now = datetime.now(UTC)
-        return round((now - idle_start_time).total_seconds() / 60.0)
-
     @staticmethod
     def get_status(server_id):
         server = Server.query.get(server_id)
         if not server:
             return {"message": "Server not found"}, 404
-        
-        return {
-            "id": server.id,
-            "name": server.name,
-            "ipmi_host": server.ipmi_host,
-            "power_state": server.power_state,
-            "last_update_time": server.last_update_time,
-            "is_idle": server.is_idle,
-            "idle_start_time": server.idle_start_time,
-            "idle_duration_mins": (
-                ServerController._calculate_idle_duration(server.idle_start_time)
-                if server.is_idle
-                else 0
-            ),
-            "idle_threshold_mins": server.idle_threshold_mins,
-            "current_usage": {
-                "cpu_usage": server.cpu_usage,
-                "gpu_usage": server.gpu_usage
-            }
-        }
+
+        return ServerController._json_response(ServerSerializer.encode(server))
 
     @staticmethod
     def get_status_by_name(server_name):
         server, error = ServerController._get_server_by_name(server_name)
         if error:
             return error
-        
-        return {
-            "id": server.id,
-            "name": server.name,
-            "ipmi_host": server.ipmi_host,
-            "power_state": server.power_state,
-            "last_update_time": server.last_update_time,
-            "is_idle": server.is_idle,
-            "idle_start_time": server.idle_start_time,
-            "idle_duration_mins": (
-                ServerController._calculate_idle_duration(server.idle_start_time)
-                if server.is_idle
-                else 0
-            ),
-            "idle_threshold_mins": server.idle_threshold_mins,
-            "current_usage": {
-                "cpu_usage": server.cpu_usage,
-                "gpu_usage": server.gpu_usage
-            }
-        }
+
+        return ServerController._json_response(ServerSerializer.encode(server))
     
     @staticmethod
     def power_on(server_id):
@@ -117,6 +89,10 @@ class ServerController:
         if not server:
             return {"message": "Server not found"}, 404
         
+        if server.power_state in ('ON', 'POWERING_ON'):
+            return {"success": True, "message": f"Server is already {server.power_state.lower().replace('_', ' ')}"}
+        if server.power_state == 'POWERING_OFF':
+            return {"success": False, "message": "Server is powering off, try again once it is off"}, 409
         success = PowerControlService.startup(server)
         if success:
             return {"success": True, "message": "Server is powering on..."}
@@ -128,6 +104,10 @@ class ServerController:
         if error:
             return error
         
+        if server.power_state in ('ON', 'POWERING_ON'):
+            return {"success": True, "message": f"Server '{server_name}' is already {server.power_state.lower().replace('_', ' ')}"}
+        if server.power_state == 'POWERING_OFF':
+            return {"success": False, "message": f"Server '{server_name}' is powering off, try again once it is off"}, 409
         success = PowerControlService.startup(server)
         if success:
             return {"success": True, "message": f"Server '{server_name}' is powering on..."}
@@ -139,6 +119,10 @@ class ServerController:
         if not server:
             return {"message": "Server not found"}, 404
         
+        if server.power_state in ('OFF', 'POWERING_OFF'):
+            return {"success": True, "message": f"Server is already {server.power_state.lower().replace('_', ' ')}"}
+        if server.power_state == 'POWERING_ON':
+            return {"success": False, "message": "Server is powering on, try again once it is on"}, 409
         success = PowerControlService.shutdown(server)
         if success:
             return {"success": True, "message": "Server is shutting down..."}
@@ -150,6 +134,10 @@ class ServerController:
         if error:
             return error
         
+        if server.power_state in ('OFF', 'POWERING_OFF'):
+            return {"success": True, "message": f"Server '{server_name}' is already {server.power_state.lower().replace('_', ' ')}"}
+        if server.power_state == 'POWERING_ON':
+            return {"success": False, "message": f"Server '{server_name}' is powering on, try again once it is on"}, 409
         success = PowerControlService.shutdown(server)
         if success:
             return {"success": True, "message": f"Server '{server_name}' is shutting down..."}
@@ -1,6 +1,16 @@
-from flask import request, jsonify
+from flask import current_app, request, jsonify
 from models.server import Server
+from models.schedule import Schedule
+from models.schedule_rule import ScheduleRule
+from models.power_sample import PowerSample
 from models.database import db
+from services.server_serializer import ServerSerializer
+from services.schedule_service import get_schedule_index
+from services.sample_buffer import get_sample_buffers
+from services.live_usage import live_usage
+from services.rollup_service import RollupService
+from services.server_import_service import ImportFormatError, ServerImportService
+from services.bmc_discovery_service import BMCDiscoveryService, DiscoveryError
 
 class ServerManagementController:
     
@@ -28,7 +38,8 @@ class ServerManagementController:
                 name=data['name'],
                 ipmi_host=data['ipmi_host'],
                 ipmi_user=data['ipmi_user'],
-                ipmi_pass=data['ipmi_pass']
+                ipmi_pass=data['ipmi_pass'],
+                site=data.get('site') or None
             )
             db.session.add(new_server)
             db.session.commit()
@@ -67,6 +78,8 @@ class ServerManagementController:
                 server.ipmi_user = data['ipmi_user']
             if 'ipmi_pass' in data:
                 server.ipmi_pass = data['ipmi_pass']
+            if 'site' in data:
+                server.site = data['site'] or None
             
             db.session.commit()
             
@@ -93,9 +106,84 @@ class ServerManagementController:
             return jsonify({"message": f"Server '{server_name}' not found"}), 404
         
         try:
+            server_id = server.id
+            Schedule.query.filter_by(server_id=server_id).delete()
+            ScheduleRule.query.filter_by(server_id=server_id).delete()
+            PowerSample.query.filter_by(server_id=server_id).delete()
+            RollupService.forget_server(server_id)
             db.session.delete(server)
             db.session.commit()
+            ServerSerializer.invalidate(server_id)
+            get_schedule_index().invalidate(server_id)
+            get_sample_buffers().forget(server_id)
+            live_usage.forget(server_id)
+            fleet = current_app.extensions.get('fleet_state')
+            if fleet is not None:
+                fleet.release(server_id)
             return jsonify({"message": f"Server '{server_name}' deleted successfully"})
         except Exception as e:
             db.session.rollback()
-            return jsonify({"message": f"Failed to delete server: {str(e)}"}), 500 
\ No newline at end of file
+            return jsonify({"message": f"Failed to delete server: {str(e)}"}), 500
+
+    @staticmethod
+    def import_servers(args):
+        """
+        Bulk create or update servers from an uploaded CSV/JSON/YAML inventory
+        """
+        upload = args.get('file')
+        if upload is not None:
+            stream = upload.stream
+            fmt = args.get('format') or ServerImportService.detect_format(upload.filename, upload.mimetype)
+        else:
+            stream = request.stream
+            fmt = args.get('format') or ServerImportService.detect_format(content_type=request.content_type)
+        if not fmt:
+            return {"message": "Could not determine inventory format, pass ?format=csv|json|yaml"}, 400
+
+        try:
+            report = ServerImportService.upsert(
+                ServerImportService.iter_records(stream, fmt),
+                update_existing=args.get('update_existing', True),
+                dry_run=args.get('dry_run', False)
+            )
+        except (ImportFormatError, UnicodeDecodeError) as e:
+            return {"message": f"Invalid inventory: {str(e)}"}, 400
+        except Exception as e:
+            return {"message": f"Failed to import servers: {str(e)}"}, 500
+
+        return report
+
+    @staticmethod
+    def discover_servers():
+        """
+        Sweep CIDR ranges for BMCs and register or refresh the ones that respond
+        """
+        data = request.get_json() or {}
+        cidrs = data.get('cidrs')
+        credentials = data.get('credentials')
+        if not cidrs or not isinstance(cidrs, list):
+            return {"message": "cidrs must be a non-empty list"}, 400
+        if not credentials or not all(
+            isinstance(c, dict) and c.get('ipmi_user') and c.get('ipmi_pass') for c in credentials
+        ):
+            return {"message": "credentials must be a list of {ipmi_user, ipmi_pass}"}, 400
+
+        config = current_app.config
+        try:
+            return BMCDiscoveryService.discover(
+                cidrs,
+                credentials,
+                port=int(data.get('port', 623)),
+                rate=config['DISCOVERY_RATE'],
+                timeout=config['DISCOVERY_TIMEOUT'],
+                retries=config['DISCOVERY_RETRIES'],
+                concurrency=config['DISCOVERY_AUTH_CONCURRENCY'],
+                max_hosts=config['DISCOVERY_MAX_HOSTS'],
+                check_credentials=bool(data.get('check_credentials', True)),
+                register=bool(data.get('register', True)),
+                name_template=data.get('name_template') or 'bmc-{ip_dashed}'
+            )
+        except (DiscoveryError, KeyError, ValueError) as e:
+            return {"message": f"Invalid discovery request: {str(e)}"}, 400
+        except Exception as e:
+            return {"message": f"Discovery failed: {str(e)}"}, 500
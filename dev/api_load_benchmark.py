@@ -0,0 +1,392 @@
+"""
+Offline load benchmark for the Flask API.
+
+Simulates the traffic shape produced by static/js/main.js: K dashboards
+polling /api/servers once per second, plus periodic bursts of /status
+lookups and power actions. The IPMI and InfluxDB backends are stubbed so
+the whole run stays on localhost.
+
+Usage:
+    python dev/api_load_benchmark.py --servers 1000 --dashboards 20 --duration 30
+    python dev/api_load_benchmark.py --server-mode gunicorn --workers 4
+    python dev/api_load_benchmark.py --server-mode both --json bench_output.json
+    python dev/pg_throwaway.py -- sh -c 'python dev/api_load_benchmark.py --database-uri "$DATABASE_URL"'
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import requests
+
+from config.config import database_url
+
+# Environment variables used to hand settings to the server process
+ENV_DATABASE_URI = 'BENCH_DATABASE_URI'
+ENV_IPMI_LATENCY_MS = 'BENCH_IPMI_LATENCY_MS'
+ENV_MONITOR = 'BENCH_MONITOR'
+ENV_WORKDIR = 'BENCH_WORKDIR'
+
+
+# ---------------------------------------------------------------------------
+# Server side: app factory with stubbed backends and a per-request query counter
+# ---------------------------------------------------------------------------
+
+def _install_stubs():
+    """Replace the IPMI and InfluxDB backends with local fakes"""
+    from services.power_control_service import PowerControlService
+    from services.server_state_monitor_service import ServerStateMonitorService
+
+    latency = int(os.environ.get(ENV_IPMI_LATENCY_MS, '50')) / 1000.0
+    power_states = {}
+    lock = threading.Lock()
+
+    def fake_ipmi_command(server, action, timeout=None):
+        time.sleep(latency)
+        with lock:
+            if action == 'on':
+                power_states[server.ipmi_host] = 'on'
+            elif action in ('off', 'soft'):
+                power_states[server.ipmi_host] = 'off'
+            state = power_states.setdefault(server.ipmi_host, 'on')
+        output = f"Chassis Power is {state}\n"
+        if action in PowerControlService.IPMI_BATCHES:
+            watts = random.randint(250, 900) if state == 'on' else random.randint(5, 15)
+            output += f"    Instantaneous power reading: {watts} Watts\n"
+        return True, output
+
+    def fake_query_influxdb(query, *args, **kwargs):
+        now_ms = int(time.time() * 1000)
+        if 'nvidia_smi' in query:
+            columns = ['time', 'utilization_gpu', 'memory_used', 'memory_total']
+            series = [{'name': 'nvidia_smi', 'tags': {'index': str(gpu)}, 'columns': columns,
+                       'values': [[now_ms, random.uniform(0, 100), random.uniform(0, 80000), 81920]]}
+                      for gpu in range(8)]
+            return {'results': [{'statement_id': 0, 'series': series}]}
+        else:
+            columns = ['time', 'usage_idle', 'usage_system', 'usage_user']
+            idle = random.uniform(0, 100)
+            values = [now_ms, idle, (100 - idle) / 2, (100 - idle) / 2]
+        return {'results': [{'statement_id': 0,
+                             'series': [{'name': 'stub', 'columns': columns, 'values': [values]}]}]}
+
+    PowerControlService._execute_ipmi_command = staticmethod(fake_ipmi_command)
+    ServerStateMonitorService.query_influxdb = staticmethod(fake_query_influxdb)
+
+
+def _install_query_counter(app):
+    """Count SQL statements per request and expose them as X-DB-Queries"""
+    from flask import g, has_request_context
+    from sqlalchemy import event
+    from models.database import db
+
+    def count_query(*args, **kwargs):
+        if has_request_context():
+            g.bench_db_queries = g.get('bench_db_queries', 0) + 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_query)
+
+    @app.after_request
+    def add_query_header(response):
+        response.headers['X-DB-Queries'] = str(g.get('bench_db_queries', 0))
+        return response
+
+
+def create_bench_app():
+    """App factory used by both the dev server and gunicorn"""
+    from config.config import DevelopmentConfig, config, engine_options
+
+    class BenchmarkConfig(DevelopmentConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = os.environ[ENV_DATABASE_URI]
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+        SESSION_FILE_DIR = os.path.join(os.environ[ENV_WORKDIR], 'flask_session')
+
+    config['benchmark'] = BenchmarkConfig
+    _install_stubs()
+
+    from app import create_app
+    app = create_app('benchmark', start_scheduler=os.environ.get(ENV_MONITOR, '1') == '1')
+    _install_query_counter(app)
+    return app
+
+
+def seed_database(database_uri, server_count):
+    """Create the schema and insert the simulated fleet"""
+    from flask import Flask
+    from sqlalchemy import insert
+    from models.database import db
+    from models.server import Server
+    from models.schedule import Schedule  # noqa: F401 - registers the table
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        rows = [
+            {
+                'name': f"NV{num:04d}",
+                'ipmi_host': f"10.{8 + num // 65536}.{(num // 256) % 256}.{num % 256}",
+                'ipmi_user': 'admin',
+                'ipmi_pass': 'admin',
+                'power_state': 'ON' if num % 3 else 'OFF',
+                'is_idle': num % 2 == 0,
+                'idle_threshold_mins': 30,
+                'auto_shutdown_enabled': num % 5 == 0,
+            }
+            for num in range(1, server_count + 1)
+        ]
+        db.session.execute(insert(Server), rows)
+        db.session.commit()
+    return [row['name'] for row in rows]
+
+
+def serve_dev(port):
+    """Run the app under the Werkzeug development server"""
+    from werkzeug.serving import run_simple
+    run_simple('127.0.0.1', port, create_bench_app(), threaded=True)
+
+
+# ---------------------------------------------------------------------------
+# Client side: traffic generator and reporting
+# ---------------------------------------------------------------------------
+
+class Recorder:
+    """Thread-safe collector of per-endpoint latencies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, kind, latency, db_queries, ok):
+        with self._lock:
+            entry = self.samples.setdefault(kind, {'latencies': [], 'queries': [], 'errors': 0})
+            entry['latencies'].append(latency)
+            if db_queries is not None:
+                entry['queries'].append(db_queries)
+            if not ok:
+                entry['errors'] += 1
+
+
+def _timed_request(session, recorder, kind, method, url):
+    start = time.perf_counter()
+    try:
+        response = session.request(method, url, timeout=30)
+        latency = time.perf_counter() - start
+        queries = response.headers.get('X-DB-Queries')
+        recorder.record(kind, latency, int(queries) if queries is not None else None,
+                        response.status_code < 500)
+    except requests.RequestException:
+        recorder.record(kind, time.perf_counter() - start, None, False)
+
+
+def _dashboard_loop(base_url, recorder, stop_event):
+    """One browser tab: GET /api/servers every second, like loadServerList"""
+    session = requests.Session()
+    stop_event.wait(random.random())
+    while not stop_event.is_set():
+        tick = time.perf_counter()
+        _timed_request(session, recorder, 'list', 'GET', f"{base_url}/api/servers")
+        stop_event.wait(max(0.0, 1.0 - (time.perf_counter() - tick)))
+
+
+def _burst_loop(base_url, recorder, stop_event, server_names, args):
+    """Periodic bursts of status lookups and power actions"""
+    session = requests.Session()
+    with ThreadPoolExecutor(max_workers=args.burst_size) as pool:
+        while not stop_event.wait(args.burst_interval):
+            jobs = []
+            for _ in range(args.burst_size):
+                num = random.randrange(len(server_names))
+                name = server_names[num]
+                if random.random() < args.power_ratio:
+                    action = random.choice(['on', 'off'])
+                    jobs.append(('power', 'POST', f"{base_url}/api/servers/name/{name}/power/{action}"))
+                elif random.random() < 0.5:
+                    jobs.append(('status', 'GET', f"{base_url}/api/servers/{num + 1}/status"))
+                else:
+                    jobs.append(('status', 'GET', f"{base_url}/api/servers/name/{name}/status"))
+            for kind, method, url in jobs:
+                pool.submit(_timed_request, session, recorder, kind, method, url)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, duration):
+    report = {}
+    for kind, entry in sorted(recorder.samples.items()):
+        latencies = sorted(entry['latencies'])
+        queries = entry['queries']
+        report[kind] = {
+            'requests': len(latencies),
+            'errors': entry['errors'],
+            'throughput_rps': round(len(latencies) / duration, 2),
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+            'db_queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return report
+
+
+def print_report(mode, report):
+    print(f"\n=== {mode} ===")
+    print(f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>9}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+    for kind, stats in report.items():
+        queries = stats['db_queries_per_request']
+        print(f"{kind:<10}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>9}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+              f"{'-' if queries is None else queries:>9}")
+
+
+def _start_server(mode, port, args, env, log_file):
+    if mode == 'dev':
+        command = [sys.executable, os.path.abspath(__file__), '--serve-dev', '--port', str(port)]
+    else:
+        if shutil.which('gunicorn') is None:
+            return None
+        command = [
+            'gunicorn', '--chdir', ROOT_DIR,
+            '-w', str(args.workers), '-k', 'gthread', '--threads', str(args.threads),
+            '-b', f"127.0.0.1:{port}", '--log-level', 'warning',
+            'dev.api_load_benchmark:create_bench_app()'
+        ]
+    return subprocess.Popen(command, cwd=ROOT_DIR, env=env,
+                            stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def _wait_until_ready(base_url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if requests.get(f"{base_url}/api/servers/1/status", timeout=2).status_code < 500:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def run_mode(mode, args, server_names, env):
+    port = args.port
+    log_path = os.path.join(env[ENV_WORKDIR], f"{mode}-server.log")
+    log_file = open(log_path, 'w')
+    process = _start_server(mode, port, args, env, log_file)
+    if process is None:
+        log_file.close()
+        print(f"\nSkipping {mode}: gunicorn is not installed")
+        return None
+
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        if not _wait_until_ready(base_url, process):
+            log_file.flush()
+            with open(log_path) as f:
+                print(f"\n{mode} server failed to start:\n{f.read()[-2000:]}")
+            return None
+
+        recorder = Recorder()
+        stop_event = threading.Event()
+        threads = [
+            threading.Thread(target=_dashboard_loop, args=(base_url, recorder, stop_event), daemon=True)
+            for _ in range(args.dashboards)
+        ]
+        threads.append(threading.Thread(
+            target=_burst_loop, args=(base_url, recorder, stop_event, server_names, args), daemon=True))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=35)
+        elapsed = time.perf_counter() - start
+
+        report = summarize(recorder, elapsed)
+        print_report(mode, report)
+        return report
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log_file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load benchmark for the server management API')
+    parser.add_argument('--servers', type=int, default=1000, help='Number of simulated servers')
+    parser.add_argument('--dashboards', type=int, default=10, help='Concurrent dashboards polling at 1 Hz')
+    parser.add_argument('--duration', type=float, default=20, help='Measurement duration in seconds')
+    parser.add_argument('--burst-interval', type=float, default=2.0, help='Seconds between request bursts')
+    parser.add_argument('--burst-size', type=int, default=10, help='Requests per burst')
+    parser.add_argument('--power-ratio', type=float, default=0.2, help='Share of burst requests that are power actions')
+    parser.add_argument('--ipmi-latency-ms', type=int, default=50, help='Simulated IPMI round trip')
+    parser.add_argument('--no-monitor', action='store_true', help='Do not run the background monitor jobs')
+    parser.add_argument('--server-mode', choices=['dev', 'gunicorn', 'both'], default='dev')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--database-uri', help='Seed and serve this (empty) database instead of a temporary SQLite '
+                                               'file, e.g. from dev/pg_throwaway.py')
+    parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+    parser.add_argument('--serve-dev', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_dev:
+        serve_dev(args.port)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='api-bench-')
+    database_uri = database_url(args.database_uri) or f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+    env = dict(os.environ)
+    env[ENV_DATABASE_URI] = database_uri
+    env[ENV_IPMI_LATENCY_MS] = str(args.ipmi_latency_ms)
+    env[ENV_MONITOR] = '0' if args.no_monitor else '1'
+    env[ENV_WORKDIR] = workdir
+    env['FLASK_ENV'] = 'development'
+
+    print(f"Seeding {args.servers} servers into {database_uri}")
+    server_names = seed_database(database_uri, args.servers)
+
+    modes = ['dev', 'gunicorn'] if args.server_mode == 'both' else [args.server_mode]
+    results = {}
+    try:
+        for mode in modes:
+            report = run_mode(mode, args, server_names, env)
+            if report is not None:
+                results[mode] = report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"\nReport written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Local UDP BMC simulator for testing BMC discovery.
+
+Binds one UDP socket per address in a loopback range and answers RMCP
+"Get Channel Authentication Capabilities" requests the way a BMC does.
+
+Usage:
+    python dev/bmc_simulator.py --cidr 127.0.10.0/26 --port 6623
+    python init_servers.py --discover 127.0.10.0/24 --port 6623 --credential admin:admin --no-auth-check
+
+Simulating a whole /22 needs about 1024 sockets; raise the limit with
+`ulimit -n 4096` first.
+"""
+import argparse
+import asyncio
+import ipaddress
+import random
+
+
+def build_channel_auth_response(request):
+    """Build a Get Channel Authentication Capabilities reply, or None for other packets"""
+    if len(request) < 21 or request[0] != 0x06 or request[3] != 0x07 or request[19] != 0x38:
+        return None
+
+    rq_seq = request[18]
+    body = bytes([
+        0x20, rq_seq, 0x38,        # rsAddr, rqSeq, command
+        0x00,                      # completion code
+        0x01,                      # channel number
+        0x97,                      # IPMI v2.0 extended data + none/MD2/MD5/password auth
+        0x04,                      # per-message authentication disabled
+        0x02,                      # supports IPMI v2.0 (RMCP+)
+        0x00, 0x00, 0x00,          # OEM id
+        0x00,                      # OEM auxiliary data
+    ])
+    header = bytes([0x81, 0x1c])   # rqAddr, NetFn App response
+    message = header + bytes([(-sum(header)) & 0xff]) + body + bytes([(-sum(body)) & 0xff])
+    return bytes([0x06, 0x00, 0xff, 0x07, 0x00] + [0x00] * 8 + [len(message)]) + message
+
+
+class SimulatedBMC(asyncio.DatagramProtocol):
+    def __init__(self, loss):
+        self.loss = loss
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if self.loss and random.random() < self.loss:
+            return
+        response = build_channel_auth_response(data)
+        if response is not None:
+            self.transport.sendto(response, addr)
+
+
+async def serve(cidr, port, loss):
+    loop = asyncio.get_running_loop()
+    network = ipaddress.ip_network(cidr, strict=False)
+    addresses = list(network.hosts()) if network.num_addresses > 2 else list(network)
+    transports = []
+    for address in addresses:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: SimulatedBMC(loss), local_addr=(str(address), port)
+        )
+        transports.append(transport)
+    print(f"Simulating {len(transports)} BMCs on {cidr} port {port} (loss {loss:.0%})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for transport in transports:
+            transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate IPMI BMCs on loopback addresses')
+    parser.add_argument('--cidr', default='127.0.10.0/26', help='Loopback range to answer on')
+    parser.add_argument('--port', type=int, default=6623, help='UDP port (real BMCs use 623)')
+    parser.add_argument('--loss', type=float, default=0.0, help='Fraction of requests to drop')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.cidr, args.port, args.loss))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
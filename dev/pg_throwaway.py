@@ -0,0 +1,103 @@
+"""
+Throwaway PostgreSQL server for local runs, no container needed.
+
+Creates a cluster with initdb in a temporary directory, starts it on a
+Unix socket inside that directory (no TCP listener, durability turned
+off) and deletes everything when done. initdb and pg_ctl are taken from
+$PG_BIN, the PATH or /usr/lib/postgresql/*/bin. PostgreSQL refuses to
+run as root.
+
+Usage:
+    python dev/pg_throwaway.py
+    python dev/pg_throwaway.py -- sh -c 'python dev/api_load_benchmark.py --database-uri "$DATABASE_URL"'
+
+Without a command the URL is printed and the server runs until Ctrl-C;
+with one, the command runs with DATABASE_URL set and its exit code is
+returned.
+"""
+import argparse
+import contextlib
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+DEFAULT_DATABASE = 'cgi_server_management'
+
+# Settings for a disposable cluster: local socket only, no crash safety
+SERVER_OPTIONS = {
+    'listen_addresses': "''",
+    'fsync': 'off',
+    'synchronous_commit': 'off',
+    'full_page_writes': 'off',
+    'max_connections': '200',
+}
+
+
+def find_binary(name):
+    directories = [os.environ.get('PG_BIN')] + sorted(glob.glob('/usr/lib/postgresql/*/bin'), reverse=True)
+    for directory in directories:
+        if directory and os.access(os.path.join(directory, name), os.X_OK):
+            return os.path.join(directory, name)
+    path = shutil.which(name)
+    if path:
+        return path
+    raise SystemExit(f"{name} not found; install PostgreSQL or set PG_BIN")
+
+
+@contextlib.contextmanager
+def throwaway_postgres(database=DEFAULT_DATABASE):
+    """Run a temporary PostgreSQL server
+
+    Yields:
+        str: SQLAlchemy URL of an empty database on it
+    """
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        raise SystemExit("PostgreSQL cannot run as root; run this as an unprivileged user")
+    initdb, pg_ctl = find_binary('initdb'), find_binary('pg_ctl')
+
+    workdir = tempfile.mkdtemp(prefix='pg-throwaway-')
+    datadir = os.path.join(workdir, 'data')
+    options = ' '.join(f"-c {name}={value}" for name, value in SERVER_OPTIONS.items())
+    try:
+        subprocess.run([initdb, '-D', datadir, '-U', 'postgres', '-A', 'trust', '-E', 'UTF8', '--no-sync'],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([pg_ctl, '-D', datadir, '-l', os.path.join(workdir, 'postgres.log'), '-w',
+                        '-o', f"{options} -c unix_socket_directories={workdir}", 'start'],
+                       check=True, stdout=subprocess.DEVNULL)
+        try:
+            import psycopg
+            with psycopg.connect(host=workdir, user='postgres', dbname='postgres', autocommit=True) as conn:
+                conn.execute(f'CREATE DATABASE "{database}"')
+            yield f"postgresql+psycopg://postgres@/{database}?host={workdir}"
+        finally:
+            subprocess.run([pg_ctl, '-D', datadir, '-m', 'immediate', 'stop'],
+                           check=False, stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a temporary PostgreSQL server')
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help='Name of the database to create')
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help='Command to run with DATABASE_URL set (after --)')
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+
+    with throwaway_postgres(args.database) as url:
+        if command:
+            return subprocess.run(command, env=dict(os.environ, DATABASE_URL=url)).returncode
+        print(url, flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
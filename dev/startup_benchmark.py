@@ -0,0 +1,140 @@
+"""
+Startup benchmark for the Flask app.
+
+Starts the app in a fresh interpreter several times and reports how long
+it takes to import, build the app, answer /healthz and report ready on
+/readyz (first fleet snapshot loaded). The scheduler is not started so
+the numbers cover request serving only.
+
+Usage:
+    python dev/startup_benchmark.py --runs 5
+    python dev/startup_benchmark.py --database-uri sqlite:////tmp/fleet.sqlite --importtime 15
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Runs in the child: time the import and the factory, then serve on the given port
+SERVER_SCRIPT = """
+import json, os, sys, time
+started = time.perf_counter()
+from config.config import DevelopmentConfig, config
+
+class StartupConfig(DevelopmentConfig):
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = os.environ['STARTUP_DATABASE_URI']
+    SESSION_FILE_DIR = os.path.join(os.environ['STARTUP_WORKDIR'], 'flask_session')
+
+config['startup'] = StartupConfig
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app('startup', start_scheduler=False)
+created = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported}), flush=True)
+
+import logging
+from werkzeug.serving import make_server
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+make_server('127.0.0.1', int(sys.argv[1]), app, threaded=True).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, deadline, ok_status=200):
+    """Poll a URL until it answers with ok_status, returning the time it did"""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == ok_status:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} did not answer {ok_status} in time")
+
+
+def run_once(database_uri, workdir, timeout):
+    port = free_port()
+    env = dict(os.environ, STARTUP_DATABASE_URI=database_uri, STARTUP_WORKDIR=workdir,
+               START_SCHEDULER='false', LOG_LEVEL='WARNING')
+    spawned = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-c', SERVER_SCRIPT, str(port)], cwd=ROOT_DIR,
+                            env=env, stdout=subprocess.PIPE, text=True)
+    try:
+        deadline = spawned + timeout
+        healthy = wait_for(f"http://127.0.0.1:{port}/healthz", deadline)
+        ready = wait_for(f"http://127.0.0.1:{port}/readyz", deadline)
+        timings = json.loads(proc.stdout.readline())
+    finally:
+        proc.terminate()
+        proc.wait()
+    timings.update(healthz=healthy - spawned, readyz=ready - spawned)
+    return timings
+
+
+def import_profile(top):
+    """Slowest direct imports of app.py (cumulative) according to -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT_DIR,
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)', line)
+        if match and len(match.group(2)) == 3:  # direct children of `app`
+            rows.append((int(match.group(1)), match.group(3)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import-to-ready time of the app')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts')
+    parser.add_argument('--database-uri', help='Database to serve (default: an empty SQLite file)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds to wait for each start')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                        help='Also list the N slowest imports of app.py')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='startup-bench-') as workdir:
+        database_uri = args.database_uri
+        if database_uri is None:
+            database_uri = f"sqlite:///{os.path.join(workdir, 'startup.sqlite')}"
+            sys.path.insert(0, ROOT_DIR)
+            from flask import Flask
+            from models.database import db
+            import models.server, models.schedule  # noqa: F401 - registers the tables
+            seed_app = Flask(__name__)
+            seed_app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+            db.init_app(seed_app)
+            with seed_app.app_context():
+                db.create_all()
+
+        runs = [run_once(database_uri, workdir, args.timeout) for _ in range(args.runs)]
+
+    print(f"{'phase':<12}{'median ms':>12}{'max ms':>10}")
+    for phase in ('import', 'create_app', 'healthz', 'readyz'):
+        values = [run[phase] * 1000 for run in runs]
+        print(f"{phase:<12}{statistics.median(values):>12.1f}{max(values):>10.1f}")
+
+    if args.importtime:
+        print("\nSlowest imports of app.py (cumulative):")
+        for micros, module in import_profile(args.importtime):
+            print(f"{micros / 1000:>10.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 from models.server import Server
 from models.schedule import Schedule
 from models.database import db
-from datetime import datetime, UTC
+from services.server_import_service import ImportFormatError, ServerImportService
+from services.bmc_discovery_service import BMCDiscoveryService, DiscoveryError
 from flask import Flask
 from config.config import config
+import argparse
+import json
 import os
+import sys
 
 def create_app(config_name='development'):
     """Create Flask application with the specified configuration."""
@@ -29,28 +33,66 @@ def init_nv_servers(start_num: int = 2, end_num: int = 29,
     """
     Initialize NV servers in the database using the existing Server model
     """
-    for num in range(start_num, end_num + 1):
-        server_name = f"NV{num:02d}"
-        ipmi_host = f"10.8.4.{num}"
-        
-        # Check if server already exists
-        existing_server = Server.query.filter_by(name=server_name).first()
-        if not existing_server:
-            new_server = Server(
-                name=server_name,
-                ipmi_host=ipmi_host,
-                ipmi_user=ipmi_user,
-                ipmi_pass=ipmi_pass,
-                power_state='OFF',
-                last_update_time=datetime.now(UTC),
-                is_idle=False,
-                idle_threshold_mins=30,
-                auto_shutdown_enabled=False
-            )
-            db.session.add(new_server)
+    records = (
+        (num, {
+            "name": f"NV{num:02d}",
+            "ipmi_host": f"10.8.4.{num}",
+            "ipmi_user": ipmi_user,
+            "ipmi_pass": ipmi_pass,
+        })
+        for num in range(start_num, end_num + 1)
+    )
+    
+    # Existing servers are left untouched
+    return ServerImportService.upsert(records, update_existing=False)
+
+def import_servers(path: str, fmt: str = None, update_existing: bool = True, dry_run: bool = False):
+    """
+    Bulk import servers from a CSV/JSON/YAML inventory file
+    """
+    fmt = fmt or ServerImportService.detect_format(filename=path)
+    if not fmt:
+        raise ImportFormatError(f"Cannot detect the format of {path}, use --format")
+    
+    with open(path, 'rb') as f:
+        return ServerImportService.upsert(
+            ServerImportService.iter_records(f, fmt),
+            update_existing=update_existing,
+            dry_run=dry_run
+        )
+
+def print_import_report(report):
+    """Print the outcome of an import"""
+    prefix = "[dry run] " if report.get('dry_run') else ""
+    print(f"{prefix}Created: {report['created']}, Updated: {report['updated']}, "
+          f"Skipped: {report['skipped']}, Errors: {len(report['errors'])}")
+    for error in report['errors']:
+        print(f"  Row {error['row']} ({error['name'] or '-'}): {error['error']}")
+
+def discover_servers(cidrs, credentials, port=623, check_credentials=True,
+                     register=True, name_template='bmc-{ip_dashed}', app_config=None):
+    """
+    Sweep CIDR ranges for BMCs and register the ones that respond
+    """
+    app_config = app_config or {}
+    parsed = []
+    for credential in credentials:
+        user, sep, password = credential.partition(':')
+        if not sep:
+            raise DiscoveryError(f"Credential '{credential}' must be user:password")
+        parsed.append({'ipmi_user': user, 'ipmi_pass': password})
     
-    # Commit all changes
-    db.session.commit()
+    return BMCDiscoveryService.discover(
+        cidrs, parsed, port=port,
+        rate=app_config.get('DISCOVERY_RATE', 500),
+        timeout=app_config.get('DISCOVERY_TIMEOUT', 1.0),
+        retries=app_config.get('DISCOVERY_RETRIES', 1),
+        concurrency=app_config.get('DISCOVERY_AUTH_CONCURRENCY', 32),
+        max_hosts=app_config.get('DISCOVERY_MAX_HOSTS', 4096),
+        check_credentials=check_credentials,
+        register=register,
+        name_template=name_template
+    )
 
 def list_all_servers():
     """List all servers in the database"""
@@ -67,7 +109,32 @@ def list_all_servers():
         print(f"Idle Threshold: {server.idle_threshold_mins} minutes")
         print("-" * 70)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Initialize or bulk import servers')
+    parser.add_argument('--import', dest='import_path', metavar='FILE',
+                        help='Import servers from a CSV/JSON/YAML inventory instead of the NV defaults')
+    parser.add_argument('--format', choices=['csv', 'json', 'yaml'],
+                        help='Inventory format, detected from the file extension if omitted')
+    parser.add_argument('--no-update', action='store_true',
+                        help='Skip servers that already exist instead of updating them')
+    parser.add_argument('--dry-run', action='store_true', help='Validate the inventory (or discovery) without writing')
+    parser.add_argument('--discover', nargs='+', metavar='CIDR',
+                        help='Sweep these ranges for BMCs and register the ones that respond')
+    parser.add_argument('--credential', action='append', default=[], metavar='USER:PASS',
+                        help='Candidate IPMI credential for --discover (repeatable, tried in order)')
+    parser.add_argument('--port', type=int, default=623, help='RMCP UDP port for --discover')
+    parser.add_argument('--name-template', default='bmc-{ip_dashed}',
+                        help='Name for discovered servers; {ip}, {ip_dashed}, {last_octet} are substituted')
+    parser.add_argument('--no-auth-check', action='store_true',
+                        help='Register responding BMCs with the first credential without verifying it')
+    parser.add_argument('--json', action='store_true', help='Print the import or discovery report as JSON')
+    parser.add_argument('--if-empty', action='store_true',
+                        help='Only create the tables and add the NV defaults when the database has no servers')
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
     # Get config name from environment or use development as default
     config_name = os.getenv('FLASK_ENV', 'development')
     print(f"Using {config_name} configuration")
@@ -79,6 +146,45 @@ def main():
         # Create all tables
         db.create_all()
         
+        if args.discover:
+            try:
+                report = discover_servers(
+                    args.discover, args.credential, port=args.port,
+                    check_credentials=not args.no_auth_check,
+                    register=not args.dry_run,
+                    name_template=args.name_template,
+                    app_config=app.config
+                )
+            except DiscoveryError as e:
+                print(f"Discovery failed: {e}")
+                sys.exit(1)
+            if args.json:
+                print(json.dumps(report, indent=2))
+            else:
+                print(f"Scanned {report['scanned']} addresses in {report['elapsed_secs']}s: "
+                      f"{len(report['responded'])} responded, {len(report['authenticated'])} authenticated, "
+                      f"{report['created']} created, {report['updated']} updated")
+                for error in report['errors']:
+                    print(f"  {error['ip']}: {error['error']}")
+            sys.exit(0)
+        
+        if args.import_path:
+            try:
+                report = import_servers(args.import_path, args.format,
+                                        update_existing=not args.no_update, dry_run=args.dry_run)
+            except (ImportFormatError, OSError) as e:
+                print(f"Import failed: {e}")
+                sys.exit(1)
+            if args.json:
+                print(json.dumps(report, indent=2))
+            else:
+                print_import_report(report)
+            sys.exit(1 if report['errors'] else 0)
+        
+        if args.if_empty and Server.query.first() is not None:
+            print("Database already has servers, leaving them as they are")
+            sys.exit(0)
+        
         # Initialize servers with default credentials
         init_nv_servers(
             start_num=3,
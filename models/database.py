@@ -1,4 +1,14 @@
 # models/database.py
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+
+def skip_locked(query):
+    """Lock the selected rows until commit, leaving out rows another transaction has locked
+
+    Lets concurrent monitor instances claim work on PostgreSQL without
+    waiting on each other. SQLite has no row locks and ignores the clause;
+    its writers are serialized anyway.
+    """
+    return query.with_for_update(skip_locked=True)
@@ -0,0 +1,15 @@
+# models/monitor_instance.py
+from datetime import datetime
+from models.database import db
+
+class MonitorInstance(db.Model):
+    __tablename__ = 'monitor_instances'
+
+    id = db.Column(db.String(100), primary_key=True)  # MONITOR_INSTANCE_ID, or hostname-pid
+    site = db.Column(db.String(50), nullable=True)  # only takes servers pinned to this site (and unpinned ones)
+    hostname = db.Column(db.String(255), nullable=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<MonitorInstance id={self.id} site={self.site}>"
@@ -0,0 +1,22 @@
+# models/power_sample.py
+from models.database import db
+
+class PowerSample(db.Model):
+    __tablename__ = 'power_samples'
+    __table_args__ = (
+        # Energy queries read one server's samples over a time range
+        db.Index('ix_power_samples_server_time', 'server_id', 'sampled_at'),
+        # The rollup job reads the samples it has not folded in yet
+        db.Index('ix_power_samples_pending', 'id',
+                 sqlite_where=db.text('NOT rolled_up'), postgresql_where=db.text('NOT rolled_up')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id', ondelete='CASCADE'), nullable=False)
+    sampled_at = db.Column(db.DateTime, nullable=False)  # UTC
+    watts = db.Column(db.Float, nullable=False)  # DCMI instantaneous power reading
+    inlet_temp = db.Column(db.Float, nullable=True)  # degrees C, when SDR inlet temperature is collected
+    rolled_up = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # see ServerStateEvent
+
+    def __repr__(self):
+        return f"<PowerSample server_id={self.server_id} sampled_at={self.sampled_at} watts={self.watts}>"
@@ -0,0 +1,15 @@
+# models/rollup_cursor.py
+from models.database import db
+
+class RollupCursor(db.Model):
+    """State of one server as of the rollup watermark, where the next run resumes"""
+    __tablename__ = 'rollup_cursors'
+
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id', ondelete='CASCADE'), primary_key=True)
+    powered = db.Column(db.Boolean, nullable=False)
+    idle = db.Column(db.Boolean, nullable=False)
+    saving = db.Column(db.Boolean, nullable=False, default=False)  # off since an auto-shutdown
+    last_sample_at = db.Column(db.DateTime, nullable=True)  # last power sample integrated
+
+    def __repr__(self):
+        return f"<RollupCursor server_id={self.server_id} powered={self.powered} idle={self.idle}>"
@@ -0,0 +1,16 @@
+# models/rollup_watermark.py
+from models.database import db
+
+class RollupWatermark(db.Model):
+    """How far the rollup job has integrated server states
+
+    Which events and power samples were folded in is kept on the rows
+    themselves (`rolled_up`).
+    """
+    __tablename__ = 'rollup_watermarks'
+
+    name = db.Column(db.String(50), primary_key=True)
+    processed_until = db.Column(db.DateTime, nullable=False)  # UTC; rollups are complete up to here
+
+    def __repr__(self):
+        return f"<RollupWatermark name={self.name} processed_until={self.processed_until}>"
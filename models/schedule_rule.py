@@ -0,0 +1,22 @@
+# models/schedule_rule.py
+from models.database import db
+from datetime import datetime
+
+class ScheduleRule(db.Model):
+    """Recurring no-shutdown window, e.g. weekday lab hours or nightly training"""
+    __tablename__ = 'schedule_rules'
+
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False, index=True)
+    rrule = db.Column(db.String(500), nullable=False)  # RFC 5545 RRULE, e.g. FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR
+    dtstart = db.Column(db.DateTime, nullable=False)  # first occurrence, wall-clock time in `timezone`
+    timezone = db.Column(db.String(64), nullable=False, default='UTC')  # IANA name, e.g. Asia/Taipei
+    duration_mins = db.Column(db.Integer, nullable=False)
+    description = db.Column(db.String(200), nullable=True)
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    server = db.relationship('Server', backref='schedule_rules')
+
+    def __repr__(self):
+        return f"<ScheduleRule id={self.id} server_id={self.server_id} rrule={self.rrule}>"
@@ -4,22 +4,38 @@ from models.database import db
 
 class Server(db.Model):
     __tablename__ = 'servers'
+    __table_args__ = (
+        # Serves the server list filters and the auto-shutdown candidate query
+        db.Index('ix_servers_state_filter', 'power_state', 'is_idle', 'auto_shutdown_enabled'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     ipmi_host = db.Column(db.String(100), nullable=False)
     ipmi_user = db.Column(db.String(100), nullable=False)
     ipmi_pass = db.Column(db.String(100), nullable=False)
-    power_state = db.Column(db.String(20), default='OFF')
+    site = db.Column(db.String(50), nullable=True, index=True)  # pins monitoring to monitor instances of this site
+    # power_state and is_idle load their previous value when set, so state changes can be logged
+    power_state = db.column_property(db.Column(db.String(20), default='OFF'), active_history=True)  # ON, OFF, POWERING_ON or POWERING_OFF
+    transition_deadline = db.Column(db.DateTime, nullable=True)  # when a POWERING_* state is given up
+    transition_cause = db.Column(db.String(20), nullable=True)  # state_change_cause of the settled state, e.g. 'auto_shutdown'
     last_update_time = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Idle monitoring fields
-    is_idle = db.Column(db.Boolean, default=False)
+    is_idle = db.column_property(db.Column(db.Boolean, default=False), active_history=True)
     idle_start_time = db.Column(db.DateTime, nullable=True)
     idle_threshold_mins = db.Column(db.Integer, default=30)  # Default 30 minutes idle threshold
     auto_shutdown_enabled = db.Column(db.Boolean, default=False)  # Whether to auto shutdown when idle
     cpu_usage = db.Column(db.Float, nullable=True)
-    gpu_usage = db.Column(db.Float, nullable=True)
+    gpu_usage = db.Column(db.Float, nullable=True)  # busiest GPU
+    gpus = db.Column(db.JSON, nullable=True)  # per GPU: [{'gpu', 'utilization', 'memory_usage'}]
+    
+    # Boot tracking for schedule pre-warm
+    power_on_issued_at = db.Column(db.DateTime, nullable=True)  # set by startup, cleared at first CPU sample
+    boot_latency_secs = db.Column(db.Float, nullable=True)  # smoothed power-on-to-telemetry latency
+
+    # Not a column: tags the next state event logged for this server (see models/server_state_event.py)
+    state_change_cause = None
 
     def __repr__(self):
         return f"<Server id={self.id} name={self.name}>"
@@ -0,0 +1,23 @@
+# models/server_rollup.py
+from models.database import db
+
+class ServerRollup(db.Model):
+    """Hourly, daily or monthly usage and savings totals of one server"""
+    __tablename__ = 'server_rollups'
+    __table_args__ = (
+        # Fleet-wide reports sum one period over a time range
+        db.Index('ix_server_rollups_period_bucket', 'period', 'bucket_start'),
+    )
+
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id', ondelete='CASCADE'), primary_key=True)
+    period = db.Column(db.String(5), primary_key=True)  # 'hour', 'day' or 'month'
+    bucket_start = db.Column(db.DateTime, primary_key=True)  # UTC
+    on_secs = db.Column(db.Float, nullable=False, default=0.0)
+    idle_on_secs = db.Column(db.Float, nullable=False, default=0.0)
+    saved_secs = db.Column(db.Float, nullable=False, default=0.0)  # off after an auto-shutdown
+    auto_shutdowns = db.Column(db.Integer, nullable=False, default=0)
+    measured_kwh = db.Column(db.Float, nullable=False, default=0.0)  # from DCMI power samples
+    measured_secs = db.Column(db.Float, nullable=False, default=0.0)  # on-time covered by samples
+
+    def __repr__(self):
+        return f"<ServerRollup server_id={self.server_id} {self.period} {self.bucket_start}>"
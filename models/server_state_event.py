@@ -0,0 +1,74 @@
+# models/server_state_event.py
+from datetime import datetime, UTC
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.orm import Session
+from models.database import db
+from models.server import Server
+
+# Power states that draw (and are billed as) full power; a server counts as on
+# once the BMC reports it, and until an off has been confirmed
+POWERED_STATES = ('ON', 'POWERING_OFF')
+
+class ServerStateEvent(db.Model):
+    """Append-only log of a server's powered/idle state, consumed by the rollup job"""
+    __tablename__ = 'server_state_events'
+    __table_args__ = (
+        # The rollup job reads the events it has not folded in yet
+        db.Index('ix_server_state_events_pending', 'id',
+                 sqlite_where=db.text('NOT rolled_up'), postgresql_where=db.text('NOT rolled_up')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id', ondelete='CASCADE'), nullable=False, index=True)
+    occurred_at = db.Column(db.DateTime, nullable=False)  # UTC
+    powered = db.Column(db.Boolean, nullable=False)
+    idle = db.Column(db.Boolean, nullable=False)  # only ever true while powered
+    cause = db.Column(db.String(20), nullable=True)  # 'auto_shutdown' for idle shutdowns
+    # Set once folded into the rollups; ids are no watermark, as they commit out of order
+    rolled_up = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    def __repr__(self):
+        return f"<ServerStateEvent server_id={self.server_id} powered={self.powered} idle={self.idle}>"
+
+
+def rollup_state(power_state, is_idle):
+    powered = power_state in POWERED_STATES
+    return powered, bool(is_idle) and powered
+
+
+@event.listens_for(Session, 'after_flush')
+def record_server_state_events(session, flush_context):
+    """Log every flushed change of a server's powered/idle state
+
+    Catches changes made through the ORM from any code path (power_state and
+    is_idle load their old value on set, see models/server.py). Bulk INSERTs
+    and UPDATEs bypass it, so they must not change the powered value: bulk
+    import and discovery create servers OFF and leave power_state to the
+    monitor, and begin_transition only moves ON <-> POWERING_OFF and
+    OFF <-> POWERING_ON.
+    Set `server.state_change_cause` before the flush to tag the event; a
+    transition started with a cause tags the event of its settled state.
+    """
+    rows = []
+    now = datetime.now(UTC)
+    for server in list(session.new) + list(session.dirty):
+        if not isinstance(server, Server):
+            continue
+        attrs = inspect(server).attrs
+        power_history = attrs.power_state.history
+        idle_history = attrs.is_idle.history
+        new_state = rollup_state(server.power_state, server.is_idle)
+        if server not in session.new:
+            if not power_history.has_changes() and not idle_history.has_changes():
+                continue
+            old_state = rollup_state(
+                power_history.deleted[0] if power_history.deleted else server.power_state,
+                idle_history.deleted[0] if idle_history.deleted else server.is_idle
+            )
+            if old_state == new_state:
+                continue
+        rows.append({'server_id': server.id, 'occurred_at': now, 'powered': new_state[0],
+                     'idle': new_state[1], 'cause': server.state_change_cause})
+        server.state_change_cause = None
+    if rows:
+        session.connection().execute(insert(ServerStateEvent), rows)
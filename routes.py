@@ -1,10 +1,17 @@
 # routes.py
-from flask import Blueprint, jsonify, request
-from flask_restx import Api, Resource, fields
+import zlib
+from flask import Blueprint, current_app, jsonify, request
+from flask_restx import Api, Resource, fields, inputs, reqparse
+from werkzeug.datastructures import FileStorage
 from controllers.server_controller import ServerController
 from controllers.server_management_controller import ServerManagementController
+from controllers.schedule_controller import ScheduleController
+from controllers.report_controller import ReportController
 from models.server import Server
 from models.database import db
+from services.telemetry_cache import get_telemetry_cache
+from services.server_state_monitor_service import ServerStateMonitorService
+from services.line_protocol import iter_lines
 
 # Create Blueprint
 routes_bp = Blueprint('routes', __name__)
@@ -22,9 +29,18 @@ server_ns = api.namespace('servers', description='Server operations')
 manage_ns = api.namespace('servers/manage', description='Server management operations')
 
 # Define nested model for resource usage
+gpu_usage_model = api.model('GpuUsage', {
+    'gpu': fields.String(description='GPU index (or uuid) on the host'),
+    'utilization': fields.Float(description='GPU utilization percentage'),
+    'memory_usage': fields.Float(description='GPU memory usage percentage')
+})
+
 resource_usage_model = api.model('ResourceUsage', {
     'cpu_usage': fields.Float(description='Current CPU usage percentage'),
-    'gpu_usage': fields.Float(description='Current GPU usage percentage')
+    'gpu_usage': fields.Float(description='Current GPU usage percentage of the busiest GPU'),
+    'gpu_usage_mean': fields.Float(description='Mean GPU usage percentage over all GPUs'),
+    'gpu_memory_usage': fields.Float(description='Memory usage percentage of the busiest GPU'),
+    'gpus': fields.List(fields.Nested(gpu_usage_model), description='Usage of every GPU')
 })
 
 # Define models for documentation
@@ -32,15 +48,34 @@ server_model = api.model('Server', {
     'id': fields.Integer(description='Server identifier'),
     'name': fields.String(description='Server name'),
     'ipmi_host': fields.String(description='IPMI host address'),
+    'site': fields.String(description='Site the server is pinned to for monitoring'),
     'power_state': fields.String(description='Current power state'),
     'last_update_time': fields.DateTime(dt_format='iso8601', description='Last status update time'),
     'is_idle': fields.Boolean(description='Whether the server is currently idle'),
     'idle_start_time': fields.DateTime(dt_format='iso8601', description='Time when the server became idle'),
     'idle_duration_mins': fields.Integer(description='Duration of current idle state in minutes'),
     'idle_threshold_mins': fields.Integer(description='Threshold in minutes before idle server is shut down'),
+    'auto_shutdown_enabled': fields.Boolean(description='Whether the server is shut down automatically when idle'),
     'current_usage': fields.Nested(resource_usage_model, description='Current resource usage information')
 })
 
+# Query parameters for the server list
+server_list_parser = reqparse.RequestParser()
+server_list_parser.add_argument('power_state', type=str, action='split', location='args',
+                                help='Comma separated power states to include, e.g. ON or ON,OFF')
+server_list_parser.add_argument('is_idle', type=inputs.boolean, location='args',
+                                help='Only servers with this idle flag')
+server_list_parser.add_argument('auto_shutdown_enabled', type=inputs.boolean, location='args',
+                                help='Only servers with this auto shutdown setting')
+server_list_parser.add_argument('name_prefix', type=str, location='args',
+                                help='Only servers whose name starts with this prefix')
+server_list_parser.add_argument('limit', type=inputs.int_range(1, 1000), location='args',
+                                help='Page size; the next page cursor is returned in X-Next-Cursor')
+server_list_parser.add_argument('after', type=int, location='args',
+                                help='Keyset cursor: only servers with an id greater than this')
+server_list_parser.add_argument('fields', type=str, action='split', location='args',
+                                help='Comma separated list of fields to return')
+
 power_response = api.model('PowerResponse', {
     'success': fields.Boolean(description='Operation success status'),
     'message': fields.String(description='Response message')
@@ -54,29 +89,83 @@ server_create_model = api.model('ServerCreate', {
     'name': fields.String(required=True, description='Server name'),
     'ipmi_host': fields.String(required=True, description='IPMI host address'),
     'ipmi_user': fields.String(required=True, description='IPMI username'),
-    'ipmi_pass': fields.String(required=True, description='IPMI password')
+    'ipmi_pass': fields.String(required=True, description='IPMI password'),
+    'site': fields.String(description='Pin monitoring to monitor instances of this site')
 })
 
 server_update_model = api.model('ServerUpdate', {
     'ipmi_host': fields.String(description='IPMI host address'),
     'ipmi_user': fields.String(description='IPMI username'),
-    'ipmi_pass': fields.String(description='IPMI password')
+    'ipmi_pass': fields.String(description='IPMI password'),
+    'site': fields.String(description='Pin monitoring to monitor instances of this site, empty to unpin')
+})
+
+server_import_parser = reqparse.RequestParser()
+server_import_parser.add_argument('file', type=FileStorage, location='files',
+                                  help='Inventory file; alternatively send it as the raw request body')
+server_import_parser.add_argument('format', type=str, choices=('csv', 'json', 'yaml'), location='args',
+                                  help='Inventory format, detected from the file name or content type if omitted')
+server_import_parser.add_argument('update_existing', type=inputs.boolean, default=True, location='args',
+                                  help='Overwrite servers that already exist')
+server_import_parser.add_argument('dry_run', type=inputs.boolean, default=False, location='args',
+                                  help='Validate only, do not write anything')
+
+import_error = api.model('ImportError', {
+    'row': fields.Integer(description='Row number in the inventory'),
+    'name': fields.String(description='Server name of the row, if any'),
+    'error': fields.String(description='Validation error')
+})
+
+import_report = api.model('ImportReport', {
+    'created': fields.Integer(description='Servers inserted'),
+    'updated': fields.Integer(description='Existing servers updated'),
+    'skipped': fields.Integer(description='Existing servers left untouched'),
+    'dry_run': fields.Boolean(description='Whether changes were rolled back'),
+    'errors': fields.List(fields.Nested(import_error), description='Rows that were rejected')
+})
+
+credential_model = api.model('Credential', {
+    'ipmi_user': fields.String(required=True, description='IPMI username'),
+    'ipmi_pass': fields.String(required=True, description='IPMI password')
+})
+
+discovery_request = api.model('DiscoveryRequest', {
+    'cidrs': fields.List(fields.String, required=True, description='IPv4 ranges to sweep, e.g. 10.8.4.0/22'),
+    'credentials': fields.List(fields.Nested(credential_model), required=True,
+                               description='Candidate credentials, tried in order'),
+    'port': fields.Integer(default=623, description='RMCP UDP port'),
+    'check_credentials': fields.Boolean(default=True, description='Verify credentials with an authenticated status call'),
+    'register': fields.Boolean(default=True, description='Create or refresh servers for the BMCs found'),
+    'name_template': fields.String(default='bmc-{ip_dashed}',
+                                   description='Name of new servers; {ip}, {ip_dashed} and {last_octet} are substituted')
+})
+
+discovery_report = api.model('DiscoveryReport', {
+    'scanned': fields.Integer(description='Addresses probed'),
+    'responded': fields.List(fields.String, description='Addresses that answered the RMCP ping'),
+    'authenticated': fields.List(fields.String, description='Addresses where a credential worked'),
+    'elapsed_secs': fields.Float(description='Scan duration'),
+    'created': fields.Integer(description='Servers inserted'),
+    'updated': fields.Integer(description='Existing servers refreshed'),
+    'errors': fields.List(fields.Raw, description='Hosts that could not be registered')
 })
 
 # Server listing and status endpoints
 @server_ns.route('')
 class ServerList(Resource):
     @server_ns.doc('list_servers')
-    @server_ns.marshal_with(server_model, as_list=True)
+    @server_ns.expect(server_list_parser)
+    @server_ns.response(200, 'Success', [server_model])
+    @server_ns.response(400, 'Invalid query parameter', error_response)
     def get(self):
-        """List all servers"""
-        return ServerController.get_all()
+        """List servers, optionally filtered, paginated and projected"""
+        return ServerController.get_all(server_list_parser.parse_args())
 
 @server_ns.route('/<int:server_id>/status')
 @server_ns.param('server_id', 'The server identifier')
 class ServerStatusById(Resource):
     @server_ns.doc('get_server_status')
-    @server_ns.marshal_with(server_model)
+    @server_ns.response(200, 'Success', server_model)
     @server_ns.response(404, 'Server not found', error_response)
     def get(self, server_id):
         """Get server status by ID"""
@@ -86,7 +175,7 @@ class ServerStatusById(Resource):
 @server_ns.param('server_name', 'The server name')
 class ServerStatusByName(Resource):
     @server_ns.doc('get_server_status_by_name')
-    @server_ns.marshal_with(server_model)
+    @server_ns.response(200, 'Success', server_model)
     @server_ns.response(404, 'Server not found', error_response)
     def get(self, server_name):
         """Get server status by name"""
@@ -100,6 +189,7 @@ class ServerPowerById(Resource):
     @server_ns.doc('power_control')
     @server_ns.response(200, 'Success', power_response)
     @server_ns.response(404, 'Server not found', error_response)
+    @server_ns.response(409, 'Opposite power transition in flight', power_response)
     @server_ns.response(500, 'Operation failed', power_response)
     def post(self, server_id, action):
         """Control server power by ID"""
@@ -117,6 +207,7 @@ class ServerPowerByName(Resource):
     @server_ns.doc('power_control_by_name')
     @server_ns.response(200, 'Success', power_response)
     @server_ns.response(404, 'Server not found', error_response)
+    @server_ns.response(409, 'Opposite power transition in flight', power_response)
     @server_ns.response(500, 'Operation failed', power_response)
     def post(self, server_name, action):
         """Control server power by name"""
@@ -137,6 +228,26 @@ class ServerManagement(Resource):
         """Create a new server"""
         return ServerManagementController.create_server()
 
+@manage_ns.route('/import')
+class ServerImport(Resource):
+    @manage_ns.doc('import_servers')
+    @manage_ns.expect(server_import_parser)
+    @manage_ns.response(200, 'Import finished', import_report)
+    @manage_ns.response(400, 'Invalid inventory', error_response)
+    def post(self):
+        """Bulk create or update servers from a CSV/JSON/YAML inventory"""
+        return ServerManagementController.import_servers(server_import_parser.parse_args())
+
+@manage_ns.route('/discover')
+class ServerDiscovery(Resource):
+    @manage_ns.doc('discover_servers')
+    @manage_ns.expect(discovery_request)
+    @manage_ns.response(200, 'Discovery finished', discovery_report)
+    @manage_ns.response(400, 'Invalid request', error_response)
+    def post(self):
+        """Discover BMCs in CIDR ranges and register them"""
+        return ServerManagementController.discover_servers()
+
 @manage_ns.route('/<string:server_name>')
 @manage_ns.param('server_name', 'The server name')
 class ServerManagementByName(Resource):
@@ -177,3 +288,60 @@ def update_idle_settings(server_name):
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 500
+
+@routes_bp.route('/servers/<int:server_id>/schedules', methods=['GET'])
+def get_schedules(server_id):
+    return ScheduleController.get_schedules(server_id)
+
+@routes_bp.route('/servers/<int:server_id>/schedules', methods=['POST'])
+def create_schedule(server_id):
+    return ScheduleController.create_schedule(server_id)
+
+@routes_bp.route('/servers/<int:server_id>/schedules/<int:schedule_id>', methods=['DELETE'])
+def delete_schedule(server_id, schedule_id):
+    return ScheduleController.delete_schedule(server_id, schedule_id)
+
+@routes_bp.route('/servers/<int:server_id>/schedule-rules', methods=['GET'])
+def get_schedule_rules(server_id):
+    return ScheduleController.get_rules(server_id)
+
+@routes_bp.route('/servers/<int:server_id>/schedule-rules', methods=['POST'])
+def create_schedule_rule(server_id):
+    """Create a recurring window: {rrule, dtstart, timezone, duration_mins, description, enabled}"""
+    return ScheduleController.create_rule(server_id)
+
+@routes_bp.route('/servers/<int:server_id>/schedule-rules/<int:rule_id>', methods=['PUT'])
+def update_schedule_rule(server_id, rule_id):
+    return ScheduleController.update_rule(server_id, rule_id)
+
+@routes_bp.route('/servers/<int:server_id>/schedule-rules/<int:rule_id>', methods=['DELETE'])
+def delete_schedule_rule(server_id, rule_id):
+    return ScheduleController.delete_rule(server_id, rule_id)
+
+@routes_bp.route('/reports/savings', methods=['GET'])
+def savings_report():
+    """Node-hours, energy and savings per server from the hourly/daily rollups"""
+    return ReportController.get_savings()
+
+@routes_bp.route('/telemetry/cache-stats', methods=['GET'])
+def telemetry_cache_stats():
+    return jsonify(get_telemetry_cache().stats())
+
+@routes_bp.route('/ingest', methods=['POST'])
+def ingest_metrics():
+    """Accept telegraf metrics (InfluxDB line protocol) pushed by an outputs.http plugin"""
+    token = current_app.config.get('INGEST_TOKEN')
+    if token:
+        scheme, _, provided = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() not in ('token', 'bearer') or provided != token:
+            return jsonify({'message': 'Invalid ingest token'}), 401
+    
+    gzipped = request.headers.get('Content-Encoding', '').lower() == 'gzip'
+    try:
+        result = ServerStateMonitorService.ingest_metrics(iter_lines(request.stream, gzipped=gzipped))
+    except (UnicodeDecodeError, zlib.error) as e:
+        return jsonify({'message': f'Unreadable request body: {str(e)}'}), 400
+    
+    if result['errors'] and not result['accepted']:
+        return jsonify({'message': 'No valid points in batch', 'errors': result['errors']}), 400
+    return '', 204
@@ -0,0 +1,128 @@
+# services/bmc_command_queue.py
+import logging
+import threading
+from collections import deque
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+# Actions that change the chassis power; a newer one replaces any still waiting
+POWER_ACTIONS = ('on', 'off', 'soft', 'cycle', 'reset')
+
+
+class _Command:
+    __slots__ = ('key', 'target', 'action', 'result', 'done')
+
+    def __init__(self, key, target, action):
+        self.key = key
+        self.target = target
+        self.action = action
+        self.result = None
+        self.done = False
+
+
+class _HostQueue:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.queue = deque()
+        self.pending = {}  # key -> queued _Command, for coalescing
+        self.busy = False
+
+
+class BMCCommandQueue:
+    """Runs IPMI commands one at a time per BMC and in parallel across BMCs
+
+    Callers block until their command has run. There is no worker thread:
+    whichever waiting caller finds the BMC idle runs the next queued
+    command, so an idle host costs nothing. While a command waits:
+
+    - an identical request (same host, credentials and action) joins it and
+      gets the same result, so concurrent status probes cost one call;
+    - a power action replaces a different power action that has not been
+      sent yet (last writer wins); the replaced caller gets a failure,
+      `(False, "superseded by 'power <action>'")`, as its command never ran.
+    """
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout  # seconds per ipmitool call
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self.stats = {'executed': 0, 'coalesced': 0, 'superseded': 0}
+
+    def configure(self, app):
+        self.timeout = app.config['IPMI_COMMAND_TIMEOUT']
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _host(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostQueue()
+            return state
+
+    def submit(self, server, action, execute):
+        """Queue `execute(target, action, timeout)` for the server's BMC and wait for its result
+
+        Returns:
+            tuple: (success, output) as returned by `execute`
+        """
+        key = (server.ipmi_user, server.ipmi_pass, action)
+        state = self._host(server.ipmi_host)
+        with state.cond:
+            command = state.pending.get(key)
+            if command is not None:
+                self._count('coalesced')
+            else:
+                # Worker threads must not touch ORM rows, so the command runs on a snapshot
+                target = SimpleNamespace(name=getattr(server, 'name', server.ipmi_host),
+                                         ipmi_host=server.ipmi_host,
+                                         ipmi_user=server.ipmi_user,
+                                         ipmi_pass=server.ipmi_pass)
+                command = _Command(key, target, action)
+                if action in POWER_ACTIONS:
+                    self._supersede(state, command)
+                state.queue.append(command)
+                state.pending[key] = command
+            return self._wait(state, command, execute)
+
+    def _supersede(self, state, command):
+        for queued in list(state.queue):
+            if queued.action in POWER_ACTIONS and queued.action != command.action:
+                state.queue.remove(queued)
+                del state.pending[queued.key]
+                queued.result, queued.done = (False, f"superseded by 'power {command.action}'"), True
+                self._count('superseded')
+                logger.info("Dropped pending 'power %s' for %s: superseded by 'power %s'",
+                            queued.action, command.target.name, command.action)
+                state.cond.notify_all()
+
+    def _wait(self, state, command, execute):
+        """Wait for a command, running queued ones whenever the host is idle; holds state.cond"""
+        while True:
+            if command.done:
+                return command.result
+            if state.busy or not state.queue:
+                state.cond.wait()
+                continue
+
+            job = state.queue.popleft()
+            del state.pending[job.key]
+            state.busy = True
+            state.cond.release()
+            result = (False, "IPMI command was interrupted")
+            try:
+                result = execute(job.target, job.action, self.timeout)
+            except Exception as e:
+                result = (False, str(e))
+            finally:
+                state.cond.acquire()
+                state.busy = False
+                job.result, job.done = result, True
+                self._count('executed')
+                state.cond.notify_all()
+
+
+command_queue = BMCCommandQueue()
@@ -0,0 +1,244 @@
+# services/bmc_discovery_service.py
+import asyncio
+import ipaddress
+import logging
+from datetime import datetime, UTC
+from types import SimpleNamespace
+
+from sqlalchemy import insert, select, update
+
+from models.database import db
+from models.server import Server
+from services.power_control_service import PowerControlService
+
+logger = logging.getLogger(__name__)
+
+IPMI_PORT = 623
+
+# RMCP + IPMI v1.5 session-less "Get Channel Authentication Capabilities"
+# (NetFn App, cmd 0x38) for the current channel, requesting IPMI v2.0 data
+# and administrator privilege. BMCs answer it without credentials.
+GET_CHANNEL_AUTH_CAPS = bytes([
+    0x06, 0x00, 0xff, 0x07,                          # RMCP: version, reserved, seq (no ack), class IPMI
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,  # auth type none, session seq, session id
+    0x09,                                            # message length
+    0x20, 0x18, 0xc8,                                # rsAddr BMC, NetFn App, checksum
+    0x81, 0x00, 0x38,                                # rqAddr, rqSeq, command
+    0x8e, 0x04,                                      # channel current + v2.0 data, admin privilege
+    0xb5,                                            # checksum
+])
+
+
+def parse_channel_auth_response(packet):
+    """Return the advertised capabilities of a BMC reply, or None if it is not a valid answer"""
+    # RMCP header (4) + session header (10) + response header (6) + completion code
+    if len(packet) < 21 or packet[0] != 0x06 or packet[3] & 0x1f != 0x07:
+        return None
+    message = packet[14:]
+    if message[5] != 0x38 or message[6] != 0x00 or len(message) < 11:
+        return None
+    return {
+        'channel': message[7],
+        'auth_types': message[8] & 0x3f,
+        'ipmi_v2': bool(message[10] & 0x02),
+    }
+
+
+class _ChannelAuthProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.responses = {}
+
+    def datagram_received(self, data, addr):
+        capabilities = parse_channel_auth_response(data)
+        if capabilities is not None:
+            self.responses.setdefault(addr[0], capabilities)
+
+    def error_received(self, exc):
+        # ICMP port unreachable and friends: the host simply is not a BMC
+        pass
+
+
+class DiscoveryError(ValueError):
+    """Raised for invalid discovery parameters"""
+
+
+class BMCDiscoveryService:
+
+    @staticmethod
+    def expand_targets(cidrs, max_hosts):
+        """Expand CIDR ranges (or single addresses) into a de-duplicated host list"""
+        targets = []
+        seen = set()
+        for cidr in cidrs:
+            try:
+                network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+            except ValueError as e:
+                raise DiscoveryError(f"Invalid CIDR '{cidr}': {str(e)}")
+            if network.version != 4:
+                raise DiscoveryError(f"Only IPv4 ranges are supported: {cidr}")
+            hosts = network.hosts() if network.num_addresses > 2 else iter(network)
+            for address in hosts:
+                ip = str(address)
+                if ip in seen:
+                    continue
+                seen.add(ip)
+                targets.append(ip)
+                if len(targets) > max_hosts:
+                    raise DiscoveryError(f"Too many addresses to scan (limit {max_hosts})")
+        return targets
+
+    @staticmethod
+    async def ping(targets, port=IPMI_PORT, rate=500, timeout=1.0, retries=1):
+        """Send paced Get Channel Auth Capabilities pings and collect the BMCs that answer
+
+        Returns:
+            dict: {ip: capabilities} for every responding address
+        """
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            _ChannelAuthProtocol, local_addr=('0.0.0.0', 0)
+        )
+        interval = 1.0 / rate
+        try:
+            pending = list(targets)
+            for _ in range(retries + 1):
+                start = loop.time()
+                for i, ip in enumerate(pending):
+                    delay = start + i * interval - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    transport.sendto(GET_CHANNEL_AUTH_CAPS, (ip, port))
+                await asyncio.sleep(timeout)
+                pending = [ip for ip in pending if ip not in protocol.responses]
+                if not pending:
+                    break
+        finally:
+            transport.close()
+        return dict(protocol.responses)
+
+    @staticmethod
+    async def check_credentials(hosts, credentials, concurrency=32):
+        """Find the first candidate credential that can read the chassis power status
+
+        Returns:
+            dict: {ip: {'ipmi_user', 'ipmi_pass', 'power_state'}} for authenticated BMCs
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        results = {}
+
+        async def check_host(ip):
+            for credential in credentials:
+                target = SimpleNamespace(ipmi_host=ip, ipmi_user=credential['ipmi_user'],
+                                         ipmi_pass=credential['ipmi_pass'])
+                async with semaphore:
+                    success, output = await asyncio.to_thread(
+                        PowerControlService._run_ipmi_command, target, "status"
+                    )
+                if success:
+                    results[ip] = {'ipmi_user': credential['ipmi_user'],
+                                   'ipmi_pass': credential['ipmi_pass'],
+                                   'power_state': PowerControlService.parse_power_state(output)}
+                    return
+
+        await asyncio.gather(*(check_host(ip) for ip in hosts))
+        return results
+
+    @staticmethod
+    def register(found, name_template):
+        """Insert new BMCs and refresh the credentials of known ones
+
+        The probed power state is not written: these bulk statements skip
+        the state event log, so new servers start OFF and the monitor's next
+        sweep records their actual state (and any change of known ones).
+
+        Args:
+            found (dict): {ip: {'ipmi_user', 'ipmi_pass', 'power_state'}}
+            name_template (str): Name for new servers, with {ip}, {ip_dashed} and {last_octet}
+        """
+        report = {'created': 0, 'updated': 0, 'errors': []}
+        if not found:
+            return report
+
+        now = datetime.now(UTC)
+        try:
+            existing = dict(db.session.execute(
+                select(Server.ipmi_host, Server.id).where(Server.ipmi_host.in_(list(found)))
+            ).all())
+
+            new_rows = []
+            updates = []
+            for ip, info in found.items():
+                values = {k: v for k, v in info.items() if v is not None and k != 'power_state'}
+                values['last_update_time'] = now
+                if ip in existing:
+                    updates.append({'id': existing[ip], **values})
+                else:
+                    name = name_template.format(ip=ip, ip_dashed=ip.replace('.', '-'),
+                                                last_octet=int(ip.rsplit('.', 1)[1]))
+                    new_rows.append({'name': name, 'ipmi_host': ip, 'is_idle': False,
+                                     'power_state': 'OFF', **values})
+
+            taken = set(db.session.execute(
+                select(Server.name).where(Server.name.in_([row['name'] for row in new_rows]))
+            ).scalars()) if new_rows else set()
+            inserts = []
+            for row in new_rows:
+                if row['name'] in taken:
+                    report['errors'].append({'ip': row['ipmi_host'],
+                                             'error': f"Server name '{row['name']}' already used by another host"})
+                    continue
+                taken.add(row['name'])
+                inserts.append(row)
+
+            if inserts:
+                db.session.execute(insert(Server), inserts)
+            if updates:
+                db.session.execute(update(Server), updates)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        report['created'] = len(inserts)
+        report['updated'] = len(updates)
+        return report
+
+    @staticmethod
+    def discover(cidrs, credentials, port=IPMI_PORT, rate=500, timeout=1.0, retries=1,
+                 concurrency=32, max_hosts=4096, check_credentials=True, register=True,
+                 name_template='bmc-{ip_dashed}'):
+        """Sweep CIDR ranges for BMCs and register the ones that respond
+
+        Returns:
+            dict: Scan statistics, responding and authenticated hosts, registration counts
+        """
+        if not credentials:
+            raise DiscoveryError("At least one candidate credential is required")
+        targets = BMCDiscoveryService.expand_targets(cidrs, max_hosts)
+
+        started = datetime.now(UTC)
+        responders = asyncio.run(BMCDiscoveryService.ping(targets, port, rate, timeout, retries))
+        if check_credentials:
+            found = asyncio.run(BMCDiscoveryService.check_credentials(
+                sorted(responders), credentials, concurrency
+            ))
+        else:
+            first = credentials[0]
+            found = {ip: {'ipmi_user': first['ipmi_user'], 'ipmi_pass': first['ipmi_pass'],
+                          'power_state': None} for ip in responders}
+        elapsed = (datetime.now(UTC) - started).total_seconds()
+        logger.info("Discovery scanned %d addresses in %.1fs: %d responded, %d authenticated",
+                    len(targets), elapsed, len(responders), len(found))
+
+        report = {
+            'scanned': len(targets),
+            'responded': sorted(responders, key=ipaddress.ip_address),
+            'authenticated': sorted(found, key=ipaddress.ip_address),
+            'elapsed_secs': round(elapsed, 3),
+            'created': 0,
+            'updated': 0,
+            'errors': [],
+        }
+        if register:
+            report.update(BMCDiscoveryService.register(found, name_template))
+        return report
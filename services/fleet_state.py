@@ -0,0 +1,148 @@
+# services/fleet_state.py
+import threading
+
+import numpy as np
+from flask import current_app
+
+from services.schedule_service import as_utc
+
+
+class FleetState:
+    """Columnar copy of the fleet's idle-related fields, one stable slot per server
+
+    Each server keeps its slot for the life of the process, so per-sweep
+    work is a handful of array operations over the whole fleet instead of
+    attribute access and comparisons on every ORM object. The monitor
+    sweep and the idle check share one instance from different scheduler
+    threads, so each works only on the slots its own `load` returned.
+    """
+
+    def __init__(self, capacity=256):
+        self._slots = {}  # server_id -> slot
+        self._free = []
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, 'ids', None)
+        columns = {
+            'ids': (np.int64, 0),
+            'powered': (np.bool_, False),
+            'is_idle': (np.bool_, False),
+            'auto_shutdown': (np.bool_, False),
+            'idle_start': (np.float64, np.nan),  # epoch seconds, NaN when not idle
+            'threshold_mins': (np.float64, np.nan),
+            'cpu_usage': (np.float64, np.nan),
+            'gpu_usage': (np.float64, np.nan),
+        }
+        for name, (dtype, fill) in columns.items():
+            column = np.full(capacity, fill, dtype=dtype)
+            if old is not None:
+                previous = getattr(self, name)
+                column[:len(previous)] = previous
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def _slot(self, server_id):
+        slot = self._slots.get(server_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._slots)
+                if slot >= self.capacity:
+                    self._allocate(self.capacity * 2)
+            self._slots[server_id] = slot
+            self.ids[slot] = server_id
+        return slot
+
+    def release(self, server_id):
+        with self._lock:
+            slot = self._slots.pop(server_id, None)
+            if slot is not None:
+                self._free.append(slot)
+
+    def load(self, rows):
+        """Update the columns from (id, power_state, is_idle, idle_start_time,
+        idle_threshold_mins, auto_shutdown_enabled) rows
+
+        Returns:
+            numpy.ndarray: The slots of the rows, in row order
+        """
+        rows = list(rows)
+        with self._lock:
+            slots = np.fromiter((self._slot(row[0]) for row in rows), dtype=np.int64, count=len(rows))
+            if not rows:
+                return slots
+            _, power_states, idle_flags, idle_starts, thresholds, auto_flags = zip(*rows)
+            self.powered[slots] = np.array([state == 'ON' for state in power_states], dtype=np.bool_)
+            self.is_idle[slots] = np.array(idle_flags, dtype=np.bool_)
+            self.idle_start[slots] = np.array(
+                [as_utc(t).timestamp() if t is not None else np.nan for t in idle_starts], dtype=np.float64)
+            self.threshold_mins[slots] = np.array(thresholds, dtype=np.float64)
+            self.auto_shutdown[slots] = np.array(auto_flags, dtype=np.bool_)
+            return slots
+
+    def evaluate_idle(self, slots, cpu_usage, gpu_usage, threshold, now, idle_since=None):
+        """Record fresh usage for `slots` and apply idle transitions
+
+        A server is idle when its CPU and, if it has one, its busiest GPU
+        are below `threshold`; NaN GPU usage means no GPU. Servers that
+        become idle count as idle since `now`, or since their entry in
+        `idle_since` (datetimes) when given.
+
+        Returns:
+            tuple: Masks over `slots` of the servers that became idle and
+            of those that stopped being idle
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        cpu = np.asarray(cpu_usage, dtype=np.float64)
+        gpu = np.asarray(gpu_usage, dtype=np.float64)
+        with self._lock:
+            self.cpu_usage[slots] = cpu
+            self.gpu_usage[slots] = gpu
+            idle = (cpu < threshold) & (np.isnan(gpu) | (gpu < threshold))
+            was_idle = self.is_idle[slots]
+            became_idle = idle & ~was_idle
+            became_busy = ~idle & was_idle
+            self.is_idle[slots[became_idle]] = True
+            if idle_since is None:
+                self.idle_start[slots[became_idle]] = now.timestamp()
+            else:
+                since = np.array([t.timestamp() for t in idle_since], dtype=np.float64)
+                self.idle_start[slots[became_idle]] = since[became_idle]
+            self.is_idle[slots[became_busy]] = False
+            self.idle_start[slots[became_busy]] = np.nan
+        return became_idle, became_busy
+
+    def idle_minutes(self, slots, now):
+        """Idle duration in whole minutes, 0 for servers that are not idle"""
+        elapsed = np.nan_to_num(now.timestamp() - self.idle_start[slots])
+        return np.where(self.is_idle[slots], np.round(elapsed / 60.0), 0).astype(np.int64)
+
+    def shutdown_candidates(self, slots, now):
+        """Ids of the servers in `slots` that are on, idle, opted in and past their idle threshold"""
+        slots = np.asarray(slots, dtype=np.int64)
+        with self._lock:
+            slots = slots[self.powered[slots] & self.is_idle[slots] & self.auto_shutdown[slots]]
+            due = self.idle_minutes(slots, now) >= self.threshold_mins[slots]
+            return self.ids[slots[due]].tolist()
+
+    def server_ids(self, slots):
+        return self.ids[slots].tolist()
+
+
+_fleet_lock = threading.Lock()
+
+
+def get_fleet_state():
+    """Return the fleet state of the current app, creating it on first use"""
+    app = current_app._get_current_object()
+    fleet = app.extensions.get('fleet_state')
+    if fleet is None:
+        with _fleet_lock:
+            fleet = app.extensions.get('fleet_state')
+            if fleet is None:
+                fleet = FleetState()
+                app.extensions['fleet_state'] = fleet
+    return fleet
@@ -0,0 +1,42 @@
+# services/gpu_usage.py
+from statistics import fmean
+
+
+def _gpu_sort_key(gpu):
+    # '10' after '9': numeric indices sort numerically, uuids after them
+    label = gpu['gpu']
+    return (0, int(label), '') if label.isdigit() else (1, 0, label)
+
+
+def gpu_entry(gpu, utilization, memory_used=None, memory_total=None):
+    """One GPU's usage as stored on the server and shown in `current_usage`"""
+    memory_usage = None
+    if memory_used is not None and memory_total:
+        memory_usage = round(100.0 * memory_used / memory_total, 2)
+    return {
+        'gpu': str(gpu),
+        'utilization': round(float(utilization), 2) if utilization is not None else None,
+        'memory_usage': memory_usage,
+    }
+
+
+def summarize_gpus(gpus):
+    """Reduce per-GPU entries to the node-level values idle detection uses
+
+    A node is only as idle as its busiest GPU, so `gpu_usage` is the
+    maximum; the mean and the busiest GPU's memory usage are reported
+    alongside it.
+
+    Returns:
+        dict: gpu_usage, gpu_usage_mean, gpu_memory_usage and the sorted gpus list
+    """
+    gpus = sorted(gpus, key=_gpu_sort_key)
+    reporting = [g for g in gpus if g['utilization'] is not None]
+    utilization = [g['utilization'] for g in reporting]
+    busiest = max(reporting, key=lambda g: g['utilization']) if reporting else None
+    return {
+        'gpu_usage': busiest['utilization'] if busiest else None,
+        'gpu_usage_mean': round(fmean(utilization), 2) if utilization else None,
+        'gpu_memory_usage': busiest['memory_usage'] if busiest else None,
+        'gpus': gpus,
+    }
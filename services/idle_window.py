@@ -0,0 +1,178 @@
+# services/idle_window.py
+import math
+import threading
+from datetime import datetime, UTC
+
+import numpy as np
+from flask import current_app
+
+from services.gpu_usage import gpu_entry, summarize_gpus
+
+BUCKET_SECS = 60
+
+# Per-minute peaks of every host; `start` is an epoch in seconds computed here, not user input
+CPU_PEAKS_QUERY = '''
+SELECT min("usage_idle") AS usage_idle
+FROM "cpu"
+WHERE "cpu" = 'cpu-total' AND time >= {start}s
+GROUP BY time(1m), "host" fill(none)
+'''
+GPU_PEAKS_QUERY = '''
+SELECT max("utilization_gpu") AS utilization_gpu
+FROM "nvidia_smi"
+WHERE time >= {start}s
+GROUP BY time(1m), "host", "index" fill(none)
+'''
+
+
+def _floor(epoch):
+    return int(epoch // BUCKET_SECS) * BUCKET_SECS
+
+
+def _series(result):
+    if not result or 'results' not in result:
+        return []
+    return result['results'][0].get('series') or []
+
+
+class IdleWindow:
+    """Per-minute CPU/GPU usage peaks of every host, cached by minute bucket
+
+    Backs IDLE_EVALUATION_MODE=window. Each refresh asks InfluxDB, in one
+    grouped query per measurement, only for the buckets that can still
+    change; older buckets are final and served from memory. A server's
+    peak is the maximum over the buckets of its own idle window, so one
+    busy sample anywhere in the window keeps it from being idle.
+    """
+
+    WRITE_LAG_SECS = 60  # telegraf flush delay; buckets that ended earlier than this are final
+    FRESH_BUCKETS = 3  # a host must have CPU data in one of its newest buckets to be evaluated
+
+    def __init__(self):
+        self._buckets = {}  # bucket start (epoch secs) -> {host: (cpu peak, {gpu index: utilization peak})}
+        self._cached_from = None  # oldest bucket start held
+        self._final_until = None  # buckets starting before this do not change anymore
+        self._lock = threading.Lock()
+
+    def refresh(self, query, now, window_mins):
+        """Load the buckets of the last `window_mins` minutes that are not final yet
+
+        Args:
+            query: Callable running an InfluxQL statement, returning the decoded JSON or None
+            now (datetime): End of the window
+            window_mins (int): Longest idle window among the evaluated servers
+
+        Returns:
+            bool: False if InfluxDB could not be queried
+        """
+        now_secs = now.timestamp()
+        oldest = _floor(now_secs - window_mins * 60)
+        start = oldest
+        if self._cached_from is not None and self._cached_from <= oldest:
+            start = max(oldest, self._final_until)
+
+        cpu_results = query(CPU_PEAKS_QUERY.format(start=start))
+        gpu_results = query(GPU_PEAKS_QUERY.format(start=start))
+        if cpu_results is None or gpu_results is None:
+            return False
+
+        fetched = {}
+        for series in _series(cpu_results):
+            host = (series.get('tags') or {}).get('host')
+            for timestamp, usage_idle in series['values']:
+                if host and usage_idle is not None:
+                    bucket = fetched.setdefault(_floor(timestamp / 1000.0), {})
+                    bucket[host] = (100.0 - usage_idle, bucket.get(host, (None, {}))[1])
+        for series in _series(gpu_results):
+            tags = series.get('tags') or {}
+            host = tags.get('host')
+            for timestamp, utilization in series['values']:
+                if host and utilization is not None:
+                    bucket = fetched.setdefault(_floor(timestamp / 1000.0), {})
+                    cpu_peak, gpus = bucket.setdefault(host, (math.nan, {}))
+                    gpus[tags.get('index') or '0'] = utilization
+
+        with self._lock:
+            self._buckets = {b: hosts for b, hosts in self._buckets.items() if oldest <= b < start}
+            self._buckets.update(fetched)
+            self._cached_from = oldest
+            self._final_until = _floor(now_secs - self.WRITE_LAG_SECS)
+        return True
+
+    def peaks(self, hosts, windows, now):
+        """Peak usage of each host over its own window ending at `now`
+
+        Args:
+            hosts (list): Host names
+            windows (list): Window length in minutes of each host
+
+        Returns:
+            tuple: Lists of CPU peaks, GPU peaks (NaN for hosts without
+            GPUs) and whether the host reports fresh data. The CPU peak is
+            infinite for a host without data back to its window start
+            (e.g. booted within the window), which is never idle.
+        """
+        current = _floor(now.timestamp())
+        depth = max(windows) + 1
+        rows = {host: row for row, host in enumerate(hosts)}
+        cpu = np.full((len(hosts), depth), np.nan)
+        gpu = np.full((len(hosts), depth), np.nan)
+        with self._lock:
+            for bucket, by_host in self._buckets.items():
+                offset = (current - bucket) // BUCKET_SECS
+                if not 0 <= offset < depth:
+                    continue
+                for host, (cpu_peak, gpus) in by_host.items():
+                    row = rows.get(host)
+                    if row is not None:
+                        cpu[row, offset] = cpu_peak
+                        if gpus:
+                            gpu[row, offset] = max(gpus.values())
+
+        # Offset k holds the bucket k minutes back; running maxima give every window length at once
+        index = np.arange(len(hosts))
+        window = np.asarray(windows, dtype=np.int64)
+        seen = ~np.isnan(cpu)
+        covered = seen[index, window] | seen[index, np.maximum(window - 1, 0)]
+        cpu_peaks = np.where(covered, np.fmax.accumulate(cpu, axis=1)[index, window], np.inf)
+        gpu_peaks = np.fmax.accumulate(gpu, axis=1)[index, window]
+        fresh = seen[:, :self.FRESH_BUCKETS].any(axis=1)
+        return cpu_peaks.tolist(), gpu_peaks.tolist(), fresh.tolist()
+
+    def latest_usage(self, host, now):
+        """Usage data of a host's newest fresh bucket, in the shape of
+        `get_server_resource_usage`, or None"""
+        current = _floor(now.timestamp())
+        with self._lock:
+            for offset in range(self.FRESH_BUCKETS):
+                bucket = current - offset * BUCKET_SECS
+                cpu_peak, gpus = self._buckets.get(bucket, {}).get(host, (math.nan, {}))
+                if not math.isnan(cpu_peak):
+                    break
+            else:
+                return None
+        usage_data = {
+            'cpu_usage': cpu_peak,
+            'gpu_usage': None,
+            'gpus': [],
+            'has_data': True,
+            'sample_time': datetime.fromtimestamp(min(bucket + BUCKET_SECS, now.timestamp()), UTC),
+        }
+        usage_data.update(summarize_gpus([gpu_entry(index, value) for index, value in gpus.items()]))
+        return usage_data
+
+
+_window_lock = threading.Lock()
+
+
+def get_idle_window():
+    """Return the idle window cache of the current app, creating it on first use"""
+    app = current_app._get_current_object()
+    window = app.extensions.get('idle_window')
+    if window is None:
+        with _window_lock:
+            window = app.extensions.get('idle_window')
+            if window is None:
+                window = IdleWindow()
+                app.extensions['idle_window'] = window
+    return window
@@ -0,0 +1,118 @@
+# services/influxdb_client.py
+import json
+import logging
+import random
+import threading
+import time
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: throttling and transient server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class InfluxDBQueryClient:
+    """Pooled HTTP client for the InfluxDB 1.x /query endpoint
+
+    Keeps TCP/TLS connections alive across queries, binds query
+    parameters instead of interpolating them into InfluxQL and retries
+    transient failures with jittered exponential backoff inside a
+    per-query time budget.
+    """
+
+    def __init__(self, url, database, pool_size=8, timeout=10.0, connect_timeout=3.0,
+                 retries=2, retry_backoff=0.2, verify_ssl=True):
+        self.url = url
+        self.database = database
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+
+        # requests is imported on first use to keep app startup light
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        self.session.verify = verify_ssl
+        self.session.headers.update({'Accept-Encoding': 'gzip', 'Accept': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        pool_size = config.get('INFLUXDB_POOL_SIZE') or config.get('SERVER_MONITOR_CONCURRENCY', 8)
+        return cls(
+            url=config['INFLUXDB_URL'],
+            database=config['INFLUXDB_DB'],
+            pool_size=pool_size,
+            timeout=config.get('INFLUXDB_TIMEOUT', 10.0),
+            connect_timeout=config.get('INFLUXDB_CONNECT_TIMEOUT', 3.0),
+            retries=config.get('INFLUXDB_RETRIES', 2),
+            retry_backoff=config.get('INFLUXDB_RETRY_BACKOFF', 0.2),
+            verify_ssl=config.get('INFLUXDB_VERIFY_SSL', True),
+        )
+
+    def query(self, query, params=None, timeout=None):
+        """Run an InfluxQL query and return the decoded JSON, or None on failure
+
+        Args:
+            query (str): InfluxQL statement, using `$name` placeholders for values
+            params (dict): Values bound to the placeholders
+            timeout (float): Total time budget in seconds, including retries
+        """
+        import requests
+
+        request_params = {'db': self.database, 'q': query, 'epoch': 'ms'}
+        if params:
+            request_params['params'] = json.dumps(params)
+
+        deadline = time.monotonic() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                response = self.session.get(
+                    self.url,
+                    params=request_params,
+                    timeout=(min(self.connect_timeout, remaining), remaining)
+                )
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                return response.json()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                retryable = not isinstance(e, requests.HTTPError) or (
+                    e.response is not None and e.response.status_code in RETRYABLE_STATUS_CODES
+                )
+                delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                if not retryable or attempt >= self.retries or time.monotonic() + delay >= deadline:
+                    logger.error("InfluxDB query failed after %d attempt(s): %s", attempt + 1, e)
+                    return None
+                attempt += 1
+                time.sleep(delay)
+            except Exception as e:
+                logger.error("InfluxDB query failed: %s", e)
+                return None
+
+    def close(self):
+        self.session.close()
+
+
+_client_lock = threading.Lock()
+
+
+def get_influxdb_client():
+    """Return the InfluxDB client of the current app, creating it on first use"""
+    app = current_app._get_current_object()
+    client = app.extensions.get('influxdb_client')
+    if client is None:
+        with _client_lock:
+            client = app.extensions.get('influxdb_client')
+            if client is None:
+                client = InfluxDBQueryClient.from_config(app.config)
+                app.extensions['influxdb_client'] = client
+    return client
@@ -0,0 +1,119 @@
+# services/line_protocol.py
+import zlib
+
+
+class LineProtocolError(ValueError):
+    """Raised for a line that is not valid InfluxDB line protocol"""
+
+
+def iter_lines(stream, gzipped=False, chunk_size=64 * 1024):
+    """Yield decoded lines from a (possibly gzip encoded) byte stream without buffering it whole"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    pending = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8')
+    if decompressor is not None:
+        pending += decompressor.flush()
+    for line in pending.split(b'\n'):
+        yield line.decode('utf-8')
+
+
+def _split(text, separator, respect_quotes=False):
+    """Split on `separator` unless it is backslash-escaped (or quoted, for field sets)"""
+    if '\\' not in text and not (respect_quotes and '"' in text):
+        return text.split(separator)
+
+    parts = []
+    current = []
+    in_quotes = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == '\\' and i + 1 < len(text):
+            current.append(text[i:i + 2])
+            i += 2
+            continue
+        if respect_quotes and char == '"':
+            in_quotes = not in_quotes
+        elif char == separator and not in_quotes:
+            parts.append(''.join(current))
+            current = []
+            i += 1
+            continue
+        current.append(char)
+        i += 1
+    parts.append(''.join(current))
+    return parts
+
+
+def _unescape(text):
+    if '\\' not in text:
+        return text
+    return (text.replace('\\,', ',').replace('\\=', '=')
+                .replace('\\ ', ' ').replace('\\"', '"').replace('\\\\', '\\'))
+
+
+def _parse_field_value(raw):
+    if raw.startswith('"'):
+        if len(raw) < 2 or not raw.endswith('"'):
+            raise LineProtocolError(f"Unterminated string field: {raw}")
+        return _unescape(raw[1:-1])
+    if raw in ('t', 'T', 'true', 'True', 'TRUE'):
+        return True
+    if raw in ('f', 'F', 'false', 'False', 'FALSE'):
+        return False
+    try:
+        if raw[-1:] in ('i', 'u'):
+            return int(raw[:-1])
+        return float(raw)
+    except ValueError:
+        raise LineProtocolError(f"Invalid field value: {raw}")
+
+
+def parse_line(line):
+    """Parse one line of line protocol
+
+    Returns:
+        tuple: (measurement, tags, fields, timestamp) or None for blank/comment lines
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+
+    sections = _split(line, ' ', respect_quotes=True)
+    sections = [section for section in sections if section]
+    if len(sections) not in (2, 3):
+        raise LineProtocolError(f"Malformed line: {line[:100]}")
+
+    series = _split(sections[0], ',')
+    measurement = _unescape(series[0])
+    tags = {}
+    for tag in series[1:]:
+        parts = _split(tag, '=')
+        if len(parts) != 2:
+            raise LineProtocolError(f"Malformed tag: {tag}")
+        tags[_unescape(parts[0])] = _unescape(parts[1])
+
+    fields = {}
+    for field in _split(sections[1], ',', respect_quotes=True):
+        parts = _split(field, '=', respect_quotes=True)
+        if len(parts) != 2 or not parts[1]:
+            raise LineProtocolError(f"Malformed field: {field}")
+        fields[_unescape(parts[0])] = _parse_field_value(parts[1])
+
+    timestamp = None
+    if len(sections) == 3:
+        try:
+            timestamp = int(sections[2])
+        except ValueError:
+            raise LineProtocolError(f"Invalid timestamp: {sections[2]}")
+
+    return measurement, tags, fields, timestamp
@@ -0,0 +1,118 @@
+# services/live_usage.py
+import threading
+
+from sqlalchemy import bindparam, or_, update
+
+from models.server import Server
+
+
+class LiveUsage:
+    """Latest CPU/GPU usage of powered-on servers, written behind to the servers table
+
+    The monitor and the ingest endpoint record usage here every sweep; the
+    API serializes from it directly. Only values that changed since the
+    last flush are written back, in one batched UPDATE. Power probes that
+    find the state unchanged leave their timestamp here too, as the
+    servers' `last_update_time`.
+    """
+
+    def __init__(self):
+        self._values = {}  # server_id -> (cpu_usage, gpu_usage, gpus)
+        self._dirty = set()
+        self._seen = {}  # server_id -> time of the last power probe
+        self._seen_dirty = set()
+        self._lock = threading.Lock()
+
+    def record(self, server_id, cpu_usage, gpu_usage, gpus):
+        values = (cpu_usage, gpu_usage, gpus)
+        with self._lock:
+            if self._values.get(server_id) != values:
+                self._values[server_id] = values
+                self._dirty.add(server_id)
+
+    def get(self, server_id):
+        """(cpu_usage, gpu_usage, gpus) of a server, or None if nothing was recorded"""
+        return self._values.get(server_id)
+
+    def touch(self, server_id, when):
+        """Record a successful power probe of a server"""
+        with self._lock:
+            self._seen[server_id] = when
+            self._seen_dirty.add(server_id)
+
+    def last_seen(self, server_id):
+        """Time of the last probe recorded for a server, or None"""
+        return self._seen.get(server_id)
+
+    def discard(self, server_id):
+        """Forget a server, e.g. once it is off and its usage columns are cleared"""
+        with self._lock:
+            self._values.pop(server_id, None)
+            self._dirty.discard(server_id)
+
+    def forget(self, server_id):
+        """Drop everything held for a deleted server"""
+        self.discard(server_id)
+        with self._lock:
+            self._seen.pop(server_id, None)
+            self._seen_dirty.discard(server_id)
+
+    def drain(self):
+        """Take the values changed since the last drain
+
+        Returns:
+            list: Parameter rows for `flush_statement`
+        """
+        with self._lock:
+            rows = [
+                {'b_id': server_id, 'b_cpu_usage': values[0], 'b_gpu_usage': values[1], 'b_gpus': values[2]}
+                for server_id in self._dirty
+                for values in (self._values[server_id],)
+            ]
+            self._dirty.clear()
+        return rows
+
+    def requeue(self, rows):
+        """Mark the servers of a failed flush dirty again; newer values win"""
+        with self._lock:
+            self._dirty.update(row['b_id'] for row in rows if row['b_id'] in self._values)
+
+    def drain_seen(self):
+        """Take the probe times recorded since the last drain
+
+        Returns:
+            list: Parameter rows for `seen_statement`
+        """
+        with self._lock:
+            rows = [{'b_id': server_id, 'b_last_update_time': self._seen[server_id]}
+                    for server_id in self._seen_dirty]
+            self._seen_dirty.clear()
+        return rows
+
+    def requeue_seen(self, rows):
+        with self._lock:
+            self._seen_dirty.update(row['b_id'] for row in rows if row['b_id'] in self._seen)
+
+    @staticmethod
+    def flush_statement():
+        # Servers that went off since their usage was recorded keep their cleared columns
+        return (
+            update(Server.__table__)
+            .where(Server.__table__.c.id == bindparam('b_id'), Server.__table__.c.power_state == 'ON')
+            .values(cpu_usage=bindparam('b_cpu_usage'), gpu_usage=bindparam('b_gpu_usage'),
+                    gpus=bindparam('b_gpus'))
+        )
+
+    @staticmethod
+    def seen_statement():
+        # Never moves last_update_time back past a power state change written since the probe
+        last_update_time = Server.__table__.c.last_update_time
+        return (
+            update(Server.__table__)
+            .where(Server.__table__.c.id == bindparam('b_id'),
+                   or_(last_update_time.is_(None), last_update_time < bindparam('b_last_update_time')))
+            .values(last_update_time=bindparam('b_last_update_time'))
+        )
+
+
+live_usage = LiveUsage()
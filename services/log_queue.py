@@ -0,0 +1,47 @@
+# services/log_queue.py
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread
+
+    The stock handler renders `msg % args` before enqueuing so records can
+    be pickled; records here never leave the process, so the calling
+    thread only pays for creating the record.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level='INFO', fmt=LOG_FORMAT):
+    """Route all logging through an in-process queue drained by one writer thread
+
+    Safe to call more than once; the first call wins.
+
+    Returns:
+        QueueListener: The listener writing queued records to stderr
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(fmt))
+    records = queue.SimpleQueue()
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level))
+    root.addHandler(DeferredQueueHandler(records))
+    _listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(_listener.stop)
+    return _listener
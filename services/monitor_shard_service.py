@@ -0,0 +1,155 @@
+# services/monitor_shard_service.py
+import bisect
+import hashlib
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, UTC
+
+from flask import current_app
+
+from models.database import db
+from models.monitor_instance import MonitorInstance
+from models.server import Server
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes
+
+    Adding or removing a node only moves the keys in the arcs it gains or
+    loses, so monitor instances joining or leaving reshuffle about 1/n of
+    the servers instead of all of them.
+    """
+
+    def __init__(self, nodes, vnodes=128):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def get(self, key):
+        """Return the node owning `key`, or None for an empty ring"""
+        if not self._hashes:
+            return None
+        i = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._nodes[i]
+
+
+class MonitorShardService:
+    """Split monitored servers between the live monitor instances
+
+    Every instance heartbeats a row in `monitor_instances`. Servers pinned
+    to a site are hashed over the live instances of that site; unpinned
+    servers over all live instances. With MONITOR_SHARDING_ENABLED off an
+    instance owns every server.
+    """
+
+    @staticmethod
+    def enabled():
+        return current_app.config['MONITOR_SHARDING_ENABLED']
+
+    @staticmethod
+    def instance_id():
+        return current_app.config.get('MONITOR_INSTANCE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+    @staticmethod
+    def heartbeat():
+        """Register or refresh this instance and drop long-dead ones"""
+        config = current_app.config
+        now = datetime.now(UTC).replace(tzinfo=None)  # stored naive in UTC
+        try:
+            instance = db.session.get(MonitorInstance, MonitorShardService.instance_id())
+            if instance is None:
+                instance = MonitorInstance(id=MonitorShardService.instance_id(), started_at=now)
+                db.session.add(instance)
+                logger.info("Monitor instance %s joined (site: %s)", instance.id, config.get('MONITOR_SITE') or 'any')
+            instance.site = config.get('MONITOR_SITE')
+            instance.hostname = socket.gethostname()
+            instance.heartbeat_at = now
+
+            expired = now - timedelta(seconds=config['MONITOR_HEARTBEAT_TTL'] * 10)
+            MonitorInstance.query.filter(MonitorInstance.heartbeat_at < expired).delete()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Monitor heartbeat failed: %s", e)
+
+    @staticmethod
+    def deregister():
+        """Remove this instance so its servers move to the others right away"""
+        try:
+            MonitorInstance.query.filter_by(id=MonitorShardService.instance_id()).delete()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Failed to deregister monitor instance: %s", e)
+
+    @staticmethod
+    def live_instances():
+        cutoff = datetime.now(UTC).replace(tzinfo=None) - timedelta(
+            seconds=current_app.config['MONITOR_HEARTBEAT_TTL'])
+        return (MonitorInstance.query
+                .with_entities(MonitorInstance.id, MonitorInstance.site)
+                .filter(MonitorInstance.heartbeat_at >= cutoff)
+                .all())
+
+    @staticmethod
+    def assign(servers, instances, vnodes=128):
+        """Map server ids to their owning instance
+
+        Args:
+            servers: (server_id, site) pairs
+            instances: (instance_id, site) pairs of live instances
+
+        Returns:
+            dict: {server_id: instance_id}; servers pinned to a site with no
+            live instance are left out
+        """
+        ring = HashRing([instance_id for instance_id, _ in instances], vnodes)
+        site_members = {}
+        for instance_id, site in instances:
+            if site:
+                site_members.setdefault(site, []).append(instance_id)
+        site_rings = {site: HashRing(members, vnodes) for site, members in site_members.items()}
+
+        owners = {}
+        for server_id, site in servers:
+            if site:
+                owner = site_rings[site].get(server_id) if site in site_rings else None
+            else:
+                owner = ring.get(server_id)
+            if owner is not None:
+                owners[server_id] = owner
+        return owners
+
+    @staticmethod
+    def owned_ids():
+        """Ids of the servers this instance monitors, or None when sharding is off"""
+        if not MonitorShardService.enabled():
+            return None
+
+        me = MonitorShardService.instance_id()
+        instances = MonitorShardService.live_instances()
+        if me not in {instance_id for instance_id, _ in instances}:
+            # Not registered (yet): stay out of the way until the next heartbeat
+            return set()
+
+        servers = Server.query.with_entities(Server.id, Server.site).all()
+        owners = MonitorShardService.assign(servers, instances, current_app.config['MONITOR_VNODES'])
+        orphaned = {site for server_id, site in servers if server_id not in owners}
+        if orphaned:
+            logger.warning("No live monitor instance for site(s) %s", ', '.join(sorted(orphaned)))
+        return {server_id for server_id, owner in owners.items() if owner == me}
+
+    @staticmethod
+    def filter_owned(query):
+        """Restrict a Server query to the servers owned by this instance"""
+        owned = MonitorShardService.owned_ids()
+        if owned is None:
+            return query
+        return query.filter(Server.id.in_(owned))
@@ -1,29 +1,106 @@
 # services/power_control_service.py
+import re
 import subprocess
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
+from flask import current_app
+from sqlalchemy import update
 from models.database import db
+from models.server import Server
+from services.bmc_command_queue import command_queue
+from services.live_usage import live_usage
 
 class PowerControlService:
+    TRANSITIONAL_STATES = ('POWERING_ON', 'POWERING_OFF')
+    
+    # Command batches run through `ipmitool exec`, sharing one lanplus session
+    IPMI_BATCHES = {
+        'probe': ("chassis power status", "dcmi power reading"),
+        'probe_inlet': ("chassis power status", "dcmi power reading", "sdr type Temperature"),
+    }
+    POWER_READING_RE = re.compile(r'instantaneous power reading:\s*(\d+(?:\.\d+)?)\s*watts', re.I)
+    INLET_TEMP_RE = re.compile(r'^[^|\n]*inlet[^|\n]*\|.*\|\s*(-?\d+(?:\.\d+)?)\s*degrees c', re.I | re.M)
     
     @staticmethod
-    def _run_ipmi_command(server, action):
+    def _execute_ipmi_command(server, action, timeout=None):
         """
-        Execute IPMI command
+        Execute IPMI command, or one of IPMI_BATCHES
         """
         command = [
             "ipmitool", "-I", "lanplus",
             "-H", server.ipmi_host,
             "-U", server.ipmi_user,
-            "-P", server.ipmi_pass,
-            "chassis", "power", action
+            "-P", server.ipmi_pass
         ]
         
+        batch = PowerControlService.IPMI_BATCHES.get(action)
+        if batch:
+            try:
+                result = subprocess.run(command + ["exec", "/dev/stdin"], input="\n".join(batch) + "\n",
+                                        capture_output=True, text=True, timeout=timeout)
+            except subprocess.TimeoutExpired as e:
+                return False, str(e)
+            # A BMC without DCMI fails that line but still answers the rest of the batch
+            success = PowerControlService.parse_power_state(result.stdout) is not None
+            return success, result.stdout if success else result.stderr or result.stdout
+        
+        command += ["chassis", "power", action]
         try:
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
+            result = subprocess.run(command, check=True, capture_output=True, text=True, timeout=timeout)
             return True, result.stdout
-        except subprocess.CalledProcessError as e:
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
             return False, str(e)
 
+    @staticmethod
+    def _run_ipmi_command(server, action):
+        """
+        Execute IPMI command through the per-BMC queue, which serializes
+        commands to one host and coalesces identical pending ones
+        """
+        return command_queue.submit(server, action, PowerControlService._execute_ipmi_command)
+
+    @staticmethod
+    def parse_power_state(output):
+        """
+        Parse `chassis power status` output into 'ON', 'OFF' or None
+        """
+        output = output.lower()
+        if "power is on" in output:
+            return "ON"
+        if "power is off" in output:
+            return "OFF"
+        return None
+
+    @staticmethod
+    def parse_power_reading(output):
+        """
+        Parse `dcmi power reading` and `sdr type Temperature` output
+
+        Returns:
+            tuple: (watts, inlet temperature in degrees C), either may be None
+        """
+        watts = inlet_temp = None
+        match = PowerControlService.POWER_READING_RE.search(output)
+        if match and "reading state is: deactivated" not in output.lower():
+            watts = float(match.group(1))
+        match = PowerControlService.INLET_TEMP_RE.search(output)
+        if match:
+            inlet_temp = float(match.group(1))
+        return watts, inlet_temp
+
+    @staticmethod
+    def _record_power_status(server, output):
+        # Only a power state change is written right away; the probe time
+        # otherwise reaches last_update_time with the next live usage flush
+        power_state = PowerControlService.parse_power_state(output)
+        now = datetime.now(UTC)
+        if power_state and power_state != server.power_state:
+            server.power_state = power_state
+            server.last_update_time = now
+            db.session.commit()
+        else:
+            live_usage.touch(server.id, now)
+        return server.power_state
+
     @staticmethod
     def get_power_status(server):
         """
@@ -31,39 +108,113 @@ class PowerControlService:
         """
         success, output = PowerControlService._run_ipmi_command(server, "status")
         if success:
-            # Update database status
-            if "on" in output.lower():
-                server.power_state = "ON"
-            elif "off" in output.lower():
-                server.power_state = "OFF"
-            server.last_update_time = datetime.now(UTC)
-            db.session.commit()
-            return server.power_state
+            return PowerControlService._record_power_status(server, output)
         return "UNKNOWN"
 
+    @staticmethod
+    def read_power_status(server, inlet_temp=False):
+        """
+        Get server power status together with its DCMI power draw, in one BMC session
+
+        Returns:
+            tuple: (power state or "UNKNOWN", watts, inlet temperature); readings
+            the BMC does not support are None
+        """
+        success, output = PowerControlService._run_ipmi_command(server, "probe_inlet" if inlet_temp else "probe")
+        if not success:
+            return "UNKNOWN", None, None
+        watts, temp = PowerControlService.parse_power_reading(output)
+        return PowerControlService._record_power_status(server, output), watts, temp
+
+    @staticmethod
+    def begin_transition(server, transitional_state, timeout_secs, cause=None):
+        """
+        Atomically move a server into POWERING_ON / POWERING_OFF
+
+        `cause` tags the state event logged once the transition settles on
+        its target, whoever settles it.
+
+        Returns the state it left, or None when the command is already
+        satisfied, a power transition is already in flight (either way),
+        or another request raced it.
+        """
+        previous = server.power_state
+        target = "ON" if transitional_state == "POWERING_ON" else "OFF"
+        if previous == target or previous in PowerControlService.TRANSITIONAL_STATES:
+            return None
+        deadline = datetime.now(UTC) + timedelta(seconds=timeout_secs)
+        result = db.session.execute(
+            update(Server)
+            .where(Server.id == server.id, Server.power_state == previous)
+            .values(power_state=transitional_state, transition_deadline=deadline, transition_cause=cause)
+        )
+        db.session.commit()
+        return previous if result.rowcount == 1 else None
+
+    @staticmethod
+    def end_transition(server, power_state, now=None):
+        """
+        Leave a transitional state for a settled ON / OFF
+        """
+        now = now or datetime.now(UTC)
+        if server.power_state == ("POWERING_ON" if power_state == "ON" else "POWERING_OFF"):
+            server.state_change_cause = server.transition_cause
+        server.power_state = power_state
+        server.transition_deadline = None
+        server.transition_cause = None
+        server.last_update_time = now
+        if power_state == "OFF":
+            server.cpu_usage = None
+            server.gpu_usage = None
+            server.gpus = None
+            server.is_idle = False
+            server.idle_start_time = None
+            live_usage.discard(server.id)
+
     @staticmethod
     def startup(server):
         """
-        Power on the server
+        Power on the server; a no-op if it is already on or powering on,
+        and refused while it is powering off
         """
+        previous = PowerControlService.begin_transition(
+            server, "POWERING_ON", current_app.config['POWER_TRANSITION_TIMEOUT'])
+        if previous is None:
+            # A shutdown still in flight is not overridden
+            return server.power_state != "POWERING_OFF"
         success, _ = PowerControlService._run_ipmi_command(server, "on")
+        now = datetime.now(UTC)
         if success:
-            server.power_state = "ON"
-            server.last_update_time = datetime.now(UTC)
+            server.last_update_time = now
             # Reset idle state
             server.is_idle = True
-            server.idle_start_time = datetime.now(UTC)
-            db.session.commit()
+            server.idle_start_time = now
+            # Boot latency is measured until the first CPU sample arrives
+            server.power_on_issued_at = now
+        else:
+            server.power_state = previous
+            server.transition_deadline = None
+            server.transition_cause = None
+        db.session.commit()
         return success
 
     @staticmethod
     def shutdown(server):
         """
-        Power off the server
+        Power off the server; a no-op if it is already off or powering off,
+        and refused while it is powering on
         """
+        previous = PowerControlService.begin_transition(
+            server, "POWERING_OFF", current_app.config['POWER_TRANSITION_TIMEOUT'])
+        if previous is None:
+            # A startup still in flight is not overridden
+            return server.power_state != "POWERING_ON"
         success, _ = PowerControlService._run_ipmi_command(server, "off")
         if success:
-            server.power_state = "OFF"
             server.last_update_time = datetime.now(UTC)
-            db.session.commit()
+        else:
+            server.power_state = previous
+            server.transition_deadline = None
+            server.transition_cause = None
+        db.session.commit()
         return success
@@ -0,0 +1,109 @@
+# services/prewarm_service.py
+import logging
+from datetime import datetime, timedelta, UTC
+
+from flask import current_app
+
+from models.server import Server
+from services.monitor_shard_service import MonitorShardService
+from services.power_control_service import PowerControlService
+from services.schedule_service import ScheduleService, as_utc
+
+logger = logging.getLogger(__name__)
+
+
+class PrewarmService:
+    """Power servers on ahead of their booked windows
+
+    Each server's lead time is its measured boot-to-telemetry latency
+    (or PREWARM_DEFAULT_BOOT_SECS until one is known) plus a safety
+    margin. Boots are planned backwards from the window starts so that
+    at most PREWARM_MAX_CONCURRENT_BOOTS servers boot at once.
+    """
+
+    @staticmethod
+    def boot_lead_secs(server, config=None):
+        """Seconds before a window starts at which the server should be powered on"""
+        config = config or current_app.config
+        boot_secs = server.boot_latency_secs or config['PREWARM_DEFAULT_BOOT_SECS']
+        return boot_secs + config['PREWARM_MARGIN_SECS']
+
+    @staticmethod
+    def plan(jobs, lanes):
+        """Assign each boot a start time, latest deadline first, over `lanes` parallel slots
+
+        Args:
+            jobs: (key, deadline, duration) tuples, times in epoch seconds
+            lanes (int): Maximum number of concurrent boots
+
+        Returns:
+            list: (planned_start, key) tuples ordered by planned start
+        """
+        free_until = [float('inf')] * max(1, lanes)
+        planned = []
+        for key, deadline, duration in sorted(jobs, key=lambda job: job[1], reverse=True):
+            lane = max(range(len(free_until)), key=free_until.__getitem__)
+            end = min(deadline, free_until[lane])
+            start = end - duration
+            free_until[lane] = start
+            planned.append((start, key))
+        planned.sort()
+        return planned
+
+    @staticmethod
+    def prewarm_scheduled_servers():
+        """Start the booked servers whose planned boot time has come
+
+        Returns:
+            list: Names of the servers that were powered on
+        """
+        config = current_app.config
+        now = datetime.now(UTC)
+        windows = ScheduleService.upcoming_windows(now, timedelta(minutes=config['PREWARM_HORIZON_MINS']))
+        if not windows:
+            return []
+
+        # Windows already running are left alone: a server that is off during
+        # its window may have been turned off on purpose
+        first_start = {}
+        for server_id, start, _ in windows:
+            if start > now:
+                first_start.setdefault(server_id, start)
+        if not first_start:
+            return []
+
+        servers = MonitorShardService.filter_owned(Server.query.filter(
+            (Server.id.in_(first_start)) | (Server.power_on_issued_at.isnot(None))
+        )).all()
+
+        booting = 0
+        jobs = []
+        by_id = {}
+        for server in servers:
+            lead = PrewarmService.boot_lead_secs(server, config)
+            if server.power_on_issued_at is not None:
+                if (now - as_utc(server.power_on_issued_at)).total_seconds() < lead:
+                    booting += 1
+                continue
+            if server.id not in first_start or server.power_state != 'OFF':
+                continue
+            deadline = first_start[server.id].timestamp()
+            jobs.append((server.id, deadline, lead))
+            by_id[server.id] = server
+
+        capacity = config['PREWARM_MAX_CONCURRENT_BOOTS']
+        free_slots = capacity - booting
+        if not jobs or free_slots <= 0:
+            return []
+
+        started = []
+        for planned_start, server_id in PrewarmService.plan(jobs, capacity):
+            if planned_start > now.timestamp() or len(started) >= free_slots:
+                break
+            server = by_id[server_id]
+            logger.info("Pre-warming server %s for window at %s", server.name, first_start[server_id].isoformat())
+            if PowerControlService.startup(server):
+                started.append(server.name)
+            else:
+                logger.error("Failed to pre-warm server %s", server.name)
+        return started
@@ -0,0 +1,85 @@
+# services/readiness.py
+import logging
+import threading
+import time
+from datetime import datetime, UTC
+
+from flask import current_app
+
+from models.database import db
+from models.server import Server
+from services.server_serializer import ServerSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Tracks whether this process has loaded its first fleet snapshot
+
+    The snapshot (every server row, encoded once into the serializer
+    cache) is taken on a background thread the first time the app is hit,
+    so neither imports nor CLI invocations pay for it and the first
+    dashboard request after a restart is served warm.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.server_count = None
+        self.loaded_at = None
+        self.load_secs = None
+        self.error = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        """Take the snapshot in the background unless it is loaded or loading"""
+        if self.ready:
+            return
+        with self._lock:
+            if self.ready or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._prime, args=(app,), name='fleet-snapshot', daemon=True)
+            self._thread.start()
+
+    def _prime(self, app):
+        started = time.monotonic()
+        with app.app_context():
+            try:
+                servers = Server.query.order_by(Server.id).all()
+                ServerSerializer.encode_list(servers)
+                self.server_count = len(servers)
+                self.loaded_at = datetime.now(UTC)
+                self.load_secs = round(time.monotonic() - started, 3)
+                self.error = None
+                self.ready = True
+                logger.info("Fleet snapshot loaded: %d servers in %ss", self.server_count, self.load_secs)
+            except Exception as e:
+                self.error = str(e)
+                logger.warning("Fleet snapshot failed, will retry on the next request: %s", e)
+            finally:
+                db.session.remove()
+
+    def status(self):
+        return {
+            'status': 'ready' if self.ready else 'starting',
+            'servers': self.server_count,
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'load_secs': self.load_secs,
+            'error': self.error,
+        }
+
+
+_readiness_lock = threading.Lock()
+
+
+def get_readiness(app=None):
+    """Return the readiness tracker of the app, creating it on first use"""
+    app = app or current_app._get_current_object()
+    readiness = app.extensions.get('readiness')
+    if readiness is None:
+        with _readiness_lock:
+            readiness = app.extensions.get('readiness')
+            if readiness is None:
+                readiness = Readiness()
+                app.extensions['readiness'] = readiness
+    return readiness
@@ -0,0 +1,312 @@
+# services/rollup_service.py
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, UTC
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from models.database import db, skip_locked
+from models.power_sample import PowerSample
+from models.rollup_cursor import RollupCursor
+from models.rollup_watermark import RollupWatermark
+from models.server import Server
+from models.server_rollup import ServerRollup
+from models.server_state_event import ServerStateEvent, rollup_state
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = ('on_secs', 'idle_on_secs', 'saved_secs', 'auto_shutdowns', 'measured_kwh', 'measured_secs')
+
+
+def _naive(t):
+    # Rollup tables hold naive UTC, as SQLite returns it
+    return t.astimezone(UTC).replace(tzinfo=None) if t.tzinfo is not None else t
+
+
+def _floor_hour(t):
+    return t.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(t):
+    return t.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _floor_month(t):
+    return t.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+# Rollup granularities, finest first
+PERIODS = (('hour', _floor_hour), ('day', _floor_day), ('month', _floor_month))
+
+
+class RollupService:
+    """Incremental hourly, daily and monthly usage and savings totals per server
+
+    Each run reads only the state events and power samples not rolled up
+    yet, integrates every server's state from the previous
+    `processed_until` up to now, and adds the result to the affected
+    hour, day and month rows. Reports sum the coarsest rows that fit their
+    range, so a fleet-wide year is twelve rows per server.
+    """
+
+    WATERMARK = 'savings'
+    MARK_BATCH = 1000  # ids per UPDATE marking rows as rolled up
+
+    @staticmethod
+    def _add_span(totals, server_id, start, end, field):
+        """Add the seconds of [start, end) to `field`, split at hour boundaries"""
+        t = start
+        while t < end:
+            step_end = min(_floor_hour(t) + timedelta(hours=1), end)
+            RollupService._add_value(totals, server_id, t, field, (step_end - t).total_seconds())
+            t = step_end
+
+    @staticmethod
+    def _add_value(totals, server_id, at, field, value):
+        for period, floor in PERIODS:
+            totals[(server_id, period, floor(at))][field] += value
+
+    @staticmethod
+    def pick_period(start, end):
+        """Coarsest rollup period whose buckets tile [start, end) exactly"""
+        for period, floor in reversed(PERIODS):
+            if floor(start) == start and floor(end) == end:
+                return period
+        return 'hour'
+
+    @staticmethod
+    def _integrate(totals, cursor, start, end):
+        if end <= start:
+            return
+        if cursor.powered:
+            RollupService._add_span(totals, cursor.server_id, start, end, 'on_secs')
+            if cursor.idle:
+                RollupService._add_span(totals, cursor.server_id, start, end, 'idle_on_secs')
+        elif cursor.saving:
+            RollupService._add_span(totals, cursor.server_id, start, end, 'saved_secs')
+
+    @staticmethod
+    def _apply_events(totals, cursors, events, start, now):
+        """Walk every server's state from `start` to `now` through its new events"""
+        by_server = defaultdict(list)
+        for event in events:
+            by_server[event.server_id].append(event)
+
+        # Servers that never logged an event (e.g. bulk imported) start from their current state
+        missing = [row for row in db.session.query(Server.id, Server.power_state, Server.is_idle)
+                   if row.id not in cursors and row.id not in by_server]
+        for server_id, power_state, is_idle in missing:
+            powered, idle = rollup_state(power_state, is_idle)
+            cursors[server_id] = RollupCursor(server_id=server_id, powered=powered, idle=idle, saving=False)
+            db.session.add(cursors[server_id])
+
+        for server_id in set(cursors) | set(by_server):
+            server_events = by_server.get(server_id, [])
+            cursor = cursors.get(server_id)
+            t = start
+            if cursor is None:
+                # First sighting: nothing is known before its first event
+                first = server_events.pop(0)
+                t = min(max(_naive(first.occurred_at), start), now)
+                cursor = RollupCursor(server_id=server_id, powered=first.powered, idle=first.idle, saving=False)
+                cursors[server_id] = cursor
+                db.session.add(cursor)
+
+            for event in server_events:
+                at = min(max(_naive(event.occurred_at), t), now)
+                RollupService._integrate(totals, cursor, t, at)
+                t = at
+                if cursor.powered and not event.powered and event.cause == 'auto_shutdown':
+                    RollupService._add_value(totals, server_id, at, 'auto_shutdowns', 1)
+                    cursor.saving = True
+                elif event.powered:
+                    cursor.saving = False
+                cursor.powered, cursor.idle = event.powered, event.idle
+            RollupService._integrate(totals, cursor, t, now)
+
+    @staticmethod
+    def _apply_samples(totals, cursors, samples, max_gap):
+        """Integrate power samples, each covering the time since the previous one of its server"""
+        for sample in samples:
+            cursor = cursors.get(sample.server_id)
+            if cursor is None:
+                continue
+            at = _naive(sample.sampled_at)
+            gap = max_gap if cursor.last_sample_at is None else (at - cursor.last_sample_at).total_seconds()
+            gap = min(max(gap, 0.0), max_gap)
+            RollupService._add_value(totals, sample.server_id, at, 'measured_kwh', sample.watts * gap / 3.6e6)
+            RollupService._add_value(totals, sample.server_id, at, 'measured_secs', gap)
+            cursor.last_sample_at = at
+
+    @staticmethod
+    def _store(totals):
+        if not totals:
+            return
+        earliest = min(bucket for _, _, bucket in totals)
+        server_ids = {server_id for server_id, _, _ in totals}
+        rows = {
+            (row.server_id, row.period, row.bucket_start): row
+            for row in ServerRollup.query.filter(ServerRollup.bucket_start >= earliest,
+                                                 ServerRollup.server_id.in_(server_ids))
+        }
+        for key, values in totals.items():
+            if not any(values.values()):
+                continue
+            row = rows.get(key)
+            if row is None:
+                row = ServerRollup(server_id=key[0], period=key[1], bucket_start=key[2],
+                                   **{field: 0 for field in ROLLUP_FIELDS})
+                db.session.add(row)
+            for field, value in values.items():
+                setattr(row, field, getattr(row, field) + value)
+
+    @staticmethod
+    def _mark_rolled_up(model, ids):
+        for i in range(0, len(ids), RollupService.MARK_BATCH):
+            db.session.execute(
+                update(model).where(model.id.in_(ids[i:i + RollupService.MARK_BATCH])).values(rolled_up=True),
+                execution_options={'synchronize_session': False}
+            )
+
+    @staticmethod
+    def run():
+        """Fold new events and samples into the rollups
+
+        Safe to run from several monitor instances. On PostgreSQL a run
+        claims the watermark row with SKIP LOCKED, so a concurrent run
+        returns at once instead of repeating the work; everywhere the
+        watermark only advances if no other run moved it first, otherwise
+        this run is rolled back.
+
+        Rows are picked by their `rolled_up` flag rather than by id: ids are
+        handed out at insert, so a row can commit after rows with higher
+        ids have been processed, and is then taken by the next run.
+
+        Returns:
+            dict: Counts of processed events, samples and touched rows, or None if skipped
+        """
+        config = current_app.config
+        now = _naive(datetime.now(UTC))
+        query = RollupWatermark.query.filter_by(name=RollupService.WATERMARK)
+        if not db.session.query(query.exists()).scalar():
+            first_event = db.session.query(func.min(ServerStateEvent.occurred_at)).scalar()
+            db.session.add(RollupWatermark(name=RollupService.WATERMARK,
+                                           processed_until=min(_naive(first_event), now) if first_event else now))
+            db.session.commit()
+        watermark = skip_locked(query).first()
+        if watermark is None:
+            db.session.rollback()
+            logger.info("Rollup skipped, another instance is running it")
+            return None
+
+        start = _naive(watermark.processed_until)
+
+        try:
+            # Late commits can be older than `start`; their time is clamped to it
+            events = ServerStateEvent.query.filter(
+                ServerStateEvent.rolled_up.is_(False)
+            ).order_by(ServerStateEvent.occurred_at, ServerStateEvent.id).all()
+            samples = PowerSample.query.filter(
+                PowerSample.rolled_up.is_(False)
+            ).order_by(PowerSample.server_id, PowerSample.sampled_at).all()
+
+            cursors = {cursor.server_id: cursor for cursor in RollupCursor.query}
+            totals = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+            RollupService._apply_events(totals, cursors, events, start, now)
+            RollupService._apply_samples(totals, cursors, samples, config['POWER_SAMPLE_MAX_GAP'])
+            RollupService._store(totals)
+
+            retention = now - timedelta(days=config['ROLLUP_HOURLY_RETENTION_DAYS'])
+            ServerRollup.query.filter(ServerRollup.period == 'hour',
+                                      ServerRollup.bucket_start < retention).delete()
+
+            RollupService._mark_rolled_up(ServerStateEvent, [event.id for event in events])
+            RollupService._mark_rolled_up(PowerSample, [sample.id for sample in samples])
+            advanced = db.session.execute(
+                update(RollupWatermark)
+                .where(RollupWatermark.name == RollupService.WATERMARK,
+                       RollupWatermark.processed_until == watermark.processed_until)
+                .values(processed_until=now)
+            )
+            if advanced.rowcount != 1:
+                db.session.rollback()
+                logger.info("Rollup skipped, another instance advanced the watermark")
+                return None
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        summary = {'events': len(events), 'samples': len(samples), 'rows': len(totals)}
+        logger.info("Rolled up %d events and %d power samples into %d buckets up to %s",
+                    summary['events'], summary['samples'], summary['rows'], now.isoformat())
+        return summary
+
+    @staticmethod
+    def forget_server(server_id):
+        """Delete a server's events, cursor and rollups; the caller commits"""
+        for model in (ServerStateEvent, RollupCursor, ServerRollup):
+            model.query.filter_by(server_id=server_id).delete()
+
+    @staticmethod
+    def savings_report(start, end, period=None, server_ids=None):
+        """Sum rollups over [start, end), from `period` rows or the coarsest that fit
+
+        Energy is measured (DCMI samples) for servers that have samples in
+        the range and estimated from ENERGY_ACTIVE_WATTS / ENERGY_IDLE_WATTS
+        otherwise; savings assume a server left on idle draws ENERGY_IDLE_WATTS.
+        """
+        config = current_app.config
+        period = period or RollupService.pick_period(start, end)
+        active_watts = config['ENERGY_ACTIVE_WATTS']
+        idle_watts = config['ENERGY_IDLE_WATTS']
+
+        query = db.session.query(
+            ServerRollup.server_id,
+            Server.name,
+            func.sum(ServerRollup.on_secs),
+            func.sum(ServerRollup.idle_on_secs),
+            func.sum(ServerRollup.saved_secs),
+            func.sum(ServerRollup.auto_shutdowns),
+            func.sum(ServerRollup.measured_kwh),
+            func.sum(ServerRollup.measured_secs),
+        ).join(Server, Server.id == ServerRollup.server_id).filter(
+            ServerRollup.period == period,
+            ServerRollup.bucket_start >= start,
+            ServerRollup.bucket_start < end
+        )
+        if server_ids:
+            query = query.filter(ServerRollup.server_id.in_(server_ids))
+        query = query.group_by(ServerRollup.server_id, Server.name).order_by(Server.name)
+
+        servers = []
+        totals = dict.fromkeys(('on_hours', 'idle_on_hours', 'saved_node_hours', 'auto_shutdowns',
+                                'energy_kwh', 'measured_kwh', 'estimated_kwh', 'saved_kwh'), 0)
+        for server_id, name, on_secs, idle_secs, saved_secs, shutdowns, measured_kwh, measured_secs in query:
+            estimated_kwh = ((on_secs - idle_secs) * active_watts + idle_secs * idle_watts) / 3.6e6
+            entry = {
+                'server_id': server_id,
+                'name': name,
+                'on_hours': round(on_secs / 3600, 3),
+                'idle_on_hours': round(idle_secs / 3600, 3),
+                'saved_node_hours': round(saved_secs / 3600, 3),
+                'auto_shutdowns': int(shutdowns),
+                'energy_kwh': round(measured_kwh if measured_secs else estimated_kwh, 3),
+                'measured_kwh': round(measured_kwh, 3),
+                'estimated_kwh': round(estimated_kwh, 3),
+                'saved_kwh': round(saved_secs * idle_watts / 3.6e6, 3),
+            }
+            servers.append(entry)
+            for field in totals:
+                totals[field] += entry[field]
+
+        watermark = db.session.get(RollupWatermark, RollupService.WATERMARK)
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'period': period,
+            'processed_until': watermark.processed_until.isoformat() if watermark else None,
+            'totals': {field: round(value, 3) for field, value in totals.items()},
+            'servers': servers,
+        }
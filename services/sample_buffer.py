@@ -0,0 +1,120 @@
+# services/sample_buffer.py
+import math
+import threading
+from array import array
+from datetime import datetime, UTC
+
+from flask import current_app
+
+
+class SampleBuffer:
+    """Fixed-size ring of (timestamp, watts, inlet temperature) samples
+
+    Samples live in typed arrays (24 bytes each) rather than tuples of
+    objects; when the ring is full the oldest sample is overwritten.
+    """
+
+    __slots__ = ('capacity', 'times', 'watts', 'temps', 'start', 'size', 'dropped')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))  # POSIX seconds
+        self.watts = array('d', bytes(8 * capacity))
+        self.temps = array('d', bytes(8 * capacity))  # NaN when not collected
+        self.start = 0
+        self.size = 0
+        self.dropped = 0
+
+    def append(self, timestamp, watts, temp=None):
+        if self.size == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.size -= 1
+            self.dropped += 1
+        i = (self.start + self.size) % self.capacity
+        self.times[i] = timestamp
+        self.watts[i] = watts
+        self.temps[i] = math.nan if temp is None else temp
+        self.size += 1
+
+    def latest(self):
+        if not self.size:
+            return None
+        i = (self.start + self.size - 1) % self.capacity
+        return self._sample(i)
+
+    def drain(self):
+        """Remove and return every sample, oldest first"""
+        samples = [self._sample((self.start + n) % self.capacity) for n in range(self.size)]
+        self.start = self.size = 0
+        return samples
+
+    def _sample(self, i):
+        temp = self.temps[i]
+        return self.times[i], self.watts[i], None if math.isnan(temp) else temp
+
+
+class SampleBuffers:
+    """Per-server power sample rings, drained into the database in batches"""
+
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self._buffers = {}  # server_id -> SampleBuffer
+        self._lock = threading.Lock()
+
+    def record(self, server_id, sampled_at, watts, temp=None):
+        with self._lock:
+            buffer = self._buffers.get(server_id)
+            if buffer is None:
+                buffer = self._buffers[server_id] = SampleBuffer(self.capacity)
+            buffer.append(sampled_at.timestamp(), watts, temp)
+
+    def latest(self, server_id):
+        with self._lock:
+            buffer = self._buffers.get(server_id)
+            return buffer.latest() if buffer is not None else None
+
+    def drain(self):
+        """Remove every buffered sample
+
+        Returns:
+            tuple: (rows ready for a bulk insert into power_samples, samples dropped by full rings)
+        """
+        rows = []
+        dropped = 0
+        with self._lock:
+            for server_id, buffer in self._buffers.items():
+                for timestamp, watts, temp in buffer.drain():
+                    rows.append({
+                        'server_id': server_id,
+                        'sampled_at': datetime.fromtimestamp(timestamp, UTC),
+                        'watts': watts,
+                        'inlet_temp': temp
+                    })
+                dropped += buffer.dropped
+                buffer.dropped = 0
+        return rows, dropped
+
+    def requeue(self, rows):
+        """Put back rows from a failed flush; full rings keep the newest samples"""
+        for row in rows:
+            self.record(row['server_id'], row['sampled_at'], row['watts'], row['inlet_temp'])
+
+    def forget(self, server_id):
+        with self._lock:
+            self._buffers.pop(server_id, None)
+
+
+_buffers_lock = threading.Lock()
+
+
+def get_sample_buffers():
+    """Return the power sample buffers of the current app, creating them on first use"""
+    app = current_app._get_current_object()
+    buffers = app.extensions.get('sample_buffers')
+    if buffers is None:
+        with _buffers_lock:
+            buffers = app.extensions.get('sample_buffers')
+            if buffers is None:
+                buffers = SampleBuffers(capacity=app.config['POWER_SAMPLE_BUFFER_SIZE'])
+                app.extensions['sample_buffers'] = buffers
+    return buffers
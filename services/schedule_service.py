@@ -1,13 +1,263 @@
 # services/schedule_service.py
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, UTC
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil.rrule import DAILY, HOURLY, MINUTELY, SECONDLY, WEEKLY, rrule, rrulestr
+from flask import current_app
+
 from models.schedule import Schedule
-from datetime import datetime
+from models.schedule_rule import ScheduleRule
+
+logger = logging.getLogger(__name__)
+
+# Frequencies whose periods have a fixed wall-clock length
+_FIXED_PERIODS = {
+    SECONDLY: timedelta(seconds=1),
+    MINUTELY: timedelta(minutes=1),
+    HOURLY: timedelta(hours=1),
+    DAILY: timedelta(days=1),
+    WEEKLY: timedelta(weeks=1),
+}
+
+
+def as_utc(value):
+    """Treat naive datetimes (as stored by SQLite) as UTC"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
+def compile_rule(rrule, dtstart, timezone):
+    """Parse a stored rule into a dateutil rrule yielding aware datetimes
+
+    Raises:
+        ValueError: For an unknown timezone or an invalid RRULE
+    """
+    try:
+        tz = ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone '{timezone}'")
+    text = rrule.strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[len('RRULE:'):]
+    try:
+        return rrulestr(text, dtstart=dtstart.replace(tzinfo=tz))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid RRULE '{rrule}': {str(e)}")
+
+
+def _skip_to(recurrence, not_before):
+    """Move a rule's dtstart forward by whole periods to just before `not_before`
+
+    dateutil walks every occurrence from dtstart, so an old minutely rule
+    would otherwise be replayed from its first day on every expansion.
+    The shifted rule yields the same occurrences from `not_before` on.
+    Rules with a COUNT, and monthly or yearly ones, are left as they are.
+    """
+    if not isinstance(recurrence, rrule) or recurrence._count is not None:
+        return recurrence
+    period = _FIXED_PERIODS.get(recurrence._freq)
+    if period is None:
+        return recurrence
+    dtstart = recurrence._dtstart
+    step = period * recurrence._interval
+    # dateutil steps in wall-clock time, so count the periods in the rule's timezone;
+    # one period of slack absorbs DST folds
+    elapsed = not_before.astimezone(dtstart.tzinfo).replace(tzinfo=None) - dtstart.replace(tzinfo=None)
+    periods = elapsed // step - 1
+    if periods <= 0:
+        return recurrence
+    return recurrence.replace(dtstart=dtstart + step * periods)
+
+
+def _merge(intervals):
+    """Sort and merge (start, end) epoch intervals into parallel start/end lists"""
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if ends and start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class ScheduleIndex:
+    """Per-server booked intervals over a rolling horizon
+
+    One-off schedules and recurring rules are expanded into sorted, merged
+    intervals covering [now - lookback, now + horizon] and cached for `ttl`
+    seconds, so a lookup is a bisect over a handful of intervals instead of
+    a walk over every schedule row or rule occurrence.
+    """
+
+    MAX_OCCURRENCES = 10000  # per rule and build, guards against FREQ=SECONDLY style rules
+    LOOKBACK = timedelta(days=1)
+
+    def __init__(self, horizon=timedelta(days=14), ttl=60.0):
+        self.horizon = horizon
+        self.ttl = ttl
+        self._entries = {}  # server_id -> (expires_at, window_start, window_end, starts, ends)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _expand(server_ids, window_start, window_end):
+        """Load and expand the schedules of `server_ids` within a UTC window"""
+        intervals = {server_id: [] for server_id in server_ids}
+        naive_start = window_start.replace(tzinfo=None)
+        naive_end = window_end.replace(tzinfo=None)
+
+        rows = (Schedule.query
+                .with_entities(Schedule.server_id, Schedule.start_time, Schedule.end_time)
+                .filter(Schedule.server_id.in_(server_ids),
+                        Schedule.end_time >= naive_start,
+                        Schedule.start_time <= naive_end)
+                .all())
+        for server_id, start, end in rows:
+            intervals[server_id].append((as_utc(start).timestamp(), as_utc(end).timestamp()))
+
+        rules = ScheduleRule.query.filter(ScheduleRule.server_id.in_(server_ids),
+                                          ScheduleRule.enabled.is_(True)).all()
+        for rule in rules:
+            try:
+                recurrence = compile_rule(rule.rrule, rule.dtstart, rule.timezone)
+            except ValueError:
+                continue
+            duration = timedelta(minutes=rule.duration_mins)
+            # Occurrences that started before the window but are still running count too
+            first = window_start - duration
+            for n, start in enumerate(_skip_to(recurrence, first).xafter(first, inc=True)):
+                if start > window_end:
+                    break
+                if n >= ScheduleIndex.MAX_OCCURRENCES:
+                    logger.warning("Schedule rule %s of server %s has more than %d occurrences "
+                                   "between %s and %s; later ones are ignored",
+                                   rule.id, rule.server_id, ScheduleIndex.MAX_OCCURRENCES,
+                                   window_start.isoformat(), window_end.isoformat())
+                    break
+                intervals[rule.server_id].append((start.timestamp(), (start + duration).timestamp()))
+
+        return {server_id: _merge(spans) for server_id, spans in intervals.items()}
+
+    def ensure(self, server_ids, now=None):
+        """Make sure the cached horizon of every server in `server_ids` is fresh"""
+        clock = time.monotonic()
+        with self._lock:
+            stale = [server_id for server_id in set(server_ids)
+                     if (entry := self._entries.get(server_id)) is None or entry[0] <= clock]
+        if not stale:
+            return
+
+        now = as_utc(now) if now else datetime.now(UTC)
+        window_start, window_end = now - self.LOOKBACK, now + self.horizon
+        expanded = self._expand(stale, window_start, window_end)
+        with self._lock:
+            for server_id, (starts, ends) in expanded.items():
+                self._entries[server_id] = (clock + self.ttl, window_start.timestamp(),
+                                            window_end.timestamp(), starts, ends)
+
+    def intervals(self, server_id, window_start, window_end):
+        """Merged (start, end) UTC datetimes overlapping a window"""
+        starts, ends = self._lookup(server_id, window_start, window_end)
+        first = bisect.bisect_left(ends, as_utc(window_start).timestamp())
+        last = bisect.bisect_right(starts, as_utc(window_end).timestamp())
+        return [(datetime.fromtimestamp(starts[i], UTC), datetime.fromtimestamp(ends[i], UTC))
+                for i in range(first, last)]
+
+    def covers(self, server_id, check_time, lead_secs=0):
+        """Whether an interval covers `check_time`, or starts within `lead_secs` after it"""
+        check_time = as_utc(check_time)
+        starts, ends = self._lookup(server_id, check_time, check_time + timedelta(seconds=lead_secs))
+        t = check_time.timestamp()
+        # Merged intervals: the last one starting before t + lead has the latest end of all of them
+        i = bisect.bisect_right(starts, t + lead_secs) - 1
+        return i >= 0 and ends[i] >= t
+
+    def _lookup(self, server_id, window_start, window_end):
+        self.ensure([server_id])
+        with self._lock:
+            entry = self._entries.get(server_id)
+        if entry is not None:
+            _, cached_start, cached_end, starts, ends = entry
+            if cached_start <= as_utc(window_start).timestamp() and as_utc(window_end).timestamp() <= cached_end:
+                return starts, ends
+        # Outside the rolling horizon: expand just this window, uncached
+        return self._expand([server_id], as_utc(window_start), as_utc(window_end))[server_id]
+
+    def invalidate(self, server_id=None):
+        """Drop the cached horizon of one server, or of all of them"""
+        with self._lock:
+            if server_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(server_id, None)
+
+
+_index_lock = threading.Lock()
+
+
+def get_schedule_index():
+    """Return the schedule index of the current app, creating it on first use"""
+    app = current_app._get_current_object()
+    index = app.extensions.get('schedule_index')
+    if index is None:
+        with _index_lock:
+            index = app.extensions.get('schedule_index')
+            if index is None:
+                index = ScheduleIndex(
+                    horizon=timedelta(days=app.config.get('SCHEDULE_HORIZON_DAYS', 14)),
+                    ttl=app.config.get('SCHEDULE_CACHE_TTL', 60)
+                )
+                app.extensions['schedule_index'] = index
+    return index
+
 
 class ScheduleService:
 
     @staticmethod
-    def is_in_schedule(server, check_time: datetime) -> bool:
-        schedules = server.schedules  # 根據 SQLAlchemy relationship 直接取
-        for sch in schedules:
-            if sch.start_time <= check_time <= sch.end_time:
-                return True
-        return False
\ No newline at end of file
+    def is_in_schedule(server, check_time: datetime, lead_secs: float = 0) -> bool:
+        """Whether a booked window covers `check_time`
+
+        Args:
+            lead_secs: Also count the `lead_secs` before a window starts, so
+                servers powered on ahead of a booking are not shut down again
+        """
+        return get_schedule_index().covers(server.id, check_time, lead_secs)
+
+    @staticmethod
+    def upcoming_windows(now: datetime, horizon: timedelta):
+        """Booked windows that are active or start within `horizon`
+
+        Returns:
+            list: (server_id, start_time, end_time) tuples in UTC, ordered by start
+        """
+        now = as_utc(now)
+        # Schedule times are stored naive in UTC
+        naive_now = now.replace(tzinfo=None)
+        server_ids = {server_id for (server_id,) in (
+            Schedule.query.with_entities(Schedule.server_id)
+            .filter(Schedule.end_time > naive_now, Schedule.start_time <= naive_now + horizon)
+            .distinct()
+        )}
+        server_ids.update(server_id for (server_id,) in (
+            ScheduleRule.query.with_entities(ScheduleRule.server_id)
+            .filter(ScheduleRule.enabled.is_(True))
+            .distinct()
+        ))
+        if not server_ids:
+            return []
+
+        index = get_schedule_index()
+        index.ensure(server_ids, now)
+        windows = [(server_id, start, end)
+                   for server_id in server_ids
+                   for start, end in index.intervals(server_id, now, now + horizon)
+                   if end > now]
+        windows.sort(key=lambda window: window[1])
+        return windows
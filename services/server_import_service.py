@@ -0,0 +1,247 @@
+# services/server_import_service.py
+import csv
+import io
+import ipaddress
+import itertools
+import json
+import re
+from datetime import datetime, UTC
+
+from sqlalchemy import insert, select, update
+
+from models.database import db
+from models.server import Server
+
+_HOSTNAME_RE = re.compile(r'^(?=.{1,100}$)[A-Za-z0-9]([A-Za-z0-9-]{0,62}[A-Za-z0-9])?'
+                          r'(\.[A-Za-z0-9]([A-Za-z0-9-]{0,62}[A-Za-z0-9])?)*$')
+
+SUPPORTED_FORMATS = ('csv', 'json', 'yaml')
+
+
+class ImportFormatError(ValueError):
+    """Raised when an inventory cannot be read in the requested format"""
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'on'):
+        return True
+    if text in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ValueError(f"invalid boolean '{value}'")
+
+
+def _parse_int(value):
+    # int() would silently truncate 2.7 (and accept true as 1)
+    if isinstance(value, bool):
+        raise ValueError(f"invalid integer '{value}'")
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        pass
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"invalid integer '{value}'")
+    if not number.is_integer():
+        raise ValueError(f"'{value}' is not a whole number")
+    return int(number)
+
+
+class ServerImportService:
+    REQUIRED_FIELDS = ('name', 'ipmi_host', 'ipmi_user', 'ipmi_pass')
+    OPTIONAL_FIELDS = {
+        'idle_threshold_mins': _parse_int,
+        'auto_shutdown_enabled': _parse_bool,
+        'site': lambda value: str(value).strip() or None,
+    }
+    BATCH_SIZE = 500  # rows per existence check / INSERT / UPDATE statement
+
+    @staticmethod
+    def detect_format(filename=None, content_type=None):
+        """Guess the inventory format from a file name or content type"""
+        hint = (filename or '').lower()
+        for fmt, suffixes in (('csv', ('.csv',)), ('json', ('.json', '.jsonl', '.ndjson')),
+                              ('yaml', ('.yaml', '.yml'))):
+            if hint.endswith(suffixes):
+                return fmt
+        content_type = (content_type or '').lower()
+        if 'csv' in content_type:
+            return 'csv'
+        if 'json' in content_type:
+            return 'json'
+        if 'yaml' in content_type:
+            return 'yaml'
+        return None
+
+    @staticmethod
+    def iter_records(stream, fmt):
+        """Yield (row number, record dict) from a binary inventory stream
+
+        CSV and JSON Lines are read incrementally; a JSON array or a YAML
+        document is parsed as a whole.
+        """
+        if fmt == 'csv':
+            reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+            # Row numbers count the header line, matching what a spreadsheet shows
+            for row_no, row in enumerate(reader, 2):
+                yield row_no, {k.strip(): (v.strip() if isinstance(v, str) else v)
+                               for k, v in row.items() if k}
+        elif fmt == 'json':
+            text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+            first = text.read(1)
+            while first and first.isspace():
+                first = text.read(1)
+            if first == '[':
+                try:
+                    records = json.loads(first + text.read())
+                except json.JSONDecodeError as e:
+                    raise ImportFormatError(f"Invalid JSON: {str(e)}")
+                for row_no, record in enumerate(records, 1):
+                    yield row_no, record
+            elif first:
+                # JSON Lines: one object per line
+                lines = itertools.chain([first + text.readline()], text)
+                for row_no, line in enumerate(lines, 1):
+                    yield from ServerImportService._json_line(row_no, line)
+        elif fmt == 'yaml':
+            import yaml
+            try:
+                document = yaml.safe_load(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+            except yaml.YAMLError as e:
+                raise ImportFormatError(f"Invalid YAML: {str(e)}")
+            if isinstance(document, dict):
+                document = document.get('servers', [])
+            if not isinstance(document, list):
+                raise ImportFormatError("YAML inventory must be a list of servers or contain a 'servers' list")
+            for row_no, record in enumerate(document, 1):
+                yield row_no, record
+        else:
+            raise ImportFormatError(f"Unsupported format '{fmt}', expected one of {', '.join(SUPPORTED_FORMATS)}")
+
+    @staticmethod
+    def _json_line(row_no, line):
+        line = line.strip()
+        if not line:
+            return
+        try:
+            yield row_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_no, ImportFormatError(f"Invalid JSON: {str(e)}")
+
+    @staticmethod
+    def validate(record):
+        """Normalize one inventory record
+
+        Returns:
+            tuple: (row dict, None) when valid, (None, error message) otherwise
+        """
+        if isinstance(record, Exception):
+            return None, str(record)
+        if not isinstance(record, dict):
+            return None, "Record must be an object"
+
+        missing = [f for f in ServerImportService.REQUIRED_FIELDS if not record.get(f)]
+        if missing:
+            return None, f"Missing required field(s): {', '.join(missing)}"
+
+        row = {f: str(record[f]).strip() for f in ServerImportService.REQUIRED_FIELDS}
+        if len(row['name']) > 100:
+            return None, "Name is longer than 100 characters"
+
+        host = row['ipmi_host']
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            if not _HOSTNAME_RE.match(host):
+                return None, f"Invalid IPMI host '{host}'"
+
+        for field, parse in ServerImportService.OPTIONAL_FIELDS.items():
+            value = record.get(field)
+            if value is None or value == '':
+                continue
+            try:
+                row[field] = parse(value)
+            except (TypeError, ValueError) as e:
+                return None, f"Invalid {field}: {str(e)}"
+        if row.get('idle_threshold_mins') is not None and row['idle_threshold_mins'] < 1:
+            return None, "idle_threshold_mins must be at least 1"
+
+        return row, None
+
+    @staticmethod
+    def upsert(records, update_existing=True, dry_run=False):
+        """Validate and upsert inventory records in a single transaction
+
+        Existence is checked with one `name IN (...)` query per batch and
+        rows are written with batched INSERT and UPDATE statements.
+
+        Args:
+            records: Iterable of (row number, record) pairs
+            update_existing (bool): Overwrite servers that already exist
+            dry_run (bool): Validate and count, but roll back instead of committing
+
+        Returns:
+            dict: Counts of created/updated/skipped servers and per-row errors
+        """
+        report = {'created': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+        seen = set()
+        batch = []
+
+        try:
+            for row_no, record in records:
+                row, error = ServerImportService.validate(record)
+                if error is None and row['name'] in seen:
+                    error = f"Duplicate server name '{row['name']}' in inventory"
+                if error is not None:
+                    name = record.get('name') if isinstance(record, dict) else None
+                    report['errors'].append({'row': row_no, 'name': name, 'error': error})
+                    continue
+
+                seen.add(row['name'])
+                batch.append(row)
+                if len(batch) >= ServerImportService.BATCH_SIZE:
+                    ServerImportService._write_batch(batch, update_existing, report)
+                    batch = []
+            if batch:
+                ServerImportService._write_batch(batch, update_existing, report)
+
+            if dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        report['dry_run'] = dry_run
+        return report
+
+    @staticmethod
+    def _write_batch(rows, update_existing, report):
+        existing = dict(db.session.execute(
+            select(Server.name, Server.id).where(Server.name.in_([row['name'] for row in rows]))
+        ).all())
+
+        now = datetime.now(UTC)
+        inserts = []
+        updates = []
+        for row in rows:
+            server_id = existing.get(row['name'])
+            if server_id is None:
+                inserts.append({'power_state': 'OFF', 'last_update_time': now, 'is_idle': False, **row})
+            elif update_existing:
+                updates.append({'id': server_id, **row})
+            else:
+                report['skipped'] += 1
+
+        if inserts:
+            db.session.execute(insert(Server), inserts)
+            report['created'] += len(inserts)
+        if updates:
+            db.session.execute(update(Server), updates)
+            report['updated'] += len(updates)
@@ -0,0 +1,165 @@
+# services/server_serializer.py
+import json
+import threading
+from datetime import datetime, UTC
+
+from services.gpu_usage import summarize_gpus
+from services.live_usage import live_usage
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def _iso8601(value):
+    return value.isoformat() if value is not None else None
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _idle_duration(server, now):
+    """Idle duration in minutes, treating naive datetimes as UTC"""
+    idle_start_time = server.idle_start_time
+    if not server.is_idle or not idle_start_time:
+        return 0
+    if idle_start_time.tzinfo is None:
+        idle_start_time = idle_start_time.replace(tzinfo=UTC)
+    return round((now - idle_start_time).total_seconds() / 60.0)
+
+
+def _last_update_time(server, now):
+    # Probes that find the power state unchanged only record their time in live usage
+    updated = server.last_update_time
+    seen = live_usage.last_seen(server.id)
+    if seen is None:
+        return updated
+    if updated is not None and updated.tzinfo is None:
+        seen = seen.replace(tzinfo=None)  # the column reads back naive (UTC) on SQLite
+    return seen if updated is None or seen > updated else updated
+
+
+def _usage_raw(server, now):
+    # Live usage is newer than the columns, which are only written every USAGE_FLUSH_INTERVAL
+    live = live_usage.get(server.id) if server.power_state == 'ON' else None
+    cpu_usage, gpu_usage, gpus = live if live is not None else (server.cpu_usage, server.gpu_usage, server.gpus)
+    # Per-GPU entries are frozen into tuples so they compare (and fingerprint) by value
+    gpus = tuple(tuple(sorted(gpu.items())) for gpu in gpus) if gpus else ()
+    return cpu_usage, gpu_usage, gpus
+
+
+def _current_usage(raw):
+    cpu_usage, gpu_usage, gpus = raw
+    summary = summarize_gpus([dict(gpu) for gpu in gpus])
+    return {
+        "cpu_usage": _float(cpu_usage),
+        "gpu_usage": _float(gpu_usage),
+        "gpu_usage_mean": summary['gpu_usage_mean'],
+        "gpu_memory_usage": summary['gpu_memory_usage'],
+        "gpus": summary['gpus'],
+    }
+
+
+# The `Server` schema: (field, model columns it reads, raw value getter, JSON formatter).
+# Raw values double as the cache fingerprint; formatters only run on a cache miss.
+SERVER_SCHEMA = (
+    ('id', ('id',), lambda s, now: s.id, None),
+    ('name', ('name',), lambda s, now: s.name, None),
+    ('ipmi_host', ('ipmi_host',), lambda s, now: s.ipmi_host, None),
+    ('site', ('site',), lambda s, now: s.site, None),
+    ('power_state', ('power_state',), lambda s, now: s.power_state, None),
+    ('last_update_time', ('id', 'last_update_time'), _last_update_time, _iso8601),
+    ('is_idle', ('is_idle',), lambda s, now: s.is_idle, None),
+    ('idle_start_time', ('idle_start_time',), lambda s, now: s.idle_start_time, _iso8601),
+    ('idle_duration_mins', ('is_idle', 'idle_start_time'), _idle_duration, None),
+    ('idle_threshold_mins', ('idle_threshold_mins',), lambda s, now: s.idle_threshold_mins, None),
+    ('auto_shutdown_enabled', ('auto_shutdown_enabled',), lambda s, now: s.auto_shutdown_enabled, None),
+    ('current_usage', ('id', 'power_state', 'cpu_usage', 'gpu_usage', 'gpus'), _usage_raw, _current_usage),
+)
+
+SERVER_FIELDS = tuple(field[0] for field in SERVER_SCHEMA)
+
+
+class CompiledSerializer:
+    """Serializer specialised for one projection of the `Server` schema"""
+
+    def __init__(self, fields):
+        selected = [entry for entry in SERVER_SCHEMA if entry[0] in fields]
+        self.fields = tuple(entry[0] for entry in selected)
+        self.columns = tuple(sorted({column for entry in selected for column in entry[1]}))
+        self._getters = tuple(entry[2] for entry in selected)
+        self._formatters = tuple(entry[3] for entry in selected)
+
+    def raw_values(self, server, now):
+        return tuple(getter(server, now) for getter in self._getters)
+
+    def build(self, raw_values):
+        return {
+            name: formatter(value) if formatter else value
+            for name, formatter, value in zip(self.fields, self._formatters, raw_values)
+        }
+
+
+class ServerSerializer:
+    """Shared JSON serializer for the `Server` API schema
+
+    Produces the same document as marshalling through `server_model` in
+    routes.py, but encodes each server once per version and reuses the
+    encoded bytes until one of its fields changes.
+    """
+
+    MAX_CACHED_FRAGMENTS = 50000
+
+    # Encoded fragments keyed by (server id, fields): {key: (fingerprint, bytes)}
+    _cache = {}
+    _compiled = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def compile(fields=None):
+        """Return the serializer for a projection, `None` meaning every field"""
+        key = tuple(f for f in SERVER_FIELDS if f in fields) if fields else SERVER_FIELDS
+        compiled = ServerSerializer._compiled.get(key)
+        if compiled is None:
+            compiled = CompiledSerializer(key)
+            ServerSerializer._compiled[key] = compiled
+        return compiled
+
+    @staticmethod
+    def to_dict(server, now=None, fields=None):
+        """Build the API representation of a server"""
+        compiled = ServerSerializer.compile(fields)
+        return compiled.build(compiled.raw_values(server, now or datetime.now(UTC)))
+
+    @staticmethod
+    def encode(server, now=None, fields=None):
+        """Return the JSON bytes for a server, reusing the cached fragment if unchanged"""
+        compiled = ServerSerializer.compile(fields)
+        fingerprint = compiled.raw_values(server, now or datetime.now(UTC))
+        key = (server.id, compiled.fields)
+        cached = ServerSerializer._cache.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        fragment = _json_encoder.encode(compiled.build(fingerprint)).encode('utf-8')
+        ServerSerializer._cache[key] = (fingerprint, fragment)
+        return fragment
+
+    @staticmethod
+    def encode_list(servers, fields=None):
+        """Assemble a JSON array from the per-server fragments"""
+        now = datetime.now(UTC)
+        fragments = [ServerSerializer.encode(s, now, fields) for s in servers]
+
+        # Start over if deleted servers and one-off projections pile up
+        if len(ServerSerializer._cache) > ServerSerializer.MAX_CACHED_FRAGMENTS:
+            with ServerSerializer._lock:
+                ServerSerializer._cache.clear()
+
+        return b'[' + b','.join(fragments) + b']'
+
+    @staticmethod
+    def invalidate(server_id):
+        """Forget the cached fragments of a server"""
+        with ServerSerializer._lock:
+            for key in [key for key in ServerSerializer._cache if key[0] == server_id]:
+                ServerSerializer._cache.pop(key, None)
@@ -1,34 +1,61 @@
 # services/server_state_monitor_service.py
-from datetime import datetime, UTC
+import random
+import time
+from datetime import datetime, timedelta, UTC
+from itertools import compress
+from flask import current_app
 from models.server import Server
+from models.power_sample import PowerSample
 from models.database import db
-from services.schedule_service import ScheduleService
+from sqlalchemy import insert, or_
+from services.schedule_service import ScheduleService, as_utc, get_schedule_index
 from services.power_control_service import PowerControlService
+from services.prewarm_service import PrewarmService
+from services.monitor_shard_service import MonitorShardService
+from services.shutdown_executor import ShutdownExecutor
+from services.influxdb_client import get_influxdb_client
+from services.telemetry_cache import TelemetryCache, get_telemetry_cache
+from services.usage_store import get_usage_store
+from services.gpu_usage import gpu_entry, summarize_gpus
+from services.sample_buffer import get_sample_buffers
+from services.live_usage import live_usage
+from services.line_protocol import LineProtocolError, parse_line
 import logging
-import requests
 
 logger = logging.getLogger(__name__)
 
 class ServerStateMonitorService:
-    INFLUXDB_URL = 'https://influxdb.cgi.lab.nycu.edu.tw/query'
-    INFLUXDB_DB = 'telegraf'
     IDLE_THRESHOLD = 5.0  # 5% threshold for CPU and GPU usage
+    MAX_INGEST_ERRORS = 20  # per-line errors reported back for one ingest batch
+    MAX_BOOT_LATENCY_SECS = 3600  # longer power-on-to-telemetry gaps are not boots
+    BOOT_LATENCY_SMOOTHING = 0.3  # weight of the newest boot in the moving average
     
     @staticmethod
-    def query_influxdb(query, timeout=10):
-        """Query InfluxDB using direct HTTP request with timeout"""
-        url = f"{ServerStateMonitorService.INFLUXDB_URL}?db={ServerStateMonitorService.INFLUXDB_DB}"
-        params = {
-            'q': query,
-            'epoch': 'ms'
-        }
-        try:
-            response = requests.get(url, params=params, timeout=timeout)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"InfluxDB query failed: {str(e)}")
-            return None
+    def _log_detail(msg, *args):
+        """Per-server detail: logged at DEBUG, for a MONITOR_LOG_SAMPLE_RATE share of calls
+        
+        State transitions are logged at INFO by the callers instead.
+        """
+        if logger.isEnabledFor(logging.DEBUG) and random.random() < current_app.config['MONITOR_LOG_SAMPLE_RATE']:
+            logger.debug(msg, *args)
+    
+    @staticmethod
+    def query_influxdb(query, params=None, timeout=None, use_cache=True):
+        """Query InfluxDB through the app's pooled client and shared TTL cache
+
+        Args:
+            query (str): InfluxQL statement with `$name` placeholders
+            params (dict): Values bound to the placeholders
+            timeout (float): Time budget in seconds, defaults to INFLUXDB_TIMEOUT
+            use_cache (bool): Serve repeated queries from the telemetry cache
+        """
+        client = get_influxdb_client()
+        if not use_cache:
+            return client.query(query, params=params, timeout=timeout)
+        return get_telemetry_cache().get_or_load(
+            TelemetryCache.make_key(query, params),
+            lambda: client.query(query, params=params, timeout=timeout)
+        )
 
     @staticmethod
     def get_server_resource_usage(server_name):
@@ -42,31 +69,33 @@ class ServerStateMonitorService:
         """
         try:
             # Query CPU usage
-            cpu_query = f'''
+            cpu_query = '''
             SELECT usage_idle, usage_system, usage_user 
             FROM "cpu" 
-            WHERE "cpu" = 'cpu-total' AND "host" = '{server_name}'
+            WHERE "cpu" = 'cpu-total' AND "host" = $host
             AND time > now() - 5m 
             ORDER BY time DESC 
             LIMIT 1
             '''
-            cpu_results = ServerStateMonitorService.query_influxdb(cpu_query)
+            cpu_results = ServerStateMonitorService.query_influxdb(cpu_query, {'host': server_name})
             
-            # Query GPU usage
-            gpu_query = f'''
-            SELECT utilization_gpu
+            # Query GPU usage, latest point of every GPU in one series each
+            gpu_query = '''
+            SELECT last(utilization_gpu) AS utilization_gpu, last(memory_used) AS memory_used,
+            last(memory_total) AS memory_total
             FROM "nvidia_smi"
-            WHERE "host" = '{server_name}'
+            WHERE "host" = $host
             AND time > now() - 5m
-            ORDER BY time DESC
-            LIMIT 1
+            GROUP BY "index"
             '''
-            gpu_results = ServerStateMonitorService.query_influxdb(gpu_query)
+            gpu_results = ServerStateMonitorService.query_influxdb(gpu_query, {'host': server_name})
             
             usage_data = {
                 'cpu_usage': None,
                 'gpu_usage': None,
-                'has_data': False
+                'gpus': [],
+                'has_data': False,
+                'sample_time': None
             }
             
             # Process CPU data
@@ -78,171 +107,516 @@ class ServerStateMonitorService:
                 data = dict(zip(columns, values))
                 usage_data['cpu_usage'] = 100 - data['usage_idle']  # Convert idle to usage
                 usage_data['has_data'] = True
+                usage_data['sample_time'] = datetime.fromtimestamp(data['time'] / 1000.0, UTC)
             
             # Process GPU data
             if (gpu_results and 'results' in gpu_results and 
                 gpu_results['results'][0].get('series')):
-                series = gpu_results['results'][0]['series'][0]
-                values = series['values'][0]
-                columns = series['columns']
-                data = dict(zip(columns, values))
-                usage_data['gpu_usage'] = data['utilization_gpu']
+                gpus = []
+                for series in gpu_results['results'][0]['series']:
+                    data = dict(zip(series['columns'], series['values'][0]))
+                    if data.get('utilization_gpu') is None:
+                        continue
+                    gpu = (series.get('tags') or {}).get('index') or str(len(gpus))
+                    gpus.append(gpu_entry(gpu, data['utilization_gpu'], data.get('memory_used'), data.get('memory_total')))
+                usage_data.update(summarize_gpus(gpus))
             
             return usage_data
             
         except Exception as e:
-            logger.error(f"Error getting resource usage for {server_name}: {str(e)}")
+            logger.error("Error getting resource usage for %s: %s", server_name, e)
             return None
     
     @staticmethod
-    def _check_idle_state(server):
-        """Check if a server is in idle state based on CPU and GPU usage
+    def _evaluate_idle(server, usage_data):
+        """Decide whether usage data means the server is idle"""
+        cpu_idle = usage_data['cpu_usage'] < ServerStateMonitorService.IDLE_THRESHOLD
+        
+        # For servers with GPU, check both CPU and GPU
+        if usage_data['gpu_usage'] is not None:
+            gpu_idle = usage_data['gpu_usage'] < ServerStateMonitorService.IDLE_THRESHOLD
+            is_idle = cpu_idle and gpu_idle
+            ServerStateMonitorService._log_detail("Server %s status - CPU: %.1f%%, GPU: %.1f%%, Idle: %s",
+                                                  server.name, usage_data['cpu_usage'], usage_data['gpu_usage'], is_idle)
+        else:
+            # For CPU-only servers, check only CPU
+            is_idle = cpu_idle
+            ServerStateMonitorService._log_detail("Server %s status - CPU: %.1f%%, Idle: %s",
+                                                  server.name, usage_data['cpu_usage'], is_idle)
+        
+        return is_idle
+    
+    @staticmethod
+    def _fetch_usage(server):
+        """Latest resource usage of a powered-on server
+        
+        Usage pushed to /api/ingest is used when fresh; otherwise it is
+        pulled from InfluxDB.
         
         Returns:
-            bool: True if server is idle, False if server is in use
+            dict: Usage data, or None if unavailable
         """
         try:
-            usage_data = ServerStateMonitorService.get_server_resource_usage(server.name)
+            usage_data = get_usage_store().get(server.name)
+            if usage_data is None:
+                usage_data = ServerStateMonitorService.get_server_resource_usage(server.name)
             
             if not usage_data or not usage_data['has_data']:
-                logger.warning(f"No resource usage data available for {server.name}")
-                return server.is_idle  # Keep current state if no data
-            
-            cpu_idle = usage_data['cpu_usage'] < ServerStateMonitorService.IDLE_THRESHOLD
+                # Counted in the sweep summary
+                ServerStateMonitorService._log_detail("No resource usage data available for %s", server.name)
+                return None  # Keep current state if no data
             
-            # For servers with GPU, check both CPU and GPU
-            if usage_data['gpu_usage'] is not None:
-                gpu_idle = usage_data['gpu_usage'] < ServerStateMonitorService.IDLE_THRESHOLD
-                is_idle = cpu_idle and gpu_idle
-                logger.info(f"Server {server.name} status - CPU: {usage_data['cpu_usage']:.1f}%, "
-                          f"GPU: {usage_data['gpu_usage']:.1f}%, Idle: {is_idle}")
-            else:
-                # For CPU-only servers, check only CPU
-                is_idle = cpu_idle
-                logger.info(f"Server {server.name} status - CPU: {usage_data['cpu_usage']:.1f}%, "
-                          f"Idle: {is_idle}")
-            
-            return is_idle, usage_data
+            return usage_data
             
         except Exception as e:
-            logger.error(f"Failed to check idle state for {server.name}: {str(e)}")
-            return server.is_idle, None  # Return current recorded state if check fails
+            logger.error("Failed to check idle state for %s: %s", server.name, e)
+            return None  # Keep current recorded state if check fails
+    
+    @staticmethod
+    def _apply_idle_state(server, is_idle, usage_data, now):
+        """Record idle transitions and the latest resource usage on a powered-on server"""
+        if is_idle and not server.is_idle:
+            server.is_idle = True
+            server.idle_start_time = now  # Ensure UTC time
+            logger.info("Server %s marked as idle", server.name)
+        elif not is_idle and server.is_idle:
+            server.is_idle = False
+            server.idle_start_time = None
+            logger.info("Server %s no longer idle", server.name)
+        
+        if usage_data and usage_data['has_data']:
+            ServerStateMonitorService._apply_usage(server, usage_data, now)
+    
+    @staticmethod
+    def _apply_usage(server, usage_data, now):
+        """Record the latest resource usage of a powered-on server
+        
+        Usage goes to the live usage store, which the API reads; it reaches
+        the servers table with the next `flush_live_usage`.
+        """
+        cpu_usage = round(usage_data['cpu_usage'], 2) if usage_data['cpu_usage'] is not None else None
+        gpu_usage = round(usage_data['gpu_usage'], 2) if usage_data['gpu_usage'] is not None else None
+        live_usage.record(server.id, cpu_usage, gpu_usage, usage_data.get('gpus') or None)
+        ServerStateMonitorService._log_detail("Updated resource usage for %s - CPU: %s%%, GPU: %s%%",
+                                              server.name, cpu_usage, gpu_usage)
+        ServerStateMonitorService._record_boot_latency(server, usage_data.get('sample_time'), now)
+    
+    @staticmethod
+    def _record_boot_latency(server, sample_time, now):
+        """Measure power-on-to-first-CPU-sample latency after a startup command"""
+        if not server.power_on_issued_at or not sample_time:
+            return
+        issued_at = server.power_on_issued_at
+        if issued_at.tzinfo is None:
+            issued_at = issued_at.replace(tzinfo=UTC)
+        
+        latency = (sample_time - issued_at).total_seconds()
+        if latency <= 0:
+            # Sample predates the power-on (telegraf data from before the last shutdown)
+            if now - issued_at > timedelta(seconds=ServerStateMonitorService.MAX_BOOT_LATENCY_SECS):
+                server.power_on_issued_at = None
+            return
+        
+        server.power_on_issued_at = None
+        if latency > ServerStateMonitorService.MAX_BOOT_LATENCY_SECS:
+            return
+        if server.boot_latency_secs is None:
+            server.boot_latency_secs = round(latency, 1)
+        else:
+            alpha = ServerStateMonitorService.BOOT_LATENCY_SMOOTHING
+            server.boot_latency_secs = round((1 - alpha) * server.boot_latency_secs + alpha * latency, 1)
+        logger.info("Server %s booted in %.0fs (estimate %.0fs)", server.name, latency, server.boot_latency_secs)
     
     @staticmethod
     def check_and_update_server_states():
-        """Check and update the status of all servers"""
-        servers = Server.query.all()
+        """Check and update the status of the servers owned by this monitor instance
+        
+        Power state and usage are still probed server by server; idle
+        transitions for the whole sweep are then evaluated at once on the
+        fleet state and only the servers that changed are written back.
+        Servers in a POWERING_* state are left to `poll_transitions`.
+        With IDLE_EVALUATION_MODE=window, usage comes from one grouped
+        InfluxDB query for the whole sweep instead (see `_window_usage`).
+        Logs one summary record per sweep; per-server lines only for
+        transitions and errors.
+        """
+        started = time.perf_counter()
+        servers = MonitorShardService.filter_owned(Server.query.filter(
+            or_(Server.power_state.is_(None),
+                Server.power_state.notin_(PowerControlService.TRANSITIONAL_STATES))
+        )).all()
         now = datetime.now(UTC)  # Ensure UTC time
+        window_mode = current_app.config['IDLE_EVALUATION_MODE'] == 'window'
+        from services.fleet_state import get_fleet_state  # imports numpy, only needed by the monitor
+        fleet = get_fleet_state()
+        slots = fleet.load((server.id, server.power_state, server.is_idle, server.idle_start_time,
+                            server.idle_threshold_mins, server.auto_shutdown_enabled) for server in servers)
         
-        for server in servers:
+        reported = []  # (index into servers, usage data) of powered-on servers with fresh usage
+        powered_on = []  # indices into servers, for the window mode
+        summary = dict.fromkeys(('on', 'off', 'power_changes', 'no_usage', 'errors',
+                                 'became_idle', 'became_busy'), 0)
+        summary['servers'] = len(servers)
+        for i, server in enumerate(servers):
             try:
-                # Check power state
-                power_state = ServerStateMonitorService._check_power_state(server)
-                if power_state != server.power_state:
-                    server.power_state = power_state
-                    server.last_update_time = now
-                    logger.info(f"Server {server.name} power state updated to {power_state}")
+                # Check power state; a probe that sees a change has already recorded it
+                previous = server.power_state
+                power_state = ServerStateMonitorService._check_power_state(server, now)
+                if power_state != previous:
+                    if power_state != server.power_state:
+                        server.power_state = power_state
+                        server.last_update_time = now
+                    summary['power_changes'] += 1
+                    logger.info("Server %s power state updated to %s", server.name, power_state)
                 
                 # Only check idle state and resource usage if server is powered on
                 if power_state == 'ON':
-                    is_idle, usage_data = ServerStateMonitorService._check_idle_state(server)
-                    
-                    # Update idle state
-                    if is_idle and not server.is_idle:
-                        server.is_idle = True
-                        server.idle_start_time = now  # Ensure UTC time
-                        logger.info(f"Server {server.name} marked as idle")
-                    elif not is_idle and server.is_idle:
-                        server.is_idle = False
-                        server.idle_start_time = None
-                        logger.info(f"Server {server.name} no longer idle")
-                    
-                    # Update resource usage in database
-                    if usage_data and usage_data['has_data']:
-                        server.cpu_usage = round(usage_data['cpu_usage'], 2) if usage_data['cpu_usage'] is not None else None
-                        server.gpu_usage = round(usage_data['gpu_usage'], 2) if usage_data['gpu_usage'] is not None else None
-                        logger.info(f"Updated resource usage for {server.name} - CPU: {server.cpu_usage}%, GPU: {server.gpu_usage}%")
+                    summary['on'] += 1
+                    if window_mode:
+                        powered_on.append(i)  # evaluated together after the loop
+                    else:
+                        usage_data = ServerStateMonitorService._fetch_usage(server)
+                        if usage_data is not None:
+                            reported.append((i, usage_data))
+                        else:
+                            summary['no_usage'] += 1
                 else:
+                    summary['off'] += 1
                     # If server is off, clear resource usage
                     server.cpu_usage = None
                     server.gpu_usage = None
+                    server.gpus = None
                     server.is_idle = False
                     server.idle_start_time = None
+                    live_usage.discard(server.id)
                 
                 db.session.commit()
             except Exception as e:
-                logger.error(f"Error updating state for server {server.name}: {str(e)}")
+                summary['errors'] += 1
+                logger.error("Error updating state for server %s: %s", server.name, e)
                 db.session.rollback()
+        
+        window = None
+        if powered_on:
+            reported, window = ServerStateMonitorService._window_usage(servers, powered_on, now)
+            summary['no_usage'] += len(powered_on) - len(reported)
+        if reported:
+            summary['became_idle'], summary['became_busy'] = ServerStateMonitorService._apply_fleet_usage(
+                fleet, servers, slots, reported, now, window)
+        
+        summary['duration_ms'] = round(1000 * (time.perf_counter() - started), 1)
+        logger.info("Monitor sweep: %(servers)d servers (%(on)d on, %(off)d off), %(power_changes)d power changes, "
+                    "%(became_idle)d became idle, %(became_busy)d no longer idle, %(no_usage)d without usage data, "
+                    "%(errors)d errors in %(duration_ms).0fms", summary, extra={'sweep': summary})
     
     @staticmethod
-    def _check_power_state(server):
+    def _window_usage(servers, indices, now):
+        """Peak usage of powered-on servers over their idle windows, from one grouped query
+        
+        InfluxDB aggregates every host's usage per minute; complete minutes
+        are cached, so a sweep only fetches the newest ones. A server is
+        idle once its peak over the last `idle_threshold_mins` is below the
+        threshold, which needs no app-side timing and survives restarts.
+        
+        Returns:
+            tuple: (index, usage data) of the servers with fresh data, and
+            their (CPU peaks, GPU peaks, idle since) for `_apply_fleet_usage`
+        """
+        from services.idle_window import get_idle_window
+        window = get_idle_window()
+        thresholds = [servers[i].idle_threshold_mins for i in indices]
+        loaded = window.refresh(
+            lambda query: ServerStateMonitorService.query_influxdb(query, use_cache=False),
+            now, max(thresholds))
+        if not loaded:
+            logger.warning("No windowed usage data from InfluxDB, keeping the idle state of %d servers", len(indices))
+            return [], None
+        
+        cpu_peaks, gpu_peaks, fresh = window.peaks([servers[i].name for i in indices], thresholds, now)
+        store = get_usage_store()
+        reported, peaks = [], ([], [], [])
+        for i, threshold, cpu_peak, gpu_peak, is_fresh in zip(indices, thresholds, cpu_peaks, gpu_peaks, fresh):
+            if not is_fresh:
+                ServerStateMonitorService._log_detail("No resource usage data available for %s", servers[i].name)
+                continue
+            # Pushed samples are newer for display; idle state only follows the window
+            reported.append((i, store.get(servers[i].name) or window.latest_usage(servers[i].name, now)))
+            peaks[0].append(cpu_peak)
+            peaks[1].append(gpu_peak)
+            peaks[2].append(now - timedelta(minutes=threshold))
+        return reported, peaks
+    
+    @staticmethod
+    def _apply_fleet_usage(fleet, servers, slots, reported, now, window=None):
+        """Evaluate idle state for a sweep's usage in one pass and write back what changed
+        
+        Args:
+            window: (CPU peaks, GPU peaks, idle since) of the reported servers
+                in IDLE_EVALUATION_MODE=window; their usage data is then only
+                stored for display
+        
+        Returns:
+            tuple: Number of servers that became idle and that stopped being idle
+        """
+        indices = [i for i, _ in reported]
+        if window is None:
+            cpu = [usage['cpu_usage'] for _, usage in reported]
+            gpu = [usage['gpu_usage'] for _, usage in reported]  # None (no GPU) becomes NaN
+            idle_since = [now] * len(reported)
+        else:
+            cpu, gpu, idle_since = window
+        became_idle, became_busy = fleet.evaluate_idle(
+            slots[indices], cpu, gpu, ServerStateMonitorService.IDLE_THRESHOLD, now, idle_since)
+        
+        try:
+            for i, since in compress(zip(indices, idle_since), became_idle):
+                servers[i].is_idle = True
+                servers[i].idle_start_time = since
+                logger.info("Server %s marked as idle", servers[i].name)
+            for i in compress(indices, became_busy):
+                servers[i].is_idle = False
+                servers[i].idle_start_time = None
+                logger.info("Server %s no longer idle", servers[i].name)
+            for i, usage_data in reported:
+                ServerStateMonitorService._apply_usage(servers[i], usage_data, now)
+            db.session.commit()
+        except Exception as e:
+            logger.error("Error applying resource usage for %d servers: %s", len(reported), e)
+            db.session.rollback()
+            return 0, 0
+        return int(became_idle.sum()), int(became_busy.sum())
+    
+    @staticmethod
+    def poll_transitions():
+        """Probe servers that are powering on or off until they settle
+        
+        A server only leaves POWERING_ON / POWERING_OFF once its BMC reports
+        the target state, or when its transition deadline passes; a probe
+        that still sees the old state in between does not flip it back.
+        """
+        servers = MonitorShardService.filter_owned(Server.query.filter(
+            Server.power_state.in_(PowerControlService.TRANSITIONAL_STATES)
+        )).all()
+        if not servers:
+            return
+        
+        now = datetime.now(UTC)
+        for server in servers:
+            try:
+                target = 'ON' if server.power_state == 'POWERING_ON' else 'OFF'
+                success, output = PowerControlService._run_ipmi_command(server, "status")
+                reported = PowerControlService.parse_power_state(output) if success else None
+                if reported == target:
+                    PowerControlService.end_transition(server, target, now)
+                    logger.info("Server %s power state updated to %s", server.name, target)
+                elif server.transition_deadline is None or now >= as_utc(server.transition_deadline):
+                    # Give up; an unknown state falls back to the one the command started from
+                    settled = reported or ('OFF' if target == 'ON' else 'ON')
+                    PowerControlService.end_transition(server, settled, now)
+                    logger.warning("Server %s did not reach %s in time, now %s", server.name, target, settled)
+                db.session.commit()
+            except Exception as e:
+                logger.error("Error polling power transition for server %s: %s", server.name, e)
+                db.session.rollback()
+    
+    @staticmethod
+    def ingest_metrics(lines):
+        """Apply pushed telegraf metrics and run the idle logic for the hosts they touch
+        
+        Args:
+            lines: Iterable of InfluxDB line protocol lines
+            
+        Returns:
+            dict: Number of accepted points, touched hosts and per-line errors
+        """
+        store = get_usage_store()
+        hosts = set()
+        accepted = 0
+        errors = []
+        
+        for line_no, line in enumerate(lines, 1):
+            try:
+                point = parse_line(line)
+            except LineProtocolError as e:
+                if len(errors) < ServerStateMonitorService.MAX_INGEST_ERRORS:
+                    errors.append({'line': line_no, 'error': str(e)})
+                continue
+            if point is None:
+                continue
+            
+            measurement, tags, fields, _ = point
+            host = tags.get('host')
+            if not host:
+                continue
+            if measurement == 'cpu' and tags.get('cpu') == 'cpu-total' and 'usage_idle' in fields:
+                store.update_cpu(host, 100 - fields['usage_idle'])
+            elif measurement == 'nvidia_smi' and 'utilization_gpu' in fields:
+                gpu = tags.get('index') or tags.get('uuid') or '0'
+                store.update_gpu(host, gpu, fields['utilization_gpu'],
+                                 fields.get('memory_used'), fields.get('memory_total'))
+            else:
+                continue
+            hosts.add(host)
+            accepted += 1
+        
+        if hosts:
+            now = datetime.now(UTC)
+            servers = Server.query.filter(Server.name.in_(hosts), Server.power_state == 'ON').all()
+            try:
+                window_mode = current_app.config['IDLE_EVALUATION_MODE'] == 'window'
+                for server in servers:
+                    usage_data = store.get(server.name)
+                    if usage_data and usage_data['has_data']:
+                        if window_mode:
+                            # Idle state follows the InfluxDB window, pushes only refresh the display
+                            ServerStateMonitorService._apply_usage(server, usage_data, now)
+                            continue
+                        is_idle = ServerStateMonitorService._evaluate_idle(server, usage_data)
+                        ServerStateMonitorService._apply_idle_state(server, is_idle, usage_data, now)
+                db.session.commit()
+            except Exception as e:
+                logger.error("Error applying pushed metrics: %s", e)
+                db.session.rollback()
+        
+        return {'accepted': accepted, 'hosts': len(hosts), 'errors': errors}
+    
+    @staticmethod
+    def _check_power_state(server, now=None):
         """Check the power state of a server
         
+        With POWER_READING_ENABLED the same BMC session also reads the
+        DCMI power draw, which is buffered for `flush_power_samples`.
+        
         Returns:
             str: 'ON' or 'OFF'
         """
         try:
-            return PowerControlService.get_power_status(server)
+            config = current_app.config
+            if not config['POWER_READING_ENABLED']:
+                return PowerControlService.get_power_status(server)
+            power_state, watts, inlet_temp = PowerControlService.read_power_status(
+                server, inlet_temp=config['POWER_READING_INLET_TEMP'])
+            if watts is not None:
+                get_sample_buffers().record(server.id, now or datetime.now(UTC), watts, inlet_temp)
+            return power_state
         except Exception as e:
-            logger.error(f"Failed to check power state for {server.name}: {str(e)}")
+            logger.error("Failed to check power state for %s: %s", server.name, e)
             return server.power_state  # Return current recorded state if check fails
     
     @staticmethod
-    def _calculate_idle_duration(idle_start_time):
-        """Calculate idle duration in minutes
+    def flush_power_samples():
+        """Write the buffered power readings to the database in one batch
         
-        Args:
-            idle_start_time: The time when the server became idle
-            
         Returns:
-            int: Duration in minutes, or 0 if start time is None
+            int: Number of samples written
         """
-        if not idle_start_time:
+        buffers = get_sample_buffers()
+        rows, dropped = buffers.drain()
+        if dropped:
+            logger.warning("Dropped %d power samples, buffers were full before the flush", dropped)
+        if not rows:
             return 0
-            
-        now = datetime.now(UTC)
-        if idle_start_time.tzinfo is None:
-            idle_start_time = idle_start_time.replace(tzinfo=UTC)
-            
-        return round((now - idle_start_time).total_seconds() / 60.0)
+        try:
+            db.session.execute(insert(PowerSample), rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            buffers.requeue(rows)
+            logger.error("Failed to write %d power samples, kept for the next flush: %s", len(rows), e)
+            return 0
+        logger.info("Wrote %d power samples", len(rows))
+        return len(rows)
+    
+    @staticmethod
+    def flush_live_usage():
+        """Write the usage and probe times recorded since the last flush to the servers table
+        
+        Each is one batched UPDATE.
+        
+        Returns:
+            int: Number of servers whose usage was written
+        """
+        rows = live_usage.drain()
+        seen_rows = live_usage.drain_seen()
+        if not rows and not seen_rows:
+            return 0
+        try:
+            if rows:
+                db.session.execute(live_usage.flush_statement(), rows)
+            if seen_rows:
+                db.session.execute(live_usage.seen_statement(), seen_rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            live_usage.requeue(rows)
+            live_usage.requeue_seen(seen_rows)
+            logger.error("Failed to write resource usage of %d servers, kept for the next flush: %s", len(rows), e)
+            return 0
+        logger.debug("Wrote resource usage of %d servers and probe times of %d", len(rows), len(seen_rows))
+        return len(rows)
     
     @staticmethod
     def check_idle_and_shutdown():
-        """Check idle servers and shut them down if conditions are met"""
-        logger.info("Starting idle server check for automatic shutdown...")
+        """Check idle servers and shut them down if conditions are met
+        
+        Idle durations and thresholds are compared for all candidates at
+        once on the fleet state; only servers past their threshold are
+        loaded as ORM objects for the schedule check and the shutdown.
+        Shutdowns are claimed here and carried out on a background thread,
+        so the check never waits for a grace period.
+        Logs one summary record per check; per-server lines only for
+        shutdowns and errors.
+        """
+        started = time.perf_counter()
         
         # Get all servers that have auto shutdown enabled, are powered on and idle
-        servers = Server.query.filter_by(
+        rows = MonitorShardService.filter_owned(db.session.query(
+            Server.id, Server.power_state, Server.is_idle, Server.idle_start_time,
+            Server.idle_threshold_mins, Server.auto_shutdown_enabled
+        ).filter_by(
             power_state='ON',
             is_idle=True,
             auto_shutdown_enabled=True
-        ).all()
-        
-        logger.info(f"Found {len(servers)} powered on, idle servers with auto shutdown enabled")
+        )).all()
         
         now = datetime.now(UTC)
-        for server in servers:
-            try:
-                logger.info(f"Checking server {server.name} (idle threshold: {server.idle_threshold_mins} minutes)")
-                
-                # Calculate idle duration
-                idle_duration = ServerStateMonitorService._calculate_idle_duration(server.idle_start_time)
-                logger.info(f"Server {server.name} has been idle for {idle_duration} minutes")
-                
-                if idle_duration >= server.idle_threshold_mins:
-                    logger.info(f"Server {server.name} exceeded idle threshold ({idle_duration}/{server.idle_threshold_mins} minutes)")
-                    
-                    # Check if server is in no-shutdown schedule
-                    if not ScheduleService.is_in_schedule(server, now):
-                        logger.info(f"Initiating shutdown for server {server.name}")
-                        PowerControlService.shutdown(server)
-                        logger.info(f"Shutdown command sent to server {server.name}")
+        from services.fleet_state import get_fleet_state
+        fleet = get_fleet_state()
+        due_ids = fleet.shutdown_candidates(fleet.load(rows), now)
+        summary = {'candidates': len(rows), 'due': len(due_ids), 'scheduled': 0, 'errors': 0,
+                   'shutdowns': 0}
+        
+        if due_ids:
+            # The sweep updates the shared fleet state concurrently; confirm on the fresh rows
+            servers = Server.query.filter(Server.id.in_(due_ids), Server.power_state == 'ON',
+                                          Server.is_idle.is_(True), Server.auto_shutdown_enabled.is_(True)).all()
+            get_schedule_index().ensure(due_ids, now)
+            to_shutdown = []
+            for server in servers:
+                try:
+                    idle_start_time = server.idle_start_time
+                    if idle_start_time is None or round(
+                            (now - as_utc(idle_start_time)).total_seconds() / 60.0) < server.idle_threshold_mins:
+                        continue
+                    # Check if server is in no-shutdown schedule, including the pre-warm lead
+                    lead_secs = PrewarmService.boot_lead_secs(server)
+                    if not ScheduleService.is_in_schedule(server, now, lead_secs=lead_secs):
+                        logger.info("Initiating shutdown for server %s (idle threshold: %s minutes)",
+                                    server.name, server.idle_threshold_mins)
+                        to_shutdown.append(server)
                     else:
-                        logger.info(f"Server {server.name} is in no-shutdown schedule, skipping shutdown")
-                else:
-                    logger.info(f"Server {server.name} has not reached idle threshold yet ({idle_duration}/{server.idle_threshold_mins} minutes)")
-            except Exception as e:
-                logger.error(f"Error processing server {server.name}: {str(e)}")
-                continue
+                        summary['scheduled'] += 1
+                        ServerStateMonitorService._log_detail(
+                            "Server %s is in no-shutdown schedule, skipping shutdown", server.name)
+                except Exception as e:
+                    summary['errors'] += 1
+                    logger.error("Error processing server %s: %s", server.name, e)
+            
+            if to_shutdown:
+                # The shutdowns run in the background; the batch logs their outcome
+                summary['shutdowns'] = len(ShutdownExecutor.start_shutdown(to_shutdown, cause='auto_shutdown'))
         
-        logger.info("Completed idle server check")
+        summary['duration_ms'] = round(1000 * (time.perf_counter() - started), 1)
+        logger.info("Idle check: %(candidates)d idle servers with auto shutdown, %(due)d past their threshold, "
+                    "%(scheduled)d in a no-shutdown window, %(shutdowns)d shutdowns started, "
+                    "%(errors)d errors in %(duration_ms).0fms", summary, extra={'idle_check': summary})
@@ -0,0 +1,224 @@
+# services/shutdown_executor.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, UTC
+from types import SimpleNamespace
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from models.database import db
+from models.server import Server
+from services.power_control_service import PowerControlService
+
+logger = logging.getLogger(__name__)
+
+
+class ShutdownExecutor:
+    """Gracefully power off a batch of servers in parallel
+
+    Every server gets an ACPI `power soft` and is polled until it reports
+    OFF or its grace period runs out, after which it is hard powered off.
+    Worker threads only see plain snapshots of the servers; the outcome is
+    written back on the calling thread from what the BMCs last reported.
+    `start_shutdown` claims the servers and runs the batch on a background
+    thread instead, for callers that must not wait for it.
+    """
+
+    HARD_OFF_CONFIRM_POLLS = 3  # status checks after a hard off before giving up
+    BACKGROUND_BATCHES = 4  # batches started by start_shutdown that run at once
+
+    _batch_pool = None
+    _batch_pool_lock = threading.Lock()
+
+    @staticmethod
+    def _status(target):
+        success, output = PowerControlService._run_ipmi_command(target, "status")
+        return PowerControlService.parse_power_state(output) if success else None
+
+    @staticmethod
+    def _wait_for_off(target, deadline, poll_interval):
+        """Poll until the server reports OFF or the deadline passes; return the last state seen"""
+        state = None
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return state
+            time.sleep(min(poll_interval, remaining))
+            state = ShutdownExecutor._status(target) or state
+            if state == 'OFF':
+                return state
+
+    @staticmethod
+    def _claimed_ids(server_ids, lock=False):
+        """Ids among `server_ids` still claimed by their POWERING_OFF transition
+
+        With `lock`, the rows stay locked until the transaction ends so the
+        claims cannot be settled by someone else in between.
+        """
+        query = select(Server.id).where(Server.id.in_(server_ids), Server.power_state == 'POWERING_OFF')
+        if lock:
+            query = query.with_for_update()
+        return set(db.session.scalars(query))
+
+    @staticmethod
+    def _still_claimed(app, server_id):
+        with app.app_context():
+            return bool(ShutdownExecutor._claimed_ids([server_id]))
+
+    @staticmethod
+    def _shutdown_one(app, target, grace_secs, poll_interval):
+        """Soft off, wait, escalate; runs on a worker thread"""
+        started = time.monotonic()
+        result = {'name': target.name, 'method': 'soft', 'state': None, 'error': None}
+
+        success, output = PowerControlService._run_ipmi_command(target, "soft")
+        if success:
+            result['state'] = ShutdownExecutor._wait_for_off(target, started + grace_secs, poll_interval)
+        else:
+            result['error'] = output
+            result['state'] = ShutdownExecutor._status(target)
+
+        if result['state'] != 'OFF' and not ShutdownExecutor._still_claimed(app, target.id):
+            # The transition was settled meanwhile (e.g. timed out back to ON); do not force it off
+            result['error'] = 'power transition no longer claimed'
+        elif result['state'] != 'OFF':
+            result['method'] = 'hard'
+            success, output = PowerControlService._run_ipmi_command(target, "off")
+            if success:
+                deadline = time.monotonic() + poll_interval * ShutdownExecutor.HARD_OFF_CONFIRM_POLLS
+                result['state'] = ShutdownExecutor._wait_for_off(target, deadline, poll_interval) or result['state']
+                result['error'] = None
+            else:
+                result['error'] = output
+
+        result['elapsed_secs'] = round(time.monotonic() - started, 1)
+        return result
+
+    @staticmethod
+    def _settings(grace_secs, poll_interval, max_workers):
+        config = current_app.config
+        grace_secs = config['SHUTDOWN_GRACE_SECS'] if grace_secs is None else grace_secs
+        poll_interval = poll_interval or config['SHUTDOWN_POLL_INTERVAL']
+        max_workers = max_workers or config['SHUTDOWN_MAX_WORKERS']
+        # Claims outlive the soft off, the hard off and its confirmation polls
+        timeout = grace_secs + poll_interval * (ShutdownExecutor.HARD_OFF_CONFIRM_POLLS + 1)
+        return grace_secs, poll_interval, max_workers, timeout
+
+    @staticmethod
+    def shutdown_servers(servers, grace_secs=None, poll_interval=None, max_workers=None, cause=None):
+        """Shut down servers concurrently and record their final power state
+
+        Args:
+            servers: Server rows to power off
+            grace_secs: Seconds to wait for an ACPI shutdown before hard off
+            poll_interval: Seconds between power status polls
+            cause: Tag of their OFF state events, e.g. 'auto_shutdown'
+
+        Returns:
+            list: One result per server with name, method ('soft' or 'hard'),
+            final state ('ON', 'OFF' or None if unknown) and error
+        """
+        if not servers:
+            return []
+        grace_secs, poll_interval, max_workers, timeout = ShutdownExecutor._settings(
+            grace_secs, poll_interval, max_workers)
+
+        # Claim the servers first so the monitor leaves them alone and repeated
+        # requests do not send a second round of commands
+        servers = [s for s in servers if PowerControlService.begin_transition(s, 'POWERING_OFF', timeout, cause)]
+        return ShutdownExecutor._run(servers, grace_secs, poll_interval, max_workers)
+
+    @staticmethod
+    def start_shutdown(servers, cause=None):
+        """Claim servers for POWERING_OFF and shut them down on a background thread
+
+        The claims are made before returning, so the servers drop out of
+        the idle check's candidates and are not submitted twice; outcomes
+        are logged and recorded when the batch finishes.
+
+        Returns:
+            list: Servers claimed and submitted
+        """
+        if not servers:
+            return []
+        grace_secs, poll_interval, max_workers, timeout = ShutdownExecutor._settings(None, None, None)
+        servers = [s for s in servers if PowerControlService.begin_transition(s, 'POWERING_OFF', timeout, cause)]
+        if servers:
+            ShutdownExecutor._get_batch_pool().submit(
+                ShutdownExecutor._run_batch, current_app._get_current_object(), [s.id for s in servers],
+                grace_secs, poll_interval, max_workers, timeout
+            )
+        return servers
+
+    @staticmethod
+    def _get_batch_pool():
+        if ShutdownExecutor._batch_pool is None:
+            with ShutdownExecutor._batch_pool_lock:
+                if ShutdownExecutor._batch_pool is None:
+                    ShutdownExecutor._batch_pool = ThreadPoolExecutor(
+                        max_workers=ShutdownExecutor.BACKGROUND_BATCHES, thread_name_prefix='shutdown-batch')
+        return ShutdownExecutor._batch_pool
+
+    @staticmethod
+    def _run_batch(app, server_ids, grace_secs, poll_interval, max_workers, timeout):
+        """Run a batch submitted by start_shutdown; runs on a background thread"""
+        with app.app_context():
+            try:
+                # A batch that waited for a free slot renews its claims; ones settled meanwhile are dropped
+                db.session.execute(
+                    update(Server)
+                    .where(Server.id.in_(server_ids), Server.power_state == 'POWERING_OFF')
+                    .values(transition_deadline=datetime.now(UTC) + timedelta(seconds=timeout))
+                )
+                db.session.commit()
+                claimed = ShutdownExecutor._claimed_ids(server_ids)
+                servers = Server.query.filter(Server.id.in_(claimed)).order_by(Server.id).all()
+                results = ShutdownExecutor._run(servers, grace_secs, poll_interval, max_workers)
+                logger.info("Shutdown batch finished: %d/%d servers off",
+                            sum(1 for result in results if result['state'] == 'OFF'), len(server_ids))
+            except Exception as e:
+                db.session.rollback()
+                # Claims left behind are settled by the transition poller at their deadline
+                logger.error("Shutdown batch of %d servers failed: %s", len(server_ids), e)
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def _run(servers, grace_secs, poll_interval, max_workers):
+        """Power off servers already claimed for POWERING_OFF and record the outcomes"""
+        if not servers:
+            return []
+
+        app = current_app._get_current_object()
+        targets = [SimpleNamespace(id=s.id, name=s.name, ipmi_host=s.ipmi_host,
+                                   ipmi_user=s.ipmi_user, ipmi_pass=s.ipmi_pass) for s in servers]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(servers)), thread_name_prefix='shutdown') as pool:
+            results = list(pool.map(
+                lambda target: ShutdownExecutor._shutdown_one(app, target, grace_secs, poll_interval), targets
+            ))
+
+        now = datetime.now(UTC)
+        # Only record outcomes for claims nobody settled meanwhile (e.g. the transition poller)
+        claimed = ShutdownExecutor._claimed_ids([s.id for s in servers], lock=True)
+        for server, result in zip(servers, results):
+            if server.id not in claimed:
+                db.session.refresh(server)
+                logger.info("Server %s settled as %s before its shutdown finished", server.name, server.power_state)
+            elif result['state'] == 'OFF':
+                PowerControlService.end_transition(server, 'OFF', now)
+                logger.info("Server %s is off (%s shutdown, %ss)", server.name, result['method'], result['elapsed_secs'])
+            else:
+                if result['state'] == 'ON':
+                    PowerControlService.end_transition(server, 'ON', now)
+                # Unknown states stay POWERING_OFF until the transition poller settles them
+                logger.error("Server %s did not power off: %s", server.name,
+                             result['error'] or 'still reported %s' % result['state'])
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Failed to record shutdown results: %s", e)
+        return results
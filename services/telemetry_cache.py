@@ -0,0 +1,120 @@
+# services/telemetry_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class _Flight:
+    """A load in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class TelemetryCache:
+    """Size-bounded LRU cache with TTL and single-flight loading
+
+    Identical telemetry queries issued while an entry is fresh are served
+    from memory; identical queries issued while one is still running wait
+    for that request instead of sending their own.
+    """
+
+    def __init__(self, ttl=10.0, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> _Flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query, params=None):
+        """Normalize whitespace and parameter order so equivalent queries share an entry"""
+        return ' '.join(query.split()), tuple(sorted((params or {}).items()))
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Return the cached value for `key`, calling `loader` at most once per expiry
+
+        Failed loads (None) are handed to the callers that waited on them
+        but are not cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            return flight.value
+
+        try:
+            flight.value = loader()
+        finally:
+            with self._lock:
+                if flight.value is not None:
+                    self._entries[key] = (time.monotonic() + (ttl or self.ttl), flight.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+                del self._inflight[key]
+            flight.done.set()
+        return flight.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_secs': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+            }
+
+
+_cache_lock = threading.Lock()
+
+
+def get_telemetry_cache():
+    """Return the telemetry cache of the current app, creating it on first use"""
+    app = current_app._get_current_object()
+    cache = app.extensions.get('telemetry_cache')
+    if cache is None:
+        with _cache_lock:
+            cache = app.extensions.get('telemetry_cache')
+            if cache is None:
+                cache = TelemetryCache(
+                    ttl=app.config.get('TELEMETRY_CACHE_TTL') or app.config.get('TELEGRAF_INTERVAL', 10),
+                    max_entries=app.config.get('TELEMETRY_CACHE_SIZE', 4096)
+                )
+                app.extensions['telemetry_cache'] = cache
+    return cache
@@ -0,0 +1,78 @@
+# services/usage_store.py
+import threading
+import time
+from datetime import datetime, UTC
+
+from flask import current_app
+
+from services.gpu_usage import gpu_entry, summarize_gpus
+
+
+class UsageStore:
+    """In-memory latest CPU/GPU usage per host, fed by pushed telegraf metrics"""
+
+    def __init__(self, max_age=20.0):
+        self.max_age = max_age
+        self._hosts = {}  # host -> {'cpu_usage', 'gpus': {gpu: gpu_entry}, 'cpu_at', 'gpu_at', 'sample_time'}
+        self._lock = threading.Lock()
+
+    def _entry(self, host):
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = {'cpu_usage': None, 'gpus': {}, 'cpu_at': 0.0, 'gpu_at': 0.0, 'sample_time': None}
+            self._hosts[host] = entry
+        return entry
+
+    def update_cpu(self, host, cpu_usage):
+        with self._lock:
+            entry = self._entry(host)
+            entry['cpu_usage'] = cpu_usage
+            entry['cpu_at'] = time.monotonic()
+            entry['sample_time'] = datetime.now(UTC)
+
+    def update_gpu(self, host, gpu, utilization, memory_used=None, memory_total=None):
+        with self._lock:
+            entry = self._entry(host)
+            entry['gpus'][gpu] = gpu_entry(gpu, utilization, memory_used, memory_total)
+            entry['gpu_at'] = time.monotonic()
+
+    def get(self, host):
+        """Return fresh pushed usage in the shape of `get_server_resource_usage`, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None or now - entry['cpu_at'] > self.max_age:
+                return None
+            gpus = list(entry['gpus'].values()) if now - entry['gpu_at'] <= self.max_age else []
+            cpu_usage = entry['cpu_usage']
+            sample_time = entry['sample_time']
+
+        usage_data = {
+            'cpu_usage': cpu_usage,
+            'has_data': cpu_usage is not None,
+            'sample_time': sample_time
+        }
+        usage_data.update(summarize_gpus(gpus))
+        return usage_data
+
+    def forget(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+
+_store_lock = threading.Lock()
+
+
+def get_usage_store():
+    """Return the usage store of the current app, creating it on first use"""
+    app = current_app._get_current_object()
+    store = app.extensions.get('usage_store')
+    if store is None:
+        with _store_lock:
+            store = app.extensions.get('usage_store')
+            if store is None:
+                store = UsageStore(
+                    max_age=app.config.get('USAGE_PUSH_MAX_AGE') or 2 * app.config.get('TELEGRAF_INTERVAL', 10)
+                )
+                app.extensions['usage_store'] = store
+    return store
@@ -1,5 +1,6 @@
 document.addEventListener('DOMContentLoaded', function() {
     // Load server list on page load
+    setupServerTable();
     loadServerList();
     
     // Setup event listeners
@@ -43,57 +44,222 @@ function formatDateTime(timestamp) {
     });
 }
 
+const SERVER_LIST_FIELDS = [
+    'name', 'power_state', 'last_update_time', 'current_usage', 'idle_start_time',
+    'idle_duration_mins', 'idle_threshold_mins', 'auto_shutdown_enabled'
+].join(',');
+const VIRTUALIZE_THRESHOLD = 100;  // rows before the table switches to windowed rendering
+const OVERSCAN_ROWS = 10;          // extra rows rendered above and below the viewport
+const DEFAULT_ROW_HEIGHT = 57;
+
+const POWER_BADGES = {
+    ON: 'success',
+    OFF: 'secondary',
+    POWERING_ON: 'warning',
+    POWERING_OFF: 'warning'
+};
+
+// Dashboard state: the latest server list plus one reusable row per server name
+const serverTable = {
+    servers: [],
+    byName: new Map(),
+    rows: new Map(),
+    rowHeight: 0,
+    loading: false,
+    renderQueued: false,
+    topSpacer: null,
+    bottomSpacer: null
+};
+
 function loadServerList() {
-    fetch('/api/servers')
+    // Skip a tick instead of piling up requests when the API is slow
+    if (serverTable.loading) return;
+    serverTable.loading = true;
+
+    fetch(`/api/servers?fields=${SERVER_LIST_FIELDS}`)
         .then(response => response.json())
         .then(servers => {
-            const serverList = document.getElementById('serverList');
-            if (!serverList) return;
-
-            serverList.innerHTML = '';
-            servers.forEach(server => {
-                const row = createServerRow(server);
-                serverList.appendChild(row);
-            });
+            serverTable.servers = servers;
+            serverTable.byName = new Map(servers.map(server => [server.name, server]));
+            for (const name of serverTable.rows.keys()) {
+                if (!serverTable.byName.has(name)) serverTable.rows.delete(name);
+            }
+            renderServerList();
         })
-        .catch(error => console.error('Error loading servers:', error));
+        .catch(error => console.error('Error loading servers:', error))
+        .finally(() => { serverTable.loading = false; });
+}
+
+function setupServerTable() {
+    const serverList = document.getElementById('serverList');
+    if (!serverList) return;
+
+    serverTable.topSpacer = createSpacerRow();
+    serverTable.bottomSpacer = createSpacerRow();
+
+    // One delegated handler for every row button
+    serverList.addEventListener('click', event => {
+        const button = event.target.closest('button[data-action]');
+        if (!button) return;
+        const server = serverTable.byName.get(button.closest('tr').dataset.name);
+        if (!server) return;
+
+        if (button.dataset.action === 'power') {
+            togglePower(server.name, server.power_state);
+        } else if (button.dataset.action === 'settings') {
+            openIdleSettings(server.name, server.idle_threshold_mins, server.auto_shutdown_enabled);
+        }
+    });
+
+    const container = document.getElementById('serverTableContainer');
+    if (container) {
+        container.addEventListener('scroll', scheduleRender, { passive: true });
+    }
+    window.addEventListener('resize', scheduleRender);
+}
+
+function scheduleRender() {
+    if (serverTable.renderQueued) return;
+    serverTable.renderQueued = true;
+    requestAnimationFrame(() => {
+        serverTable.renderQueued = false;
+        renderServerList();
+    });
+}
+
+function createSpacerRow() {
+    const tr = document.createElement('tr');
+    tr.className = 'virtual-spacer';
+    tr.hidden = true;
+    const td = document.createElement('td');
+    td.colSpan = 7;
+    tr.appendChild(td);
+    return tr;
+}
+
+function setSpacerHeight(spacer, height) {
+    const value = `${height}px`;
+    if (spacer.firstChild.style.height !== value) {
+        spacer.firstChild.style.height = value;
+        spacer.hidden = height === 0;
+    }
+}
+
+function visibleRange(count) {
+    const container = document.getElementById('serverTableContainer');
+    const virtualized = Boolean(container) && count > VIRTUALIZE_THRESHOLD;
+    if (container) container.classList.toggle('table-virtual', virtualized);
+    if (!virtualized) return [0, count];
+
+    const rowHeight = serverTable.rowHeight || DEFAULT_ROW_HEIGHT;
+    const first = Math.floor(container.scrollTop / rowHeight) - OVERSCAN_ROWS;
+    const visible = Math.ceil(container.clientHeight / rowHeight) + 2 * OVERSCAN_ROWS;
+    const start = Math.max(0, Math.min(first, count - visible));
+    return [start, Math.min(count, start + visible)];
+}
+
+function renderServerList() {
+    const serverList = document.getElementById('serverList');
+    if (!serverList) return;
+
+    const servers = serverTable.servers;
+    const [start, end] = visibleRange(servers.length);
+
+    const rows = [];
+    for (let i = start; i < end; i++) {
+        const server = servers[i];
+        let row = serverTable.rows.get(server.name);
+        if (!row) {
+            row = createServerRow(server);
+            serverTable.rows.set(server.name, row);
+        }
+        updateServerRow(row, server);
+        rows.push(row.tr);
+    }
+
+    // Only touch the row order when the window or the key sequence changed
+    const current = serverList.children;
+    const unchanged = current.length === rows.length + 2 &&
+        rows.every((tr, i) => current[i + 1] === tr);
+    if (!unchanged) {
+        serverList.replaceChildren(serverTable.topSpacer, ...rows, serverTable.bottomSpacer);
+    }
+
+    if (!serverTable.rowHeight && rows.length) {
+        serverTable.rowHeight = rows[0].getBoundingClientRect().height || DEFAULT_ROW_HEIGHT;
+    }
+    const rowHeight = serverTable.rowHeight || DEFAULT_ROW_HEIGHT;
+    setSpacerHeight(serverTable.topSpacer, start * rowHeight);
+    setSpacerHeight(serverTable.bottomSpacer, (servers.length - end) * rowHeight);
 }
 
 function createServerRow(server) {
     const tr = document.createElement('tr');
-    
-    // Server name
+    tr.dataset.name = server.name;
     tr.innerHTML = `
-        <td>${server.name}</td>
+        <td class="server-name"></td>
+        <td><span class="badge"></span></td>
+        <td class="server-updated"></td>
         <td>
-            <span class="badge bg-${server.power_state === 'ON' ? 'success' : 'secondary'}">
-                ${server.power_state.toUpperCase()}
-            </span>
+            <div class="server-cpu"></div>
+            <div class="server-gpu"></div>
         </td>
-        <td>${formatDateTime(server.last_update_time)}</td>
+        <td class="server-idle"></td>
         <td>
-            <div>CPU: ${server.current_usage?.cpu_usage?.toFixed(1)}%</div>
-            <div>GPU: ${server.current_usage?.gpu_usage?.toFixed(1)}%</div>
-        </td>
-        <td>
-            ${formatIdleTime(server.idle_start_time, server.idle_duration_mins)}
-        </td>
-        <td>
-            <button class="btn btn-sm btn-outline-primary" onclick="openIdleSettings('${server.name}', ${server.idle_threshold_mins}, ${server.auto_shutdown_enabled})">
+            <button class="btn btn-sm btn-outline-primary" data-action="settings">
                 <i class="bi bi-gear"></i> Settings
             </button>
         </td>
         <td>
             <div class="btn-group btn-group-sm">
-                <button class="btn btn-${server.power_state === 'ON' ? 'danger' : 'success'}"
-                        onclick="togglePower('${server.name}', '${server.power_state}')">
-                    ${server.power_state === 'ON' ? 'Power Off' : 'Power On'}
-                </button>
+                <button class="btn" data-action="power"></button>
             </div>
         </td>
     `;
-    
-    return tr;
+    tr.querySelector('.server-name').textContent = server.name;
+
+    // Cell references plus the last value written to each, so updates only touch what changed
+    return {
+        tr,
+        cells: {
+            badge: tr.querySelector('.badge'),
+            updated: tr.querySelector('.server-updated'),
+            cpu: tr.querySelector('.server-cpu'),
+            gpu: tr.querySelector('.server-gpu'),
+            idle: tr.querySelector('.server-idle'),
+            power: tr.querySelector('button[data-action="power"]')
+        },
+        values: {}
+    };
+}
+
+function updateServerRow(row, server) {
+    const inTransition = server.power_state.startsWith('POWERING_');
+    const values = {
+        badgeClass: `badge bg-${POWER_BADGES[server.power_state] || 'secondary'}`,
+        badgeText: server.power_state.toUpperCase().replace('_', ' '),
+        updated: formatDateTime(server.last_update_time),
+        cpu: `CPU: ${server.current_usage?.cpu_usage?.toFixed(1)}%`,
+        gpu: `GPU: ${server.current_usage?.gpu_usage?.toFixed(1)}%`,
+        idle: formatIdleTime(server.idle_start_time, server.idle_duration_mins),
+        powerClass: `btn btn-${server.power_state === 'ON' ? 'danger' : 'success'}`,
+        powerText: inTransition ? 'Working...' : server.power_state === 'ON' ? 'Power Off' : 'Power On',
+        powerDisabled: inTransition
+    };
+    const previous = row.values;
+    const { cells } = row;
+
+    if (values.badgeClass !== previous.badgeClass) cells.badge.className = values.badgeClass;
+    if (values.badgeText !== previous.badgeText) cells.badge.textContent = values.badgeText;
+    if (values.updated !== previous.updated) cells.updated.textContent = values.updated;
+    if (values.cpu !== previous.cpu) cells.cpu.textContent = values.cpu;
+    if (values.gpu !== previous.gpu) cells.gpu.textContent = values.gpu;
+    if (values.idle !== previous.idle) cells.idle.textContent = values.idle;
+    if (values.powerClass !== previous.powerClass) cells.power.className = values.powerClass;
+    if (values.powerText !== previous.powerText) cells.power.textContent = values.powerText;
+    if (values.powerDisabled !== previous.powerDisabled) cells.power.disabled = values.powerDisabled;
+
+    row.values = values;
 }
 
 function togglePower(serverName, currentState) {
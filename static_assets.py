@@ -0,0 +1,112 @@
+# static_assets.py
+import gzip
+import json
+import mimetypes
+import os
+import threading
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # responses are gzip-compressed only
+    brotli = None
+
+from build_assets import DIST_DIRNAME, MANIFEST_NAME
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class AssetManifest:
+    """Maps source asset paths to the fingerprinted files written by build_assets.py"""
+
+    def __init__(self, static_folder, reload=False):
+        self.path = os.path.join(static_folder, DIST_DIRNAME, MANIFEST_NAME)
+        self.reload = reload
+        self._mtime = None
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._mtime, self._entries = None, {}
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path) as f:
+            entries = json.load(f)
+        self._mtime, self._entries = mtime, entries
+
+    def get(self, filename):
+        if self.reload:
+            with self._lock:
+                self._load()
+        return self._entries.get(filename)
+
+
+def _accepted_encodings():
+    accepted = request.accept_encodings
+    encodings = []
+    if brotli is not None and accepted['br']:
+        encodings.append('br')
+    if accepted['gzip']:
+        encodings.append('gzip')
+    return encodings
+
+
+def init_static_assets(app):
+    """Serve fingerprinted assets with immutable caching and compress JSON responses"""
+    manifest = AssetManifest(app.static_folder, reload=app.debug)
+    app.extensions['asset_manifest'] = manifest
+    dist_folder = os.path.join(app.static_folder, DIST_DIRNAME)
+
+    @app.context_processor
+    def asset_helpers():
+        def asset_url(filename):
+            """URL of the fingerprinted build of a static file, or the file itself before a build"""
+            built = manifest.get(filename)
+            return url_for('static', filename=built or filename)
+        return {'asset_url': asset_url}
+
+    @app.route(f'{app.static_url_path}/{DIST_DIRNAME}/<path:filename>', endpoint='static_dist')
+    def static_dist(filename):
+        # Prefer a precompressed sibling when the client accepts it
+        for encoding in _accepted_encodings():
+            suffix = '.br' if encoding == 'br' else '.gz'
+            if os.path.isfile(os.path.join(dist_folder, filename + suffix)):
+                response = send_from_directory(dist_folder, filename + suffix, max_age=IMMUTABLE_MAX_AGE)
+                # The content type follows the original file, not the .br/.gz suffix
+                response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(dist_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @app.after_request
+    def compress_json(response):
+        if (response.mimetype != 'application/json'
+                or response.status_code < 200 or response.status_code >= 300
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers):
+            return response
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encodings = _accepted_encodings()
+        if not encodings:
+            return response
+        if encodings[0] == 'br':
+            response.set_data(brotli.compress(data, quality=app.config['COMPRESS_BR_QUALITY']))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = encodings[0]
+        return response
@@ -0,0 +1,18 @@
+# tests/conftest.py
+import pytest
+
+from app import create_app
+from config.config import TestingConfig
+from models.database import db
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Application on a throwaway SQLite database, without the scheduler"""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.sqlite'}")
+    monkeypatch.setattr(TestingConfig, 'SESSION_FILE_DIR', str(tmp_path / 'sessions'), raising=False)
+    app = create_app('testing', start_scheduler=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
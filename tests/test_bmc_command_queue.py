@@ -0,0 +1,134 @@
+# tests/test_bmc_command_queue.py
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services.bmc_command_queue import BMCCommandQueue
+
+
+def _server(host='10.0.0.1', user='admin'):
+    return SimpleNamespace(name=host, ipmi_host=host, ipmi_user=user, ipmi_pass='secret')
+
+
+def _wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class BlockingBMC:
+    """Fake `execute` that holds the first command until released"""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, target, action, timeout):
+        self.calls.append((target.ipmi_host, action))
+        if not self.started.is_set():
+            self.started.set()
+            assert self.release.wait(5)
+        return True, f"{action} done"
+
+
+@pytest.fixture
+def queue():
+    return BMCCommandQueue(timeout=1)
+
+
+def _submit(queue, server, action, execute, results):
+    thread = threading.Thread(target=lambda: results.append((action, queue.submit(server, action, execute))))
+    thread.start()
+    return thread
+
+
+def _queued(queue, host='10.0.0.1'):
+    return len(queue._hosts[host].queue)
+
+
+def test_idle_host_runs_command_inline(queue):
+    assert queue.submit(_server(), 'status', lambda target, action, timeout: (True, 'on')) == (True, 'on')
+    assert queue.stats == {'executed': 1, 'coalesced': 0, 'superseded': 0}
+
+
+def test_identical_waiting_commands_share_one_call(queue):
+    bmc, results = BlockingBMC(), []
+    threads = [_submit(queue, _server(), 'on', bmc, results)]
+    assert bmc.started.wait(5)
+    threads += [_submit(queue, _server(), 'status', bmc, results) for _ in range(3)]
+    _wait_until(lambda: queue.stats['coalesced'] == 2)
+    bmc.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert bmc.calls == [('10.0.0.1', 'on'), ('10.0.0.1', 'status')]
+    assert sorted(results) == [('on', (True, 'on done'))] + [('status', (True, 'status done'))] * 3
+
+
+def test_different_credentials_are_not_coalesced(queue):
+    bmc, results = BlockingBMC(), []
+    threads = [_submit(queue, _server(), 'on', bmc, results)]
+    assert bmc.started.wait(5)
+    threads += [_submit(queue, _server(user=user), 'status', bmc, results) for user in ('admin', 'other')]
+    _wait_until(lambda: _queued(queue) == 2)
+    bmc.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert queue.stats['coalesced'] == 0
+    assert bmc.calls.count(('10.0.0.1', 'status')) == 2
+
+
+def test_newer_power_action_supersedes_a_waiting_one(queue):
+    bmc, results = BlockingBMC(), []
+    threads = [_submit(queue, _server(), 'status', bmc, results)]
+    assert bmc.started.wait(5)
+    threads.append(_submit(queue, _server(), 'on', bmc, results))
+    _wait_until(lambda: _queued(queue) == 1)
+    threads.append(_submit(queue, _server(), 'off', bmc, results))
+    # The replaced caller returns right away, before the BMC is free again
+    threads[1].join(5)
+    assert ('on', (False, "superseded by 'power off'")) in results
+    bmc.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert bmc.calls == [('10.0.0.1', 'status'), ('10.0.0.1', 'off')]
+    assert ('off', (True, 'off done')) in results
+    assert queue.stats['superseded'] == 1
+
+
+def test_status_probes_do_not_supersede_power_actions(queue):
+    bmc, results = BlockingBMC(), []
+    threads = [_submit(queue, _server(), 'status', bmc, results)]
+    assert bmc.started.wait(5)
+    threads.append(_submit(queue, _server(), 'soft', bmc, results))
+    _wait_until(lambda: _queued(queue) == 1)
+    threads.append(_submit(queue, _server(), 'probe', bmc, results))
+    _wait_until(lambda: _queued(queue) == 2)
+    bmc.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert [action for _, action in bmc.calls] == ['status', 'soft', 'probe']
+    assert queue.stats['superseded'] == 0
+
+
+def test_hosts_run_in_parallel(queue):
+    bmc, results = BlockingBMC(), []
+    blocked = _submit(queue, _server('10.0.0.1'), 'status', bmc, results)
+    assert bmc.started.wait(5)
+    assert queue.submit(_server('10.0.0.2'), 'status', bmc) == (True, 'status done')
+    bmc.release.set()
+    blocked.join(5)
+
+
+def test_execute_errors_become_failed_results(queue):
+    def broken(target, action, timeout):
+        raise OSError("ipmitool not found")
+
+    assert queue.submit(_server(), 'status', broken) == (False, "ipmitool not found")
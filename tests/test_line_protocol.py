@@ -0,0 +1,56 @@
+# tests/test_line_protocol.py
+import gzip
+import io
+
+import pytest
+
+from services.line_protocol import LineProtocolError, iter_lines, parse_line
+
+
+def test_parse_line_field_types_and_timestamp():
+    measurement, tags, fields, timestamp = parse_line(
+        'cpu,host=gpu01,cpu=cpu-total usage_idle=97.5,procs=12i,up=true,note="ok" 1700000000000000000')
+    assert measurement == 'cpu'
+    assert tags == {'host': 'gpu01', 'cpu': 'cpu-total'}
+    assert fields == {'usage_idle': 97.5, 'procs': 12, 'up': True, 'note': 'ok'}
+    assert timestamp == 1700000000000000000
+
+
+def test_parse_line_without_timestamp():
+    assert parse_line('mem used_percent=41.2') == ('mem', {}, {'used_percent': 41.2}, None)
+
+
+def test_parse_line_escapes_and_quoted_separators():
+    measurement, tags, fields, _ = parse_line(
+        r'gpu\ stats,host=rack\,1,model=A\=100 name="a, b=c",busy=F')
+    assert measurement == 'gpu stats'
+    assert tags == {'host': 'rack,1', 'model': 'A=100'}
+    assert fields == {'name': 'a, b=c', 'busy': False}
+
+
+@pytest.mark.parametrize('line', ['', '   ', '# comment'])
+def test_parse_line_skips_blank_and_comment_lines(line):
+    assert parse_line(line) is None
+
+
+@pytest.mark.parametrize('line', [
+    'cpu',
+    'cpu usage=1 2 3',
+    'cpu,host usage=1',
+    'cpu usage=',
+    'cpu usage=abc',
+    'cpu note="open',
+    'cpu usage=1 soon',
+])
+def test_parse_line_rejects_malformed_lines(line):
+    with pytest.raises(LineProtocolError):
+        parse_line(line)
+
+
+@pytest.mark.parametrize('gzipped', [False, True])
+def test_iter_lines_across_chunks(gzipped):
+    payload = b'cpu usage=1\nmem used=2\nlast=3'
+    if gzipped:
+        payload = gzip.compress(payload)
+    lines = list(iter_lines(io.BytesIO(payload), gzipped=gzipped, chunk_size=4))
+    assert lines == ['cpu usage=1', 'mem used=2', 'last=3']
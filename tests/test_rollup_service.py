@@ -0,0 +1,110 @@
+# tests/test_rollup_service.py
+from datetime import datetime, timedelta, UTC
+
+import pytest
+from sqlalchemy import func, insert, update
+
+from models.database import db
+from models.power_sample import PowerSample
+from models.rollup_watermark import RollupWatermark
+from models.server import Server
+from models.server_rollup import ServerRollup
+from models.server_state_event import ServerStateEvent
+from services.rollup_service import RollupService
+
+
+def _utcnow():
+    # Event and rollup times are stored naive in UTC
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+@pytest.fixture
+def server(app):
+    """A busy server whose first state event is backdated three hours"""
+    server = Server(name='gpu01', ipmi_host='10.0.0.1', ipmi_user='admin', ipmi_pass='secret',
+                    power_state='ON', is_idle=False)
+    db.session.add(server)
+    db.session.commit()
+    db.session.execute(update(ServerStateEvent).values(occurred_at=_utcnow() - timedelta(hours=3)))
+    db.session.commit()
+    return server
+
+
+def _total(server, field):
+    return db.session.query(func.sum(getattr(ServerRollup, field))).filter(
+        ServerRollup.server_id == server.id, ServerRollup.period == 'hour').scalar() or 0
+
+
+def _add_event(server, at, powered, idle=False, cause=None, **values):
+    db.session.execute(insert(ServerStateEvent).values(server_id=server.id, occurred_at=at, powered=powered,
+                                                       idle=idle, cause=cause, **values))
+    db.session.commit()
+
+
+def test_first_run_starts_at_the_first_event(server):
+    summary = RollupService.run()
+    assert summary['events'] == 1
+    assert _total(server, 'on_secs') == pytest.approx(3 * 3600, abs=5)
+    assert _total(server, 'idle_on_secs') == 0
+    # Hourly, daily and monthly rows cover the same time
+    days = db.session.query(func.sum(ServerRollup.on_secs)).filter(ServerRollup.period == 'day').scalar()
+    assert days == pytest.approx(_total(server, 'on_secs'))
+
+
+def test_auto_shutdown_counts_saved_time(server):
+    now = _utcnow()
+    _add_event(server, now - timedelta(hours=2), powered=True, idle=True)
+    _add_event(server, now - timedelta(hours=1), powered=False, cause='auto_shutdown')
+
+    RollupService.run()
+    assert _total(server, 'on_secs') == pytest.approx(2 * 3600, abs=5)
+    assert _total(server, 'idle_on_secs') == pytest.approx(3600, abs=5)
+    assert _total(server, 'saved_secs') == pytest.approx(3600, abs=5)
+    assert _total(server, 'auto_shutdowns') == 1
+
+
+def test_runs_are_incremental(server):
+    RollupService.run()
+    on_secs = _total(server, 'on_secs')
+    assert RollupService.run()['events'] == 0
+    # Only the time since the previous run is added
+    assert _total(server, 'on_secs') == pytest.approx(on_secs, abs=5)
+    assert ServerStateEvent.query.filter(ServerStateEvent.rolled_up.is_(False)).count() == 0
+
+
+def test_late_commit_below_processed_ids_is_picked_up(server):
+    now = _utcnow()
+    _add_event(server, now - timedelta(minutes=30), powered=True, idle=True, id=100)
+    assert RollupService.run()['events'] == 2
+
+    # A transaction that took id 50 before the run commits only after it
+    _add_event(server, now - timedelta(minutes=20), powered=False, id=50)
+    watermark = db.session.get(RollupWatermark, RollupService.WATERMARK).processed_until
+    assert RollupService.run()['events'] == 1
+    assert db.session.get(ServerStateEvent, 50).rolled_up
+    assert db.session.get(RollupWatermark, RollupService.WATERMARK).processed_until > watermark
+
+
+def test_power_samples_are_integrated(app, server):
+    max_gap = app.config['POWER_SAMPLE_MAX_GAP']
+    start = _utcnow() - timedelta(hours=1)
+    db.session.execute(insert(PowerSample), [
+        {'server_id': server.id, 'sampled_at': start + timedelta(seconds=60 * i), 'watts': 600.0}
+        for i in range(10)
+    ])
+    db.session.commit()
+
+    assert RollupService.run()['samples'] == 10
+    # The first sample has no predecessor and counts for the longest gap allowed
+    measured_secs = max_gap + 9 * 60
+    assert _total(server, 'measured_secs') == pytest.approx(measured_secs)
+    assert _total(server, 'measured_kwh') == pytest.approx(600.0 * measured_secs / 3.6e6)
+    assert PowerSample.query.filter(PowerSample.rolled_up.is_(False)).count() == 0
+
+
+def test_savings_report_reads_the_rollups(server):
+    RollupService.run()
+    now = _utcnow()
+    report = RollupService.savings_report(now - timedelta(days=1), now + timedelta(days=1), period='hour')
+    assert [entry['name'] for entry in report['servers']] == ['gpu01']
+    assert report['totals']['on_hours'] == pytest.approx(3, abs=0.01)
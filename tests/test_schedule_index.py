@@ -0,0 +1,109 @@
+# tests/test_schedule_index.py
+import logging
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from models.database import db
+from models.schedule import Schedule
+from models.schedule_rule import ScheduleRule
+from models.server import Server
+from services.schedule_service import ScheduleIndex
+
+# A Monday
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=UTC)
+
+
+@pytest.fixture
+def server(app):
+    server = Server(name='gpu01', ipmi_host='10.0.0.1', ipmi_user='admin', ipmi_pass='secret', power_state='ON')
+    db.session.add(server)
+    db.session.commit()
+    return server
+
+
+def _index(server_id):
+    index = ScheduleIndex()
+    index.ensure([server_id], NOW)
+    return index
+
+
+def _book(server, start, end):
+    # Schedule times are stored naive in UTC
+    db.session.add(Schedule(server_id=server.id, start_time=start.replace(tzinfo=None),
+                            end_time=end.replace(tzinfo=None)))
+    db.session.commit()
+
+
+def _rule(server, rrule, dtstart, duration_mins, timezone='UTC', enabled=True):
+    db.session.add(ScheduleRule(server_id=server.id, rrule=rrule, dtstart=dtstart, timezone=timezone,
+                                duration_mins=duration_mins, enabled=enabled))
+    db.session.commit()
+
+
+def test_one_off_schedule(server):
+    _book(server, NOW + timedelta(hours=1), NOW + timedelta(hours=2))
+    index = _index(server.id)
+    assert not index.covers(server.id, NOW)
+    assert index.covers(server.id, NOW + timedelta(hours=1, minutes=30))
+    assert index.covers(server.id, NOW + timedelta(hours=2))
+    assert not index.covers(server.id, NOW + timedelta(hours=2, seconds=1))
+
+
+def test_lead_time_counts_before_a_window(server):
+    _book(server, NOW + timedelta(minutes=10), NOW + timedelta(hours=1))
+    index = _index(server.id)
+    assert not index.covers(server.id, NOW, lead_secs=300)
+    assert index.covers(server.id, NOW, lead_secs=600)
+
+
+def test_overlapping_windows_are_merged(server):
+    _book(server, NOW, NOW + timedelta(hours=4))
+    _book(server, NOW + timedelta(hours=1), NOW + timedelta(hours=2))
+    index = _index(server.id)
+    assert index.covers(server.id, NOW + timedelta(hours=3))
+    assert index.intervals(server.id, NOW, NOW + timedelta(hours=5)) == [(NOW, NOW + timedelta(hours=4))]
+
+
+def test_weekly_rule_in_local_time(server):
+    # 09:00-17:00 in Taipei (UTC+8) on weekdays
+    _rule(server, 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR', datetime(2026, 1, 5, 9, 0), 480, 'Asia/Taipei')
+    index = _index(server.id)
+    assert index.covers(server.id, datetime(2026, 10, 20, 2, 0, tzinfo=UTC))
+    assert not index.covers(server.id, datetime(2026, 10, 20, 10, 0, tzinfo=UTC))
+    assert not index.covers(server.id, datetime(2026, 10, 25, 2, 0, tzinfo=UTC))  # Sunday
+
+
+def test_occurrence_started_before_the_window_still_counts(server):
+    # Started a day and a half before NOW, i.e. before the index lookback, and runs for two days
+    _rule(server, 'FREQ=WEEKLY', datetime(2026, 10, 18, 0, 0), 2 * 24 * 60)
+    index = _index(server.id)
+    assert index.covers(server.id, NOW)
+
+
+def test_old_minutely_rule_still_covers_now(server):
+    _rule(server, 'FREQ=MINUTELY;INTERVAL=10', datetime(2015, 1, 1, 0, 0), 5)
+    index = _index(server.id)
+    assert index.covers(server.id, NOW + timedelta(minutes=2))
+    assert not index.covers(server.id, NOW + timedelta(minutes=7))
+
+
+def test_disabled_rule_is_ignored(server):
+    _rule(server, 'FREQ=DAILY', datetime(2026, 1, 1, 0, 0), 24 * 60, enabled=False)
+    assert not _index(server.id).covers(server.id, NOW)
+
+
+def test_invalidate_picks_up_new_bookings(server):
+    index = _index(server.id)
+    assert not index.covers(server.id, NOW)
+    _book(server, NOW - timedelta(hours=1), NOW + timedelta(hours=1))
+    index.invalidate(server.id)
+    index.ensure([server.id], NOW)
+    assert index.covers(server.id, NOW)
+
+
+def test_occurrence_cap_is_logged(server, caplog):
+    _rule(server, 'FREQ=SECONDLY', datetime(2026, 1, 1, 0, 0), 1)
+    with caplog.at_level(logging.WARNING, logger='services.schedule_service'):
+        _index(server.id)
+    assert 'later ones are ignored' in caplog.text
@@ -0,0 +1,87 @@
+# tests/test_server_import.py
+import io
+import json
+
+import pytest
+
+from models.server import Server
+from services.server_import_service import ImportFormatError, ServerImportService
+
+BASE = {'name': 'gpu01', 'ipmi_host': '10.0.0.1', 'ipmi_user': 'admin', 'ipmi_pass': 'secret'}
+
+
+@pytest.mark.parametrize('value, expected', [
+    (30, 30), ('30', 30), (' 45 ', 45), ('30.0', 30), (30.0, 30),
+])
+def test_idle_threshold_accepts_whole_numbers(value, expected):
+    row, error = ServerImportService.validate({**BASE, 'idle_threshold_mins': value})
+    assert error is None
+    assert row['idle_threshold_mins'] == expected
+
+
+@pytest.mark.parametrize('value', [2.7, '2.7', True, 'abc', 'nan', 'inf', 0, -5])
+def test_idle_threshold_rejects_other_values(value):
+    row, error = ServerImportService.validate({**BASE, 'idle_threshold_mins': value})
+    assert row is None
+    assert 'idle_threshold_mins' in error
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('yes', True), ('1', True), (True, True), ('off', False), ('', None), (False, False),
+])
+def test_auto_shutdown_enabled_parsing(value, expected):
+    row, error = ServerImportService.validate({**BASE, 'auto_shutdown_enabled': value})
+    assert error is None
+    assert row.get('auto_shutdown_enabled') == expected
+
+
+@pytest.mark.parametrize('record, message', [
+    ({'name': 'gpu01'}, 'Missing required field'),
+    ({**BASE, 'ipmi_host': 'bad host!'}, 'Invalid IPMI host'),
+    ({**BASE, 'name': 'x' * 101}, 'longer than 100'),
+    ({**BASE, 'auto_shutdown_enabled': 'maybe'}, 'Invalid auto_shutdown_enabled'),
+    (['not', 'a', 'dict'], 'Record must be an object'),
+])
+def test_validate_reports_invalid_records(record, message):
+    row, error = ServerImportService.validate(record)
+    assert row is None
+    assert message in error
+
+
+def test_iter_records_csv_counts_the_header_line():
+    stream = io.BytesIO(b'name,ipmi_host,ipmi_user,ipmi_pass\n gpu01 ,10.0.0.1,admin,secret\n')
+    assert list(ServerImportService.iter_records(stream, 'csv')) == [(2, BASE)]
+
+
+def test_iter_records_json_array_and_lines():
+    array = io.BytesIO(json.dumps([BASE, BASE]).encode())
+    assert [row_no for row_no, _ in ServerImportService.iter_records(array, 'json')] == [1, 2]
+
+    lines = io.BytesIO(f"{json.dumps(BASE)}\n\n{{broken\n".encode())
+    records = list(ServerImportService.iter_records(lines, 'json'))
+    assert records[0] == (1, BASE)
+    assert records[1][0] == 3 and isinstance(records[1][1], ImportFormatError)
+
+
+def test_iter_records_rejects_unknown_format():
+    with pytest.raises(ImportFormatError):
+        list(ServerImportService.iter_records(io.BytesIO(b''), 'xml'))
+
+
+def test_upsert_creates_updates_and_reports_row_errors(app):
+    report = ServerImportService.upsert([
+        (1, BASE),
+        (2, {**BASE, 'name': 'gpu02', 'idle_threshold_mins': '2.7'}),
+        (3, BASE),
+    ])
+    assert (report['created'], report['updated']) == (1, 0)
+    assert [(e['row'], e['name']) for e in report['errors']] == [(2, 'gpu02'), (3, 'gpu01')]
+    assert Server.query.filter_by(name='gpu01').one().power_state == 'OFF'
+
+    report = ServerImportService.upsert([(1, {**BASE, 'idle_threshold_mins': 45})])
+    assert report['updated'] == 1
+    assert Server.query.filter_by(name='gpu01').one().idle_threshold_mins == 45
+
+    report = ServerImportService.upsert([(1, {**BASE, 'name': 'gpu03'})], dry_run=True)
+    assert report['created'] == 1
+    assert Server.query.filter_by(name='gpu03').first() is None